@@ -0,0 +1,68 @@
+"""TTL + LRU cache of authenticated principals keyed by JWT subject."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int = 10000, ttl_s: float = 60.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.claim_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.auth_count = 0
+        self.auth_ns = 0
+
+    def get(self, subject: str) -> Optional[Any]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return principal
+
+    def put(self, subject: str, principal: Any) -> None:
+        self._entries[subject] = (time.monotonic() + self.ttl_s, principal)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, subject: str) -> None:
+        if self._entries.pop(subject, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def record(self, elapsed_ns: int) -> None:
+        self.auth_count += 1
+        self.auth_ns += elapsed_ns
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "claim_hits": self.claim_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "authentications": self.auth_count,
+            "avg_auth_us": round(self.auth_ns / self.auth_count / 1000, 2) if self.auth_count else None,
+        }
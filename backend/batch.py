@@ -0,0 +1,145 @@
+"""In-process sub-requests for ``POST /api/batch``.
+
+Each sub-request is a GET that runs through the full ASGI app, so routing,
+validation, error handlers and metrics behave exactly as they would for a
+separate call. The caller is authenticated once: the batch route puts its
+principal in each sub-request's scope under ``BATCH_USER_SCOPE_KEY``, and
+``get_current_user`` returns it instead of decoding the token again. JSON
+bodies are spliced byte for byte into the combined response, without being
+parsed and encoded a second time. Every body is buffered, so one that grows
+past ``max_bytes`` is abandoned and answered 413 in its slot instead.
+"""
+
+import asyncio
+import gzip
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+BATCH_USER_SCOPE_KEY = "batch_user"
+GZIP_MIN_BYTES = 1024
+# Sub-request response headers worth passing back to the client
+FORWARDED_HEADERS = ("content-type", "etag", "x-next-cursor", "retry-after")
+
+
+class _ResponseTooLarge(Exception):
+    pass
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    parts = urlsplit(path)
+    return parts.path, parts.query
+
+
+async def run_subrequest(app, parent_scope: dict, path: str, headers: Dict[str, str], user,
+                         max_bytes: Optional[int] = None) -> dict:
+    """Run one GET through ``app`` and capture its status, headers and body, up to ``max_bytes`` of body."""
+    route_path, query = split_path(path)
+    raw_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    for name, value in parent_scope.get("headers", ()):
+        if name == b"authorization":
+            raw_headers.append((name, value))
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": route_path,
+        "raw_path": route_path.encode(),
+        "query_string": query.encode(),
+        "headers": raw_headers,
+        BATCH_USER_SCOPE_KEY: user,
+    }
+
+    finished = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for a disconnect; only report one once we are done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    status = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    body: List[bytes] = []
+    size = 0
+
+    async def send(message):
+        nonlocal status, response_headers, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                # Stops a streaming route from producing the rest of its body
+                raise _ResponseTooLarge()
+            body.append(chunk)
+
+    try:
+        await app(scope, receive, send)
+    except _ResponseTooLarge:
+        return {
+            "status": 413,
+            "headers": {"content-type": "application/json"},
+            "body": orjson.dumps({"detail": f"Response exceeds the {max_bytes} byte limit for a batched request"}),
+        }
+    except Exception:
+        # The app has already answered 500; the other sub-requests still complete
+        logger.exception("Batch sub-request %s failed", route_path)
+        status = 500
+    finally:
+        finished.set()
+    return {
+        "status": status,
+        "headers": {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in response_headers
+            if name.decode("latin-1").lower() in FORWARDED_HEADERS
+        },
+        "body": b"".join(body),
+    }
+
+
+def _body(result: dict) -> bytes:
+    raw = result["body"]
+    if not raw:
+        return b"null"
+    content_type = next((value for name, value in result["headers"].items() if name.lower() == "content-type"), "")
+    if content_type.startswith("application/json"):
+        return raw
+    return orjson.dumps(raw.decode("utf-8", errors="replace"))
+
+
+def combine(ids: List[Optional[str]], results: List[dict]) -> bytes:
+    """One JSON document holding every sub-response, in request order."""
+    parts = [
+        b'{"id":' + orjson.dumps(request_id)
+        + b',"status":' + orjson.dumps(result["status"])
+        + b',"headers":' + orjson.dumps(result["headers"])
+        + b',"body":' + _body(result) + b"}"
+        for request_id, result in zip(ids, results)
+    ]
+    return b'{"responses":[' + b",".join(parts) + b"]}"
+
+
+async def maybe_gzip(body: bytes, accept_encoding: str) -> Tuple[bytes, Dict[str, str]]:
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) < GZIP_MIN_BYTES or "gzip" not in accept_encoding.lower():
+        return body, headers
+    # Compressing a large dashboard payload takes long enough to keep off the event loop
+    compressed = await asyncio.to_thread(gzip.compress, body, 6)
+    return compressed, {**headers, "Content-Encoding": "gzip"}
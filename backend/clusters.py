@@ -0,0 +1,158 @@
+"""Zoom-level tourist clusters for the map.
+
+At zoom ``z`` the world is cut into square cells of ``360 / (2**z * CELLS_PER_TILE)``
+degrees, about a quarter of a map tile across. A box wider than
+``max_clusters`` cells is served from a coarser zoom, so a response never
+exceeds that many clusters. Each zoom level's cells are built the first
+time that zoom is requested. After that, every move or status change
+adjusts the counts of the cached levels in place.
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from geofence import DEFAULT_ZONE_TYPE
+
+CELLS_PER_TILE = 4
+MAX_ZOOM = 18
+MAX_CLUSTERS = 400
+
+
+class _Cell:
+    __slots__ = ("count", "sum_lat", "sum_lng", "zones", "statuses")
+
+    def __init__(self):
+        self.count = 0
+        self.sum_lat = 0.0
+        self.sum_lng = 0.0
+        self.zones: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, lat: float, lng: float, zone_type: str, status: str, sign: int) -> None:
+        self.count += sign
+        self.sum_lat += sign * lat
+        self.sum_lng += sign * lng
+        self.zones[zone_type] = self.zones.get(zone_type, 0) + sign
+        self.statuses[status] = self.statuses.get(status, 0) + sign
+
+
+class ClusterIndex:
+    def __init__(self, max_clusters: int = MAX_CLUSTERS):
+        self.max_clusters = max_clusters
+        self._tourists: Dict[str, Tuple[float, float, str, str]] = {}
+        self._levels: Dict[int, Dict[Tuple[int, int], _Cell]] = {}
+        self.level_builds = 0
+
+    def __len__(self) -> int:
+        return len(self._tourists)
+
+    @staticmethod
+    def cell_deg(zoom: int) -> float:
+        return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+    def _key(self, zoom: int, lat: float, lng: float) -> Tuple[int, int]:
+        size = self.cell_deg(zoom)
+        return (math.floor(lat / size), math.floor(lng / size))
+
+    def _apply(self, state: Tuple[float, float, str, str], sign: int) -> None:
+        lat, lng, zone_type, status = state
+        for zoom, cells in self._levels.items():
+            key = self._key(zoom, lat, lng)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = _Cell()
+            cell.add(lat, lng, zone_type, status, sign)
+            if cell.count <= 0:
+                del cells[key]
+
+    def load(self, items) -> None:
+        """Replace contents with ``(id, lat, lng, zone_type, status)`` tuples."""
+        self._tourists = {item[0]: tuple(item[1:]) for item in items}
+        self._levels.clear()
+
+    def clear(self) -> None:
+        self._tourists.clear()
+        self._levels.clear()
+
+    def update(self, tourist_id: str, lat: Optional[float] = None, lng: Optional[float] = None,
+               zone_type: Optional[str] = None, status: Optional[str] = None) -> None:
+        """Change any of a tourist's position, zone or status; ``None`` keeps the old value."""
+        previous = self._tourists.get(tourist_id)
+        if previous is None:
+            if lat is None or lng is None:
+                return
+            state = (lat, lng, zone_type or DEFAULT_ZONE_TYPE, status or "active")
+        else:
+            state = (
+                previous[0] if lat is None else lat,
+                previous[1] if lng is None else lng,
+                previous[2] if zone_type is None else zone_type,
+                previous[3] if status is None else status,
+            )
+            if state == previous:
+                return
+            self._apply(previous, -1)
+        self._tourists[tourist_id] = state
+        self._apply(state, 1)
+
+    def remove(self, tourist_id: str) -> None:
+        previous = self._tourists.pop(tourist_id, None)
+        if previous is not None:
+            self._apply(previous, -1)
+
+    def _level(self, zoom: int) -> Dict[Tuple[int, int], _Cell]:
+        cells = self._levels.get(zoom)
+        if cells is None:
+            cells = {}
+            for lat, lng, zone_type, status in self._tourists.values():
+                key = self._key(zoom, lat, lng)
+                cell = cells.get(key)
+                if cell is None:
+                    cell = cells[key] = _Cell()
+                cell.add(lat, lng, zone_type, status, 1)
+            self._levels[zoom] = cells
+            self.level_builds += 1
+        return cells
+
+    def _span(self, zoom: int, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> int:
+        min_key = self._key(zoom, min_lat, min_lng)
+        max_key = self._key(zoom, max_lat, max_lng)
+        return (max_key[0] - min_key[0] + 1) * (max_key[1] - min_key[1] + 1)
+
+    def clusters(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                 zoom: int) -> Tuple[int, List[dict]]:
+        """Clusters inside the box at ``zoom``, coarsened until the box spans at most ``max_clusters`` cells."""
+        zoom = max(0, min(MAX_ZOOM, zoom))
+        while zoom > 0 and self._span(zoom, min_lat, min_lng, max_lat, max_lng) > self.max_clusters:
+            zoom -= 1
+        cells = self._level(zoom)
+        min_key = self._key(zoom, min_lat, min_lng)
+        max_key = self._key(zoom, max_lat, max_lng)
+        keys = [
+            (cx, cy)
+            for cx in range(min_key[0], max_key[0] + 1)
+            for cy in range(min_key[1], max_key[1] + 1)
+            if (cx, cy) in cells
+        ]
+
+        size = self.cell_deg(zoom)
+        result = []
+        for key in keys:
+            cell = cells[key]
+            result.append({
+                "lat": cell.sum_lat / cell.count,
+                "lng": cell.sum_lng / cell.count,
+                "count": cell.count,
+                "bounds": [key[1] * size, key[0] * size, (key[1] + 1) * size, (key[0] + 1) * size],
+                "zone_type": {name: n for name, n in cell.zones.items() if n},
+                "status": {name: n for name, n in cell.statuses.items() if n},
+            })
+        return zoom, result
+
+    def stats(self) -> dict:
+        return {
+            "tourists": len(self._tourists),
+            "cached_zooms": sorted(self._levels),
+            "level_builds": self.level_builds,
+            "max_clusters": self.max_clusters,
+        }
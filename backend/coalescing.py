@@ -0,0 +1,89 @@
+"""Coalescing window for repeated incident reports.
+
+Maps ``(tourist_id, type)`` to the incident last opened or repeated for that
+key. The entry expires ``window_s`` after the most recent report, so a burst
+of panic presses keeps folding into one incident until it goes quiet.
+``hold`` serialises reports for the same key, so a burst that arrives
+all at once still opens only one incident.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List, Optional
+
+
+class CoalescingWindow:
+    def __init__(self, window_s: float = 60.0, max_keys: int = 100000):
+        self.window_s = window_s
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # key -> [lock, holders]; dropped once nobody holds or waits on it
+        self._locks: Dict[Hashable, List] = {}
+        self.opened = 0
+        self.coalesced = 0
+        self.expired = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def _prune(self, now: float) -> None:
+        # Entries are kept in expiry order, oldest first
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self.expired += 1
+
+    def get(self, key: Hashable) -> Optional[str]:
+        self._prune(time.monotonic())
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def opened_incident(self, key: Hashable, incident_id: str) -> None:
+        self.opened += 1
+        self._remember(key, incident_id)
+
+    def repeated(self, key: Hashable, incident_id: str) -> None:
+        self.coalesced += 1
+        self._remember(key, incident_id)
+
+    def _remember(self, key: Hashable, incident_id: str) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.window_s, incident_id)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def forget(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "window_s": self.window_s,
+            "open_windows": len(self._entries),
+            "opened": self.opened,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+        }
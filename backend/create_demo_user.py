@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
 """Script to create a demo user for testing"""
 
+import argparse
 import asyncio
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
-from passlib.context import CryptContext
 import uuid
 from datetime import datetime, timezone
 
+from hashing import PasswordHasher
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -20,8 +22,8 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (same bounded pool the API server uses)
+password_hasher = PasswordHasher(workers=os.cpu_count() or 4)
 
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -44,7 +46,7 @@ async def create_demo_user():
         return
     
     # Create password hash
-    password_hash = pwd_context.hash(demo_password)
+    password_hash = await password_hasher.hash(demo_password)
     
     # Create user object
     user = User(
@@ -62,9 +64,54 @@ async def create_demo_user():
     print(f"Demo user created successfully!")
     print(f"Email: {demo_email}")
     print(f"Password: {demo_password}")
+
+async def create_bulk_officers(count, password):
+    """Provision officer1@demo.com .. officerN@demo.com, hashing on the shared pool"""
+    
+    emails = [f"officer{i}@demo.com" for i in range(1, count + 1)]
+    existing = {
+        user['email']
+        async for user in db.users.find({"email": {"$in": emails}}, {"_id": 0, "email": 1})
+    }
+    emails = [email for email in emails if email not in existing]
+    if not emails:
+        print(f"All {count} bulk officers already exist!")
+        return
+    
+    password_hashes = await password_hasher.hash_many([password] * len(emails))
+    user_dicts = []
+    for email, password_hash in zip(emails, password_hashes):
+        user_dict = User(email=email, name=email.split('@')[0].title(), role="officer").dict()
+        user_dict['password_hash'] = password_hash
+        user_dicts.append(user_dict)
+    
+    await db.users.insert_many(user_dicts, ordered=False)
+    print(f"Created {len(user_dicts)} officers ({len(existing)} already existed)")
+    print(f"Password: {password}")
+
+async def promote_to_admin(email):
+    """Give an existing account the admin role; self-registration only creates officers"""
+    
+    result = await db.users.update_one({"email": email}, {"$set": {"role": "admin"}})
+    if not result.matched_count:
+        print(f"No user {email}; register the account first")
+        return
+    print(f"{email} is now an admin (existing sessions pick it up once their cached principal or token expires)")
+
+async def main(args):
+    await create_demo_user()
+    if args.bulk:
+        await create_bulk_officers(args.bulk, args.bulk_password)
+    if args.admin:
+        await promote_to_admin(args.admin)
     
     # Close connection
     client.close()
+    password_hasher.shutdown()
 
 if __name__ == "__main__":
-    asyncio.run(create_demo_user())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bulk", type=int, default=0, help="also create this many officerN@demo.com accounts")
+    parser.add_argument("--bulk-password", default="demo123")
+    parser.add_argument("--admin", metavar="EMAIL", help="promote this registered user to admin")
+    asyncio.run(main(parser.parse_args()))
\ No newline at end of file
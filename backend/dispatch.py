@@ -0,0 +1,116 @@
+"""Incident dispatch: priority queue of waiting incidents plus a spatial index of free officers.
+
+Everything here is in memory and synchronous, so picking an officer never
+waits on the database; the caller persists the assignment afterwards. The
+state is rebuilt from Mongo on startup.
+"""
+
+import heapq
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from geo_index import GridIndex
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+IMMEDIATE_SEVERITIES = ("high", "critical")
+SEARCH_RADII_M = (1000, 5000, 25000, 100000, 500000)
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return 0.0
+
+
+class DispatchEngine:
+    def __init__(self):
+        # Only officers who are free to take an incident are in the grid
+        self.available = GridIndex(cell_deg=0.05)
+        self.officers: Dict[str, dict] = {}
+        self._queue: List[Tuple[int, float, str]] = []
+        self._waiting: Dict[str, dict] = {}
+        self.assigned = 0
+
+    def clear(self) -> None:
+        self.available.clear()
+        self.officers.clear()
+        self._queue.clear()
+        self._waiting.clear()
+
+    # Officers
+    def update_officer(self, officer_id: str, lat: float, lng: float, available: bool = True,
+                       incident_id: Optional[str] = None) -> None:
+        """Record an officer's position and duty state as stored in Mongo."""
+        self.officers[officer_id] = {"lat": lat, "lng": lng, "available": available, "incident_id": incident_id}
+        if available and incident_id is None:
+            self.available.upsert(officer_id, lat, lng)
+        else:
+            self.available.remove(officer_id)
+
+    def release_officer(self, officer_id: str) -> None:
+        officer = self.officers.get(officer_id)
+        if officer is None:
+            return
+        officer["incident_id"] = None
+        if officer["available"]:
+            self.available.upsert(officer_id, officer["lat"], officer["lng"])
+
+    def nearest_available(self, lat: float, lng: float) -> Optional[Tuple[str, float]]:
+        for radius in SEARCH_RADII_M:
+            hits = self.available.nearby(lat, lng, radius, limit=1)
+            if hits:
+                return hits[0]
+        return None
+
+    def reserve(self, officer_id: str, incident_id: str) -> None:
+        """Take an officer out of the free pool before the assignment is persisted."""
+        self.officers[officer_id]["incident_id"] = incident_id
+        self.available.remove(officer_id)
+
+    def confirm(self, incident_id: str) -> None:
+        self._waiting.pop(incident_id, None)
+        self.assigned += 1
+
+    # Incidents
+    def enqueue(self, incident: dict) -> None:
+        if incident["id"] in self._waiting:
+            return
+        self._waiting[incident["id"]] = incident
+        rank = SEVERITY_RANK.get(incident.get("severity"), 0)
+        heapq.heappush(self._queue, (-rank, _timestamp(incident.get("reported_at")), incident["id"]))
+
+    def discard(self, incident_id: str) -> None:
+        # Heap entries are dropped lazily when they reach the top
+        self._waiting.pop(incident_id, None)
+
+    def next_waiting(self) -> Optional[dict]:
+        """Highest severity, then oldest, incident still waiting for an officer."""
+        while self._queue:
+            _, _, incident_id = self._queue[0]
+            incident = self._waiting.get(incident_id)
+            if incident is not None:
+                return incident
+            heapq.heappop(self._queue)
+        return None
+
+    def waiting(self, limit: int = 100) -> List[dict]:
+        # An incident discarded and queued again has a stale heap entry besides its live one
+        stale = len(self._queue) - len(self._waiting)
+        listed: Dict[str, dict] = {}
+        for _, _, incident_id in heapq.nsmallest(limit + stale, self._queue):
+            incident = self._waiting.get(incident_id)
+            if incident is not None and incident_id not in listed:
+                listed[incident_id] = incident
+                if len(listed) == limit:
+                    break
+        return list(listed.values())
+
+    def stats(self) -> dict:
+        return {
+            "officers_tracked": len(self.officers),
+            "officers_available": len(self.available),
+            "incidents_waiting": len(self._waiting),
+            "assigned": self.assigned,
+        }
@@ -0,0 +1,172 @@
+"""Streaming CSV and Parquet exports.
+
+Rows are pulled off a Motor cursor ``batch_size`` documents at a time and
+each batch is encoded and sent before the next is read. Memory stays at one
+batch however many rows match. Parquet is written with ``pyarrow``; an
+install without it still serves CSV. Every batch becomes one row group, and its bytes are flushed to the
+client as soon as the group is written.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is unavailable without pyarrow
+    pa = pq = None
+
+EXPORT_BATCH_SIZE = 5000
+
+# (column, path into the document, type)
+Column = Tuple[str, Tuple[str, ...], str]
+
+INCIDENT_COLUMNS: List[Column] = [
+    ("id", ("id",), "str"),
+    ("tourist_id", ("tourist_id",), "str"),
+    ("type", ("type",), "str"),
+    ("severity", ("severity",), "str"),
+    ("status", ("status",), "str"),
+    ("reported_at", ("reported_at",), "datetime"),
+    ("lat", ("location", "lat"), "float"),
+    ("lng", ("location", "lng"), "float"),
+    ("assigned_officer", ("assigned_officer",), "str"),
+    ("occurrence_count", ("occurrence_count",), "int"),
+    ("last_reported_at", ("last_reported_at",), "datetime"),
+    ("description", ("description",), "str"),
+]
+
+TOURIST_COLUMNS: List[Column] = [
+    ("id", ("id",), "str"),
+    ("name", ("name",), "str"),
+    ("passport_number", ("passport_number",), "str"),
+    ("nationality", ("nationality",), "str"),
+    ("phone", ("phone",), "str"),
+    ("emergency_contact", ("emergency_contact",), "str"),
+    ("hotel_name", ("hotel_name",), "str"),
+    ("itinerary", ("itinerary",), "str"),
+    ("status", ("status",), "str"),
+    ("zone_type", ("zone_type",), "str"),
+    ("safety_score", ("safety_score",), "int"),
+    ("lat", ("location", "lat"), "float"),
+    ("lng", ("location", "lng"), "float"),
+    ("last_seen", ("last_seen",), "datetime"),
+]
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def projection(columns: Sequence[Column]) -> dict:
+    return {"_id": 0, **{".".join(path): 1 for _, path, _ in columns}}
+
+
+def _value(doc: dict, path: Tuple[str, ...]):
+    for key in path:
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def _utc(value):
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # Mongo hands back naive datetimes that are already UTC
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def batches(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Group a cursor's documents into lists of ``batch_size``."""
+    batch = []
+    async for doc in cursor.batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def csv_stream(rows: AsyncIterator[List[dict]], columns: Sequence[Column]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in columns])
+    async for batch in rows:
+        for doc in batch:
+            record = []
+            for _, path, kind in columns:
+                value = _value(doc, path)
+                if value is None:
+                    value = ""
+                elif kind == "datetime" and isinstance(value, datetime):
+                    value = _utc(value).isoformat()
+                record.append(value)
+            writer.writerow(record)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever has been written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(columns: Sequence[Column]):
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "datetime": pa.timestamp("ms", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, _, kind in columns])
+
+
+async def parquet_stream(rows: AsyncIterator[List[dict]], columns: Sequence[Column]) -> AsyncIterator[bytes]:
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for batch in rows:
+            arrays = [
+                pa.array([_utc(_value(doc, path)) for doc in batch], type=schema.field(name).type)
+                for name, path, _ in columns
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        # Writes the footer; a client that disconnected early just never sees it
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,126 @@
+"""In-process spatial index over tourist positions.
+
+Mongo keeps a 2dsphere index on ``tourists.geo`` as the source of truth; this
+grid mirrors the same points in memory so radius lookups during a panic event
+don't need a round trip per query.
+"""
+
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def geo_point(location: dict) -> dict:
+    """GeoJSON point for a {"lat", "lng"} location (GeoJSON is lng-first)."""
+    return {"type": "Point", "coordinates": [float(location["lng"]), float(location["lat"])]}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """Uniform lat/lng bucket grid keyed by object id.
+
+    ``cell_deg`` of 0.01 is roughly a 1.1 km cell, so a few-km radius query
+    touches a handful of cells regardless of how many points are tracked.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self.ready = False
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._points: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._points
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        return self._points.get(key)
+
+    def upsert(self, key: str, lat: float, lng: float) -> None:
+        previous = self._points.get(key)
+        cell = self._cell(lat, lng)
+        if previous is not None:
+            old_cell = self._cell(*previous)
+            if old_cell != cell:
+                bucket = self._cells[old_cell]
+                bucket.discard(key)
+                if not bucket:
+                    del self._cells[old_cell]
+        self._points[key] = (lat, lng)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        previous = self._points.pop(key, None)
+        if previous is None:
+            return
+        cell = self._cell(*previous)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._points.clear()
+
+    def load(self, items: Iterable[Tuple[str, float, float]]) -> None:
+        """Replace the index contents with ``(key, lat, lng)`` triples."""
+        self.clear()
+        for key, lat, lng in items:
+            self.upsert(key, lat, lng)
+        self.ready = True
+
+    def nearby(self, lat: float, lng: float, radius_m: float, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return ``(key, distance_m)`` pairs within ``radius_m``, nearest first."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlng = min(radius_m / (METERS_PER_DEGREE_LAT * cos_lat), 180.0)
+
+        min_cx, min_cy = self._cell(lat - dlat, lng - dlng)
+        max_cx, max_cy = self._cell(lat + dlat, lng + dlng)
+        span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+
+        if span > len(self._cells):
+            # Huge radius: walking occupied cells is cheaper than the rectangle.
+            candidates = (
+                key
+                for (cx, cy), bucket in self._cells.items()
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy
+                for key in bucket
+            )
+        else:
+            candidates = (
+                key
+                for cx in range(min_cx, max_cx + 1)
+                for cy in range(min_cy, max_cy + 1)
+                for key in self._cells.get((cx, cy), ())
+            )
+
+        hits = []
+        for key in candidates:
+            plat, plng = self._points[key]
+            distance = haversine_m(lat, lng, plat, plng)
+            if distance <= radius_m:
+                hits.append((key, distance))
+
+        if limit is not None and limit < len(hits):
+            return heapq.nsmallest(limit, hits, key=lambda hit: hit[1])
+        hits.sort(key=lambda hit: hit[1])
+        return hits
@@ -0,0 +1,130 @@
+"""Server-side geofence engine.
+
+Zones are circles or polygons stored in the ``zones`` collection. Points are
+classified in batches with NumPy: a coarse grid over zone bounding boxes
+picks the candidate zones for a batch, then each candidate runs one
+vectorized circle or ray-casting test over all of its points. A point takes
+the most severe zone it falls in, or ``safe`` if it is in none.
+"""
+
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from geo_index import EARTH_RADIUS_M, METERS_PER_DEGREE_LAT
+
+ZONE_TYPES = ("safe", "caution", "danger")  # ordered by severity
+ZONE_CODES = {zone_type: code for code, zone_type in enumerate(ZONE_TYPES)}
+DEFAULT_ZONE_TYPE = "safe"
+
+
+def haversine_m_vec(lats: np.ndarray, lngs: np.ndarray, lat: float, lng: float) -> np.ndarray:
+    phi1 = np.radians(lats)
+    phi2 = math.radians(lat)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * math.cos(phi2) * np.sin(np.radians(lng - lngs) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def points_in_polygon(lats: np.ndarray, lngs: np.ndarray, poly_lats: np.ndarray, poly_lngs: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting, vectorized over points (one NumPy pass per polygon edge)."""
+    inside = np.zeros(lats.shape, dtype=bool)
+    j = len(poly_lats) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(len(poly_lats)):
+            yi, xi = poly_lats[i], poly_lngs[i]
+            yj, xj = poly_lats[j], poly_lngs[j]
+            straddles = (yi > lats) != (yj > lats)
+            crossing_lng = (xj - xi) * (lats - yi) / (yj - yi) + xi
+            inside ^= straddles & (lngs < crossing_lng)
+            j = i
+    return inside
+
+
+class _CompiledZone:
+    __slots__ = ("id", "code", "bbox", "center", "radius_m", "poly_lats", "poly_lngs")
+
+    def __init__(self, zone: dict):
+        self.id = zone["id"]
+        self.code = ZONE_CODES[zone["zone_type"]]
+        self.center = None
+        self.radius_m = None
+        self.poly_lats = None
+        self.poly_lngs = None
+        if zone["shape"] == "circle":
+            lat, lng = zone["center"]["lat"], zone["center"]["lng"]
+            self.center = (lat, lng)
+            self.radius_m = float(zone["radius_m"])
+            dlat = self.radius_m / METERS_PER_DEGREE_LAT
+            dlng = self.radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+            self.bbox = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        else:
+            self.poly_lats = np.array([point["lat"] for point in zone["polygon"]], dtype=np.float64)
+            self.poly_lngs = np.array([point["lng"] for point in zone["polygon"]], dtype=np.float64)
+            self.bbox = (self.poly_lats.min(), self.poly_lngs.min(), self.poly_lats.max(), self.poly_lngs.max())
+
+    def contains(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        if self.center is not None:
+            return haversine_m_vec(lats, lngs, *self.center) <= self.radius_m
+        return points_in_polygon(lats, lngs, self.poly_lats, self.poly_lngs)
+
+
+class GeofenceEngine:
+    def __init__(self, cell_deg: float = 0.05):
+        self.cell_deg = cell_deg
+        self.zones: List[_CompiledZone] = []
+        self._cells: Dict[tuple, List[int]] = {}
+        # Last zone assigned to each tracked tourist, so transitions can be counted
+        self.zone_of: Dict[str, str] = {}
+        self.loaded_at: Optional[float] = None
+        self.classified = 0
+
+    def load(self, zones: Iterable[dict]) -> None:
+        self.zones = [_CompiledZone(zone) for zone in zones]
+        self._cells = {}
+        for index, zone in enumerate(self.zones):
+            min_lat, min_lng, max_lat, max_lng = zone.bbox
+            for cx in range(math.floor(min_lat / self.cell_deg), math.floor(max_lat / self.cell_deg) + 1):
+                for cy in range(math.floor(min_lng / self.cell_deg), math.floor(max_lng / self.cell_deg) + 1):
+                    self._cells.setdefault((cx, cy), []).append(index)
+        self.loaded_at = time.monotonic()
+
+    def classify(self, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+        """Zone code (index into ``ZONE_TYPES``) for every point, in one batched pass."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        codes = np.full(lats.shape, ZONE_CODES[DEFAULT_ZONE_TYPE], dtype=np.int8)
+        if not self.zones or lats.size == 0:
+            return codes
+
+        # Grid prefilter: only zones overlapping a cell that holds a point are tested
+        cells = np.unique(np.stack([
+            np.floor(lats / self.cell_deg).astype(np.int64),
+            np.floor(lngs / self.cell_deg).astype(np.int64),
+        ], axis=1), axis=0)
+        candidates = sorted({index for cx, cy in cells.tolist() for index in self._cells.get((cx, cy), ())})
+
+        # Most severe zones last so they win where zones overlap
+        for index in sorted(candidates, key=lambda i: self.zones[i].code):
+            zone = self.zones[index]
+            min_lat, min_lng, max_lat, max_lng = zone.bbox
+            in_bbox = np.flatnonzero((lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng))
+            if in_bbox.size == 0:
+                continue
+            hit = in_bbox[zone.contains(lats[in_bbox], lngs[in_bbox])]
+            codes[hit] = np.maximum(codes[hit], zone.code)
+        self.classified += lats.size
+        return codes
+
+    def classify_one(self, lat: float, lng: float) -> str:
+        return ZONE_TYPES[int(self.classify([lat], [lng])[0])]
+
+    def stats(self) -> dict:
+        return {
+            "zones": len(self.zones),
+            "grid_cells": len(self._cells),
+            "tracked_tourists": len(self.zone_of),
+            "points_classified": self.classified,
+        }
@@ -0,0 +1,85 @@
+"""Password hashing on a bounded worker pool.
+
+bcrypt is deliberately slow (100-300 ms per call) and would block the event
+loop if called from a handler. The bcrypt backend releases the GIL while it
+works, so a small thread pool gives real parallelism. Interactive callers
+(login/register) are rejected with ``PoolSaturated`` once the backlog is full
+instead of queueing without bound; bulk provisioning waits its turn.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from passlib.context import CryptContext
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = 4, max_queue: int = 32):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        # Guards the counters below, which the worker threads update
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.rejected = 0
+        self.busy_ns = 0
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter_ns()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            with self._lock:
+                self.busy_ns += elapsed
+                self.completed += 1
+
+    async def _run(self, fn, *args, reject: bool = True):
+        if reject and self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated()
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self._context.verify, password, hashed)
+
+    async def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        """Hash a batch for provisioning; never rejected, but limited to the pool's workers."""
+        return list(await asyncio.gather(*(
+            self._run(self._context.hash, password, reject=False) for password in passwords
+        )))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed, busy_ns = self.completed, self.busy_ns
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "utilisation": round(min(self._in_flight, self.workers) / self.workers, 3),
+            "completed": completed,
+            "rejected": self.rejected,
+            "avg_ms": round(busy_ns / completed / 1e6, 2) if completed else None,
+        }
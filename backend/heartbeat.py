@@ -0,0 +1,166 @@
+"""Heartbeat deadlines for the stale-tourist detector.
+
+Each tourist has one entry in a min-heap keyed by ``last_seen + timeout``.
+A ping only moves the deadline in a dict. The heap entry is pushed back
+lazily if it surfaces before the real deadline. A tick therefore costs
+work only for deadlines that have actually passed, capped at
+``max_expiries_per_tick``, however many tourists are tracked.
+
+Only the worker holding the leader lease acts on expiries. Every worker
+keeps its own deadlines from the pings it sees. Those can only be earlier
+than the truth, so the expiry callback rechecks ``last_seen`` in Mongo
+before it flags anyone. The leader's heap never sees tourists registered or
+reactivated through other workers, so every ``sweep_s`` it also asks
+``sweep_fn`` for tourists whose stored ``last_seen`` is overdue.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from leases import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatMonitor:
+    def __init__(
+        self,
+        on_expired: Callable[[List[str]], Awaitable[int]],
+        lease: LeaderLease,
+        timeout_s: float = 7200.0,
+        tick_s: float = 5.0,
+        max_expiries_per_tick: int = 1000,
+        sweep_fn: Optional[Callable[[float, int], Awaitable[List[str]]]] = None,
+        sweep_s: float = 60.0,
+    ):
+        self.on_expired = on_expired
+        self.lease = lease
+        self.timeout_s = timeout_s
+        self.tick_s = tick_s
+        self.max_expiries_per_tick = max_expiries_per_tick
+        # (cutoff epoch seconds, limit) -> ids of tourists last seen before the cutoff
+        self.sweep_fn = sweep_fn
+        self.sweep_s = sweep_s
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._swept_at = 0.0
+
+        self.expired = 0
+        self.swept = 0
+        self.flagged = 0
+        self.ticks = 0
+        self.errors = 0
+        self.last_tick_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def touch(self, tourist_id: str, last_seen: float) -> None:
+        """Record a heartbeat at epoch seconds ``last_seen``."""
+        deadline = last_seen + self.timeout_s
+        current = self._deadlines.get(tourist_id)
+        if current is None:
+            self._deadlines[tourist_id] = deadline
+            heapq.heappush(self._heap, (deadline, tourist_id))
+        elif deadline > current:
+            # The heap entry is pushed back when it surfaces
+            self._deadlines[tourist_id] = deadline
+
+    def forget(self, tourist_id: str) -> None:
+        self._deadlines.pop(tourist_id, None)
+
+    def clear(self) -> None:
+        self._deadlines.clear()
+        self._heap.clear()
+
+    def load(self, heartbeats: Iterable[Tuple[str, float]]) -> None:
+        self._deadlines = {tourist_id: last_seen + self.timeout_s for tourist_id, last_seen in heartbeats}
+        self._heap = [(deadline, tourist_id) for tourist_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def due(self, now: float, limit: int) -> List[str]:
+        """Pop up to ``limit`` tourists whose deadline has passed."""
+        expired = []
+        budget = 4 * limit
+        while self._heap and self._heap[0][0] <= now and len(expired) < limit and budget:
+            budget -= 1
+            deadline, tourist_id = heapq.heappop(self._heap)
+            current = self._deadlines.get(tourist_id)
+            if current is None:
+                continue
+            if current > deadline:
+                heapq.heappush(self._heap, (current, tourist_id))
+                continue
+            del self._deadlines[tourist_id]
+            expired.append(tourist_id)
+        return expired
+
+    async def tick(self, db) -> int:
+        if not await self.lease.acquire(db):
+            return 0
+        now = time.time()
+        expired = self.due(now, self.max_expiries_per_tick)
+        if self.sweep_fn is not None and now - self._swept_at >= self.sweep_s:
+            self._swept_at = now
+            seen = set(expired)
+            for tourist_id in await self.sweep_fn(now - self.timeout_s, self.max_expiries_per_tick):
+                if tourist_id not in seen:
+                    self.forget(tourist_id)
+                    expired.append(tourist_id)
+                    self.swept += 1
+        if not expired:
+            return 0
+        self.expired += len(expired)
+        try:
+            flagged = await self.on_expired(expired)
+        except Exception:
+            # Try them again next tick
+            for tourist_id in expired:
+                self.touch(tourist_id, now + self.tick_s - self.timeout_s)
+            raise
+        self.flagged += flagged
+        return flagged
+
+    async def _run(self, db) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                await self.tick(db)
+            except Exception:
+                self.errors += 1
+                logger.exception("Heartbeat tick failed")
+            self.ticks += 1
+            self.last_tick_ms = (time.perf_counter() - started) * 1000
+            await asyncio.sleep(self.tick_s)
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self, db) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.lease.release(db)
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._deadlines),
+            "heap_size": len(self._heap),
+            "expired": self.expired,
+            "swept": self.swept,
+            "flagged_missing": self.flagged,
+            "ticks": self.ticks,
+            "errors": self.errors,
+            "last_tick_ms": round(self.last_tick_ms, 3),
+            "timeout_s": self.timeout_s,
+            "leader": self.lease.is_leader,
+        }
@@ -0,0 +1,260 @@
+"""Incident density grid for the analytics heatmap.
+
+Incidents are binned into a fixed lat/lng grid over ``bounds``. Each UTC day
+of the last ``retention_days`` keeps only its non-empty cells, and a running
+total of those days is held as one dense array. Anything older is folded
+into a single all-time array. Recording an incident increments one cell in
+its day and in the running total. A query over the whole window slices the
+dense arrays; one that starts part way through the window adds (or takes
+away) just the sparse days it needs. The result is block-summed down to the
+requested resolution. Its cost depends on the box and the window, not on how
+many incidents exist, and memory grows with the cells incidents land in
+rather than with ``retention_days`` copies of the grid.
+
+A periodic rebuild only reads the retention window; days leaving the window
+keep their counts in the all-time array. The new arrays are swapped in at
+once, then incidents added while the rebuild query ran, and missing from its
+results, are counted again on top.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DAY_S = 86400
+
+
+def _epoch_s(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class IncidentHeatmap:
+    def __init__(self, bounds: Tuple[float, float, float, float] = (21.9, 89.5, 29.5, 97.5),
+                 cell_deg: float = 0.01, retention_days: int = 30, max_staleness_s: float = 300.0):
+        # bounds are (min_lat, min_lng, max_lat, max_lng)
+        self.bounds = bounds
+        self.cell_deg = cell_deg
+        self.retention_days = retention_days
+        self.max_staleness_s = max_staleness_s
+        self.rows = max(1, math.ceil((bounds[2] - bounds[0]) / cell_deg))
+        self.cols = max(1, math.ceil((bounds[3] - bounds[1]) / cell_deg))
+        # day -> {row * cols + col: count} for the non-empty cells of each retained day
+        self._days: Dict[int, Dict[int, int]] = {}
+        self._first_day = int(time.time() // DAY_S) - retention_days + 1
+        # Sum of every retained day, so a query over the whole window needs no per-day pass
+        self._window = np.zeros((self.rows, self.cols), dtype=np.int32)
+        self._older = np.zeros((self.rows, self.cols), dtype=np.int64)
+        self.total = 0
+        self.out_of_bounds = 0
+        self.built_at: Optional[float] = None
+        self.build_ms = 0.0
+        # incident id -> (lat, lng, reported_at) for adds made while a rebuild query runs
+        self._replay: Optional[Dict[str, Tuple[float, float, datetime]]] = None
+        self.replayed = 0
+
+    def is_stale(self) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > self.max_staleness_s
+
+    def _cell(self, lat: float, lng: float) -> Optional[Tuple[int, int]]:
+        row = math.floor((lat - self.bounds[0]) / self.cell_deg)
+        col = math.floor((lng - self.bounds[1]) / self.cell_deg)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def _retain(self, day: int) -> bool:
+        """Whether ``day`` is kept per day, folding days that fall out of the window into the all-time array."""
+        if day < self._first_day:
+            return False
+        if day >= self._first_day + self.retention_days:
+            self._first_day = day - self.retention_days + 1
+            for expired in [held for held in self._days if held < self._first_day]:
+                cells, counts = self._cells(self._days.pop(expired))
+                np.add.at(self._older.reshape(-1), cells, counts)
+                np.subtract.at(self._window.reshape(-1), cells, counts)
+        return True
+
+    @staticmethod
+    def _cells(day: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        cells = np.fromiter(day.keys(), dtype=np.int64, count=len(day))
+        counts = np.fromiter(day.values(), dtype=np.int64, count=len(day))
+        return cells, counts
+
+    def window_start(self) -> datetime:
+        """Start of the oldest day kept per day; a windowed rebuild reads incidents from here on."""
+        first_day = int(time.time() // DAY_S) - self.retention_days + 1
+        return datetime.fromtimestamp(first_day * DAY_S, tz=timezone.utc)
+
+    def begin_rebuild(self) -> None:
+        """Start remembering adds, so ``load`` can replay those its points don't include."""
+        self._replay = {}
+
+    def cancel_rebuild(self) -> None:
+        self._replay = None
+
+    def add(self, lat: float, lng: float, reported_at: datetime, incident_id: Optional[str] = None) -> None:
+        if self._replay is not None and incident_id is not None:
+            self._replay[incident_id] = (lat, lng, reported_at)
+        cell = self._cell(lat, lng)
+        if cell is None:
+            self.out_of_bounds += 1
+            return
+        day = int(_epoch_s(reported_at) // DAY_S)
+        if self._retain(day):
+            counts = self._days.setdefault(day, {})
+            flat = cell[0] * self.cols + cell[1]
+            counts[flat] = counts.get(flat, 0) + 1
+            self._window[cell] += 1
+        else:
+            self._older[cell] += 1
+        self.total += 1
+
+    def load(self, points: Iterable[Tuple[str, datetime, float, float]], window_only: bool = False) -> None:
+        """Rebuild from ``(incident_id, reported_at, lat, lng)`` in one vectorized pass.
+
+        With ``window_only`` the points cover just the retention window: the
+        all-time array is kept, and days that have left the window are folded
+        into it rather than recounted.
+        """
+        started = time.perf_counter()
+        points = list(points)
+        times = np.array([_epoch_s(point[1]) for point in points], dtype=np.float64)
+        lats = np.array([point[2] for point in points], dtype=np.float64)
+        lngs = np.array([point[3] for point in points], dtype=np.float64)
+
+        rows = np.floor((lats - self.bounds[0]) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lngs - self.bounds[1]) / self.cell_deg).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        days = (times // DAY_S).astype(np.int64)
+        today = int(time.time() // DAY_S)
+        first_day = today - self.retention_days + 1
+
+        # Built aside and swapped in at the end
+        cells = rows * self.cols + cols
+        # Future-dated incidents count as today
+        days = np.minimum(days, today)
+        recent = inside & (days >= first_day)
+        day_counts = self._split_days(days[recent], cells[recent])
+        window_counts = np.bincount(cells[recent], minlength=self.rows * self.cols)
+        window_counts = window_counts.astype(np.int32).reshape(self.rows, self.cols)
+        if window_only:
+            older_counts = self._older.copy()
+            for day in [held for held in self._days if held < first_day]:
+                held_cells, held_counts = self._cells(self._days[day])
+                np.add.at(older_counts.reshape(-1), held_cells, held_counts)
+        else:
+            older = inside & (days < first_day)
+            older_counts = np.bincount(cells[older], minlength=self.rows * self.cols).reshape(self.rows, self.cols)
+
+        if window_only:
+            # Older points are already in the all-time array, and out-of-bounds ones were counted when added
+            total = int(older_counts.sum()) + int(recent.sum())
+            out_of_bounds = self.out_of_bounds
+        else:
+            total = int(inside.sum())
+            out_of_bounds = len(points) - total
+
+        replay, self._replay = self._replay or {}, None
+        self._days, self._window, self._older = day_counts, window_counts, older_counts
+        self._first_day = first_day
+        self.total, self.out_of_bounds = total, out_of_bounds
+        loaded = {point[0] for point in points}
+        for incident_id, (lat, lng, reported_at) in replay.items():
+            if incident_id in loaded:
+                continue
+            if window_only and (self._cell(lat, lng) is None or _epoch_s(reported_at) // DAY_S < first_day):
+                # Counted in the arrays that were kept
+                continue
+            self.add(lat, lng, reported_at)
+            self.replayed += 1
+        self.built_at = time.monotonic()
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def _split_days(self, days: np.ndarray, cells: np.ndarray) -> Dict[int, Dict[int, int]]:
+        """Per-day ``{cell: count}`` for parallel arrays of day numbers and flat cell indexes."""
+        keys, counts = np.unique(days * (self.rows * self.cols) + cells, return_counts=True)
+        key_days = keys // (self.rows * self.cols)
+        key_cells = keys % (self.rows * self.cols)
+        result: Dict[int, Dict[int, int]] = {}
+        bounds = np.flatnonzero(np.diff(key_days)) + 1
+        for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(keys)]):
+            if start < end:
+                result[int(key_days[start])] = dict(zip(key_cells[start:end].tolist(), counts[start:end].tolist()))
+        return result
+
+    def _add_days(self, grid: np.ndarray, days: List[int], sign: int, r0: int, c0: int) -> None:
+        """Add (or with ``sign`` -1 take away) the given days' cells that fall inside ``grid``'s box."""
+        for day in days:
+            cells, counts = self._cells(self._days[day])
+            rows, cols = cells // self.cols - r0, cells % self.cols - c0
+            inside = (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+            np.add.at(grid, (rows[inside], cols[inside]), sign * counts[inside])
+
+    def query(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+              resolution: int, since: Optional[datetime] = None) -> dict:
+        """Incident counts in the box since ``since``, block-summed to at most ``resolution`` cells a side."""
+        r0 = min(self.rows, max(0, math.floor((min_lat - self.bounds[0]) / self.cell_deg)))
+        r1 = min(self.rows, max(0, math.ceil((max_lat - self.bounds[0]) / self.cell_deg)))
+        c0 = min(self.cols, max(0, math.floor((min_lng - self.bounds[1]) / self.cell_deg)))
+        c1 = min(self.cols, max(0, math.ceil((max_lng - self.bounds[1]) / self.cell_deg)))
+        empty = {"rows": 0, "cols": 0, "cell_lat_deg": 0.0, "cell_lng_deg": 0.0, "max": 0, "total": 0, "cells": []}
+        if r0 >= r1 or c0 >= c1:
+            return empty
+
+        since_day = None if since is None else int(_epoch_s(since) // DAY_S)
+        if since_day is None or since_day <= self._first_day:
+            grid = self._window[r0:r1, c0:c1].astype(np.int64)
+            if since_day is None or since_day < self._first_day:
+                # Days before the retention window are only kept as one all-time total
+                grid += self._older[r0:r1, c0:c1]
+        else:
+            wanted = [day for day in self._days if day >= since_day]
+            unwanted = [day for day in self._days if day < since_day]
+            if len(wanted) <= len(unwanted):
+                grid = np.zeros((r1 - r0, c1 - c0), dtype=np.int64)
+                self._add_days(grid, wanted, 1, r0, c0)
+            else:
+                grid = self._window[r0:r1, c0:c1].astype(np.int64)
+                self._add_days(grid, unwanted, -1, r0, c0)
+
+        # Block-sum down to the requested resolution
+        row_edges = np.unique(np.linspace(0, r1 - r0, min(resolution, r1 - r0) + 1).astype(np.int64))[:-1]
+        col_edges = np.unique(np.linspace(0, c1 - c0, min(resolution, c1 - c0) + 1).astype(np.int64))[:-1]
+        grid = np.add.reduceat(np.add.reduceat(grid, row_edges, axis=0), col_edges, axis=1)
+        row_bounds = np.append(row_edges, r1 - r0) + r0
+        col_bounds = np.append(col_edges, c1 - c0) + c0
+
+        nonzero_rows, nonzero_cols = np.nonzero(grid)
+        lat_centres = self.bounds[0] + (row_bounds[:-1] + row_bounds[1:]) / 2 * self.cell_deg
+        lng_centres = self.bounds[1] + (col_bounds[:-1] + col_bounds[1:]) / 2 * self.cell_deg
+        counts = grid[nonzero_rows, nonzero_cols].tolist()
+        cells = zip(lat_centres[nonzero_rows].round(6).tolist(), lng_centres[nonzero_cols].round(6).tolist(), counts)
+        return {
+            "rows": int(grid.shape[0]),
+            "cols": int(grid.shape[1]),
+            "cell_lat_deg": (r1 - r0) / grid.shape[0] * self.cell_deg,
+            "cell_lng_deg": (c1 - c0) / grid.shape[1] * self.cell_deg,
+            "max": int(grid.max()),
+            "total": int(grid.sum()),
+            # [lat, lng, count] for every non-empty cell
+            "cells": [list(cell) for cell in cells],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "incidents": self.total,
+            "out_of_bounds": self.out_of_bounds,
+            "grid": [self.rows, self.cols],
+            "cell_deg": self.cell_deg,
+            "retention_days": self.retention_days,
+            "day_cells": sum(len(day) for day in self._days.values()),
+            "bytes": int(self._window.nbytes + self._older.nbytes),
+            "age_seconds": None if self.built_at is None else round(time.monotonic() - self.built_at, 3),
+            "last_build_ms": round(self.build_ms, 3),
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,111 @@
+"""Keeps a worker's in-memory tourist indexes in step with other workers' writes.
+
+The spatial grid, map clusters, search index and heartbeat deadlines are
+updated in place by the write paths of the worker that handles each write.
+Every ``poll_s`` this loop checks whether other workers' tourist writes have
+been synced (``CollectionVersions.foreign``). If so, it asks
+``apply_changes(since)`` to fold in the tourists whose ``changed_at`` is at
+or after ``since``. That covers moves, status and zone changes and new
+tourists. Deletes and bulk loads such as the seed generator don't stamp
+``changed_at``, so at most every ``reload_s`` a worker that has seen foreign
+writes rebuilds everything with ``reload()``.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from versions import CollectionVersions
+
+logger = logging.getLogger(__name__)
+
+
+class IndexResync:
+    def __init__(
+        self,
+        versions: CollectionVersions,
+        collection: str,
+        apply_changes: Callable[[float], Awaitable[int]],
+        reload: Callable[[], Awaitable[None]],
+        poll_s: float = 2.0,
+        reload_s: float = 300.0,
+        clock_skew_s: float = 2.0,
+    ):
+        self.versions = versions
+        self.collection = collection
+        self.apply_changes = apply_changes
+        self.reload = reload
+        self.poll_s = poll_s
+        self.reload_s = reload_s
+        # Other workers stamp changed_at with their own clocks
+        self.clock_skew_s = clock_skew_s
+        self._task: Optional[asyncio.Task] = None
+        self._applied = 0
+        self._reloaded = 0
+        self._since = time.time()
+        self._reloaded_at = time.monotonic()
+
+        self.passes = 0
+        self.changes_applied = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def mark_loaded(self) -> None:
+        """Record a full load done elsewhere (startup, sample data) as current."""
+        foreign = self.versions.foreign(self.collection)
+        self._applied = self._reloaded = foreign
+        self._since = time.time() - self.clock_skew_s
+        self._reloaded_at = time.monotonic()
+
+    async def tick(self) -> None:
+        foreign = self.versions.foreign(self.collection)
+        if foreign != self._reloaded and time.monotonic() - self._reloaded_at >= self.reload_s:
+            started = time.time()
+            await self.reload()
+            self._reloaded = self._applied = foreign
+            self._reloaded_at = time.monotonic()
+            # Writes that landed while reloading are picked up by the next pass
+            self._since = started - self.clock_skew_s
+            self.reloads += 1
+            return
+        if foreign == self._applied:
+            return
+        started = time.time()
+        self.changes_applied += await self.apply_changes(self._since)
+        self._applied = foreign
+        self._since = started - self.clock_skew_s
+        self.passes += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_s)
+            try:
+                await self.tick()
+            except Exception:
+                self.errors += 1
+                logger.exception("Resync of in-memory %s indexes failed", self.collection)
+
+    def start(self) -> None:
+        if self._task is None:
+            self.mark_loaded()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "passes": self.passes,
+            "changes_applied": self.changes_applied,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "poll_s": self.poll_s,
+            "reload_s": self.reload_s,
+        }
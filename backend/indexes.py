@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Declarative index bootstrap and query-plan checks.
+
+``INDEX_SPECS`` lists the indexes the API routes rely on; ``ensure_indexes``
+creates them idempotently at startup and drops the ``RETIRED_INDEXES`` they
+replaced. ``QUERY_SHAPES`` mirrors the filters
+the routes issue, and ``check_query_plans`` runs ``explain()`` on each one
+and reports any that fall back to a collection scan. Run this file directly
+to check a deployment: it exits non-zero if any route would COLLSCAN.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "tourists": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("last_seen", ASCENDING)], name="status_last_seen"),
+        IndexModel([("zone_type", ASCENDING)], name="zone_type"),
+        IndexModel([("changed_at", ASCENDING)], name="changed_at"),
+        IndexModel([("geo", GEOSPHERE)], name="geo_2dsphere"),
+    ],
+    "incidents": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("severity", ASCENDING)], name="status_severity"),
+        IndexModel([("reported_at", DESCENDING), ("id", DESCENDING)], name="reported_at_id"),
+    ],
+    "zones": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "officer_positions": [
+        IndexModel([("officer_id", ASCENDING)], name="officer_id_unique", unique=True),
+    ],
+    "incident_rollups": [
+        IndexModel(
+            [("granularity", ASCENDING), ("bucket", ASCENDING), ("type", ASCENDING),
+             ("severity", ASCENDING), ("status", ASCENDING), ("zone_type", ASCENDING)],
+            name="bucket_dimensions_unique", unique=True,
+        ),
+    ],
+    "location_tracks": [
+        # Not unique: a busy day rolls over into more than one bucket
+        IndexModel([("tourist_id", ASCENDING), ("day", ASCENDING), ("start", ASCENDING)], name="tourist_day_start"),
+        IndexModel([("simplified", ASCENDING), ("day", ASCENDING)], name="simplified_day"),
+    ],
+}
+
+# Indexes an earlier release created that now get in the way
+RETIRED_INDEXES = {
+    "location_tracks": ["tourist_day_unique"],
+}
+
+_PROBE_TIME = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# (route, collection, filter, sort) for the query shapes the routes issue
+QUERY_SHAPES = [
+    ("auth: user by email", "users", {"email": "probe@example.com"}, None),
+    ("tourists: by id", "tourists", {"id": "probe"}, None),
+    ("tourists: keyset page", "tourists", {"id": {"$gt": "probe"}}, [("id", ASCENDING)]),
+    ("tourists: by status", "tourists", {"status": "missing"}, None),
+    ("tourists: overdue heartbeat", "tourists",
+     {"status": "active", "last_seen": {"$lt": _PROBE_TIME}}, None),
+    ("tourists: staleness range", "tourists",
+     {"status": {"$in": ["active", "missing", "emergency"]}, "last_seen": {"$gte": _PROBE_TIME, "$lt": _PROBE_TIME}}, None),
+    ("tourists: changed since", "tourists", {"changed_at": {"$gte": _PROBE_TIME}}, None),
+    ("tourists: by zone", "tourists", {"zone_type": "danger"}, None),
+    ("incidents: by id", "incidents", {"id": "probe"}, None),
+    ("incidents: emergency count", "incidents",
+     {"status": "open", "severity": {"$in": ["high", "critical"]}}, None),
+    ("incidents: awaiting dispatch", "incidents",
+     {"status": {"$in": ["open", "investigating"]}, "assigned_officer": None}, None),
+    ("tracks: tourist day range", "location_tracks",
+     {"tourist_id": "probe", "day": {"$gte": "2000-01-01", "$lte": "2000-01-02"}}, [("day", ASCENDING), ("start", ASCENDING)]),
+    ("tracks: bucket with room", "location_tracks",
+     {"tourist_id": "probe", "day": "2000-01-01", "count": {"$lt": 1}}, None),
+    ("tracks: awaiting simplification", "location_tracks", {"simplified": False, "day": {"$lt": "2000-01-01"}}, None),
+    ("officers: by id", "officer_positions", {"officer_id": "probe"}, None),
+    ("incidents: keyset page", "incidents",
+     {"$or": [{"reported_at": {"$lt": _PROBE_TIME}}, {"reported_at": _PROBE_TIME, "id": {"$lt": "probe"}}]},
+     [("reported_at", DESCENDING), ("id", DESCENDING)]),
+    ("rollups: bucket range", "incident_rollups",
+     {"granularity": "hour", "bucket": {"$gte": _PROBE_TIME, "$lt": _PROBE_TIME}}, None),
+    ("incidents: export range", "incidents",
+     {"reported_at": {"$gte": _PROBE_TIME}}, [("reported_at", ASCENDING), ("id", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create every declared index; existing ones with the same spec are a no-op."""
+    for collection, names in RETIRED_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info("Dropped retired index %s.%s", collection, name)
+    for collection, models in INDEX_SPECS.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as exc:
+            # e.g. duplicate emails predating the unique index; keep serving
+            logger.error("Could not create indexes on %s: %s", collection, exc)
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def check_query_plans(db) -> list:
+    """Explain each route's query shape and return the names of those that COLLSCAN."""
+    offenders = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        winning_plan = explained.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_stages(winning_plan)):
+            offenders.append(name)
+            logger.warning("Query plan check: %s (%s %s) uses COLLSCAN", name, collection, query)
+    if not offenders:
+        logger.info("Query plan check: all %d route query shapes use an index", len(QUERY_SHAPES))
+    return offenders
+
+
+async def main() -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    if "--create" in sys.argv:
+        await ensure_indexes(db)
+    offenders = await check_query_plans(db)
+    client.close()
+    return 1 if offenders else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,46 @@
+"""Mongo-backed leader lease so one uvicorn worker runs each singleton job."""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class LeaderLease:
+    def __init__(self, name: str, ttl_s: float = 30.0):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.acquired = 0
+
+    async def acquire(self, db) -> bool:
+        """Take or renew the lease; returns whether this process holds it."""
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only if we already hold it or it has lapsed; otherwise the
+            # upsert collides with the holder's _id and raises.
+            await db.leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl_s), "renewed_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            self.is_leader = False
+            return False
+        if not self.is_leader:
+            self.acquired += 1
+        self.is_leader = True
+        return True
+
+    async def release(self, db) -> None:
+        if self.is_leader:
+            await db.leases.delete_one({"_id": self.name, "owner": self.owner})
+        self.is_leader = False
+
+    def stats(self) -> dict:
+        return {"name": self.name, "owner": self.owner, "is_leader": self.is_leader, "acquired": self.acquired}
@@ -0,0 +1,200 @@
+"""Write-behind buffer for tourist location pings.
+
+Pings are coalesced per tourist (latest ``ts`` wins) and handed to a flush
+callback in one batch per window, so the database sees a single unordered
+bulk write no matter how often trackers report. An optional history
+callback receives every ping of the window, uncoalesced, for the track store.
+It returns the positions of the pings it could not write. Only those are
+retried, and a ping that fails ``max_history_attempts`` writes is dropped,
+so one unwritable ping can't hold up the rest of the history.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (tourist_id, lat, lng, ts)
+Ping = Tuple[str, float, float, datetime]
+
+
+class BufferFull(Exception):
+    pass
+
+
+class LocationWriteBuffer:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Ping]], Awaitable[None]],
+        flush_interval_s: float = 1.0,
+        flush_size: int = 5000,
+        max_pending: int = 100000,
+        history_fn: Optional[Callable[[List[Ping]], Awaitable[Optional[List[int]]]]] = None,
+        max_history: int = 500000,
+        max_history_attempts: int = 5,
+    ):
+        self.flush_fn = flush_fn
+        self.flush_interval_s = flush_interval_s
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self.history_fn = history_fn
+        self.max_history = max_history
+        self.max_history_attempts = max_history_attempts
+        self._pending: Dict[str, Ping] = {}
+        self._history: List[Ping] = []
+        # Failed writes so far, parallel to ``_history``
+        self._history_attempts: List[int] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        self.received = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.history_written = 0
+        self.history_errors = 0
+        self.history_dropped = 0
+        self.last_flush_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def offer(self, pings: Iterable[Ping]) -> int:
+        """Queue a batch of pings, returning how many were coalesced away.
+
+        The whole batch is refused with ``BufferFull`` if it would push the
+        buffer past ``max_pending`` distinct tourists (or ``max_history``
+        unwritten history pings); callers should retry. Timestamps must all be
+        timezone-aware; a batch whose timestamps can't be compared raises
+        ``TypeError`` and leaves the buffer as it was.
+        """
+        pings = list(pings)
+        new_keys = {ping[0] for ping in pings if ping[0] not in self._pending}
+        if (len(self._pending) + len(new_keys) > self.max_pending
+                or (self.history_fn is not None and len(self._history) + len(pings) > self.max_history)):
+            self.rejected += len(pings)
+            raise BufferFull()
+
+        # Resolved aside, so a batch that fails to compare leaves no trace in the buffer
+        latest: Dict[str, Ping] = {}
+        coalesced = 0
+        for ping in pings:
+            current = latest.get(ping[0]) or self._pending.get(ping[0])
+            if current is not None:
+                coalesced += 1
+                if current[3] > ping[3]:
+                    continue
+            latest[ping[0]] = ping
+        self._pending.update(latest)
+        if self.history_fn is not None:
+            self._history.extend(pings)
+            self._history_attempts.extend([0] * len(pings))
+        self.received += len(pings)
+        self.coalesced += coalesced
+
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+        return coalesced
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending and not self._history:
+                return 0
+            batch, self._pending = self._pending, {}
+            history, self._history = self._history, []
+            attempts, self._history_attempts = self._history_attempts, []
+            started = time.perf_counter()
+            try:
+                if batch:
+                    await self.flush_fn(list(batch.values()))
+            except Exception:
+                self.flush_errors += 1
+                logger.exception("Location flush of %d pings failed; requeueing", len(batch))
+                # Newer pings that arrived during the failed flush take precedence
+                for key, ping in batch.items():
+                    current = self._pending.get(key)
+                    if current is None or current[3] < ping[3]:
+                        self._pending[key] = ping
+                self._history[:0] = history
+                self._history_attempts[:0] = attempts
+                return 0
+            if history:
+                try:
+                    failed = await self.history_fn(history) or []
+                except Exception:
+                    logger.exception("Track write of %d pings failed", len(history))
+                    failed = range(len(history))
+                if failed:
+                    self.history_errors += 1
+                    self._requeue_history(history, attempts, failed)
+                self.history_written += len(history) - len(failed)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _requeue_history(self, history: List[Ping], attempts: List[int], failed: Iterable[int]) -> None:
+        retry, retry_attempts = [], []
+        dropped = 0
+        for position in failed:
+            if attempts[position] + 1 >= self.max_history_attempts:
+                dropped += 1
+                continue
+            retry.append(history[position])
+            retry_attempts.append(attempts[position] + 1)
+        if dropped:
+            self.history_dropped += dropped
+            logger.error("Dropping %d track pings after %d failed writes", dropped, self.max_history_attempts)
+        if retry:
+            logger.warning("Requeueing %d track pings after a failed write", len(retry))
+        self._history[:0] = retry
+        self._history_attempts[:0] = retry_attempts
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Shielded so shutdown can't cancel a batch that is already in flight
+            await asyncio.shield(self.flush())
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "history_pending": len(self._history),
+            "history_written": self.history_written,
+            "history_errors": self.history_errors,
+            "history_dropped": self.history_dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "flush_interval_s": self.flush_interval_s,
+            "flush_size": self.flush_size,
+            "max_pending": self.max_pending,
+        }
@@ -0,0 +1,246 @@
+"""Prometheus-format metrics without a client library.
+
+``MetricsMiddleware`` times every HTTP request by route template into
+``HttpMetrics``. ``MongoCommandMetrics`` is a pymongo ``CommandListener``
+that times every command by collection. ``render`` writes both, plus any
+gauges passed in, in the Prometheus text exposition format. ``StackSampler`` is an on-demand
+sampling profiler that returns collapsed stacks, ready for flamegraph.pl
+or speedscope.
+"""
+
+import bisect
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS_BYTES = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        # Mongo listeners fire on driver threads
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts, then +Inf, then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class HttpMetrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = CounterMetric(
+            "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+        self.latency = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"), LATENCY_BUCKETS_S)
+        self.request_size = Histogram(
+            "http_request_size_bytes", "HTTP request body size by route.", ("method", "route"), SIZE_BUCKETS_BYTES)
+        self.response_size = Histogram(
+            "http_response_size_bytes", "HTTP response body size by route.", ("method", "route"), SIZE_BUCKETS_BYTES)
+
+    def render(self) -> List[str]:
+        return [
+            "# HELP http_requests_in_flight HTTP requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            *self.requests.render(),
+            *self.latency.render(),
+            *self.request_size.render(),
+            *self.response_size.render(),
+        ]
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding ``HttpMetrics`` for every HTTP request."""
+
+    def __init__(self, app, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            # The router stores the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            request_bytes = 0
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length":
+                    request_bytes = int(value or 0)
+                    break
+            metrics.requests.inc(labels + (str(status),))
+            metrics.latency.observe(labels, elapsed)
+            metrics.request_size.observe(labels, request_bytes)
+            metrics.response_size.observe(labels, response_bytes)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Driver-level latency per command and collection, measured by pymongo itself."""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+        self.latency = Histogram(
+            "mongodb_command_duration_seconds", "MongoDB command latency by command and collection.",
+            ("command", "collection"), LATENCY_BUCKETS_S)
+        self.failures = CounterMetric(
+            "mongodb_command_failures_total", "Failed MongoDB commands by command and collection.",
+            ("command", "collection"))
+
+    def started(self, event):
+        # getMore names its collection separately; the command value is the cursor id
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        else:
+            target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        self._collections[(event.request_id, event.operation_id)] = collection
+
+    def _finish(self, event) -> Tuple[str, str]:
+        collection = self._collections.pop((event.request_id, event.operation_id), "")
+        return event.command_name, collection
+
+    def succeeded(self, event):
+        self.latency.observe(self._finish(event), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        self.latency.observe(labels, event.duration_micros / 1e6)
+        self.failures.inc(labels)
+
+    def render(self) -> List[str]:
+        return [*self.latency.render(), *self.failures.render()]
+
+
+def component_gauges(components: Dict[str, dict]) -> List[str]:
+    """Numeric fields of the components' ``stats()`` dicts as one labelled gauge."""
+    lines = [
+        "# HELP sahyatri_component_stat Numeric fields from /api/system/stats.",
+        "# TYPE sahyatri_component_stat gauge",
+    ]
+    for component, stats in components.items():
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f"sahyatri_component_stat{_labels(('component', 'stat'), (component, key))} {value}")
+    return lines
+
+
+def render(*sections: Iterable[str]) -> str:
+    lines = []
+    for section in sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Samples every thread's stack at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval_s: float = 0.005) -> Counter:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being taken")
+        try:
+            me = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    frames.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(frames))] += 1
+                time.sleep(interval_s)
+            return stacks
+        finally:
+            self._lock.release()
@@ -0,0 +1,84 @@
+"""Keyset pagination and NDJSON streaming for list endpoints.
+
+Cursors are opaque URL-safe tokens that encode the sort key of the last row
+a client has seen, so every page is an index range scan rather than a skip.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+import orjson
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key: dict) -> str:
+    raw = json.dumps(key, default=_json_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(key, dict):
+        raise InvalidCursor("Malformed cursor")
+    return key
+
+
+def tourist_keyset(cursor: Optional[str]) -> Tuple[dict, list]:
+    """Filter and sort for tourists, ordered by ``id`` ascending."""
+    sort = [("id", 1)]
+    if not cursor:
+        return {}, sort
+    key = decode_cursor(cursor)
+    if not isinstance(key.get("id"), str):
+        raise InvalidCursor("Malformed cursor")
+    return {"id": {"$gt": key["id"]}}, sort
+
+
+def tourist_cursor(doc: dict) -> str:
+    return encode_cursor({"id": doc["id"]})
+
+
+def incident_keyset(cursor: Optional[str]) -> Tuple[dict, list]:
+    """Filter and sort for incidents, newest first with ``id`` as the tie-breaker."""
+    sort = [("reported_at", -1), ("id", -1)]
+    if not cursor:
+        return {}, sort
+    key = decode_cursor(cursor)
+    try:
+        reported_at = datetime.fromisoformat(key["reported_at"])
+        last_id = key["id"]
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    return {"$or": [
+        {"reported_at": {"$lt": reported_at}},
+        {"reported_at": reported_at, "id": {"$lt": last_id}},
+    ]}, sort
+
+
+def incident_cursor(doc: dict) -> str:
+    return encode_cursor({"reported_at": doc["reported_at"], "id": doc["id"]})
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def ndjson_rows(cursor) -> AsyncIterator[bytes]:
+    """Encode each document of a Motor cursor as one JSON line as soon as it arrives."""
+    async for doc in cursor:
+        yield orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
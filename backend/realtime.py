@@ -0,0 +1,138 @@
+"""In-process fan-out of map deltas to WebSocket clients.
+
+Every connected client gets its own bounded queue. Publishing never awaits a
+client: when a queue is full the oldest event is dropped and the client is
+told to resync from the REST endpoints, so one slow connection cannot hold
+up the others. A subscriber that fails while an event is delivered is
+dropped and its stream closed; publishing never raises into the write path
+that triggered it.
+"""
+
+import asyncio
+import logging
+import math
+from typing import List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+def parse_viewport(value) -> Optional[Tuple[float, float, float, float]]:
+    """``[min_lng, min_lat, max_lng, max_lat]`` as finite floats, or None for the whole map.
+
+    Raises ``ValueError`` for anything else.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        raise ValueError("bbox must be [min_lng, min_lat, max_lng, max_lat]")
+    if any(isinstance(part, bool) or not isinstance(part, (int, float)) for part in value):
+        raise ValueError("bbox coordinates must be numbers")
+    min_lng, min_lat, max_lng, max_lat = (float(part) for part in value)
+    if not all(math.isfinite(part) for part in (min_lng, min_lat, max_lng, max_lat)):
+        raise ValueError("bbox coordinates must be finite")
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox minimums must not exceed its maximums")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+class Subscriber:
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # (min_lng, min_lat, max_lng, max_lat); None means the whole map
+        self.bbox: Optional[Sequence[float]] = None
+        self.dropped = 0
+        self.lagged = False
+        self.closed = False
+
+    def sees(self, lat: float, lng: float) -> bool:
+        if self.bbox is None:
+            return True
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+    def push(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+            self.dropped += 1
+            self.lagged = True
+
+    def close(self) -> None:
+        """End the stream; ``next_event`` returns None once the queue is drained of it."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def next_event(self) -> Optional[dict]:
+        if self.closed:
+            return None
+        if self.lagged:
+            self.lagged = False
+            return RESYNC_EVENT
+        return await self.queue.get()
+
+
+class Broadcaster:
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.failed = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.max_queue)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: dict, lat: Optional[float] = None, lng: Optional[float] = None) -> None:
+        """Send one event to every subscriber whose viewport contains ``(lat, lng)``."""
+        self.published += 1
+        failed = []
+        for subscriber in self.subscribers:
+            try:
+                if lat is None or subscriber.sees(lat, lng):
+                    subscriber.push(event)
+            except Exception:
+                logger.exception("Dropping realtime subscriber after a failed delivery")
+                failed.append(subscriber)
+        self._drop(failed)
+
+    def publish_moves(self, moves: List[dict]) -> None:
+        """Send each subscriber one batched event with just the moves inside its viewport."""
+        if not moves or not self.subscribers:
+            return
+        self.published += 1
+        failed = []
+        for subscriber in self.subscribers:
+            try:
+                visible = [move for move in moves if subscriber.sees(move["lat"], move["lng"])]
+                if visible:
+                    subscriber.push({"type": "tourists.moved", "tourists": visible})
+            except Exception:
+                logger.exception("Dropping realtime subscriber after a failed delivery")
+                failed.append(subscriber)
+        self._drop(failed)
+
+    def _drop(self, failed: List[Subscriber]) -> None:
+        for subscriber in failed:
+            self.failed += 1
+            self.unsubscribe(subscriber)
+            subscriber.close()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "queued": sum(s.queue.qsize() for s in self.subscribers),
+            "dropped": sum(s.dropped for s in self.subscribers),
+            "failed": self.failed,
+            "max_queue": self.max_queue,
+        }
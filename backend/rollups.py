@@ -0,0 +1,229 @@
+"""Hourly and daily incident rollups.
+
+``incident_rollups`` holds one document per bucket and combination of type,
+severity, status and zone, with the number of incidents reported in that
+bucket that currently have that status. The write paths keep the counts
+current with ``$inc``. Trend queries read the rollups, whose size depends on
+the time range and the number of combinations, not on how many incidents
+exist.
+
+``rebuild`` recomputes the rollups one day of incidents at a time. Each day
+is aggregated and ``$merge``d over the existing documents, and documents it
+did not produce are dropped. While a day is recomputed, ``RebuildGate``
+holds back this worker's incident writes, so none of them are counted twice
+or lost. Writes through other workers are not held. The only window in
+which they can be miscounted is that one day's aggregation, and running the
+rebuild again corrects it.
+"""
+
+import asyncio
+import uuid
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from geofence import ZONE_TYPES
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DIMENSIONS = ("type", "severity", "status", "zone_type")
+UNKNOWN_ZONE = "unknown"
+ZONE_BATCH_SIZE = 5000
+REBUILD_CHUNK = timedelta(days=1)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == "day" else value
+
+
+def _key(incident: dict, granularity: str) -> dict:
+    return {
+        "granularity": granularity,
+        "bucket": bucket_start(incident["reported_at"], granularity),
+        "type": incident.get("type"),
+        "severity": incident.get("severity"),
+        "status": incident.get("status"),
+        "zone_type": incident.get("zone_type") or UNKNOWN_ZONE,
+    }
+
+
+def rollup_updates(before: Optional[dict], after: Optional[dict]) -> List[UpdateOne]:
+    """``$inc`` upserts for an incident insert (``before`` is None) or status change."""
+    if before is not None and after is not None and all(before.get(d) == after.get(d) for d in DIMENSIONS):
+        return []
+    operations = []
+    for granularity in GRANULARITIES:
+        if before is not None:
+            operations.append(UpdateOne(_key(before, granularity), {"$inc": {"count": -1}}))
+        if after is not None:
+            operations.append(UpdateOne(_key(after, granularity), {"$inc": {"count": 1}}, upsert=True))
+    return operations
+
+
+def _truncate(granularity: str) -> dict:
+    parts = {
+        "year": {"$year": "$reported_at"},
+        "month": {"$month": "$reported_at"},
+        "day": {"$dayOfMonth": "$reported_at"},
+    }
+    if granularity == "hour":
+        parts["hour"] = {"$hour": "$reported_at"}
+    return {"$dateFromParts": parts}
+
+
+def rebuild_pipeline(granularity: str, start: datetime, end: datetime, rebuild_id: str) -> List[dict]:
+    """Rollups of ``granularity`` for incidents reported in ``[start, end)``, merged over the stored ones."""
+    return [
+        # $merge can't match on null keys; the write paths never store incidents without these
+        {"$match": {"reported_at": {"$gte": start, "$lt": end}, **{d: {"$ne": None} for d in DIMENSIONS[:3]}}},
+        {"$group": {
+            "_id": {
+                "bucket": _truncate(granularity),
+                **{dimension: f"${dimension}" for dimension in DIMENSIONS[:3]},
+                "zone_type": {"$ifNull": ["$zone_type", UNKNOWN_ZONE]},
+            },
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "granularity": {"$literal": granularity},
+            "bucket": "$_id.bucket",
+            **{dimension: f"$_id.{dimension}" for dimension in DIMENSIONS},
+            "count": 1,
+            "rebuild_id": {"$literal": rebuild_id},
+        }},
+        {"$merge": {
+            "into": "incident_rollups",
+            "on": ["granularity", "bucket", *DIMENSIONS],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+
+
+class RebuildGate:
+    """Incident writes run concurrently with each other, but never while a rebuild chunk is recomputed."""
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._writers = 0
+        self._rebuilding = False
+        self.waits = 0
+
+    @asynccontextmanager
+    async def writing(self):
+        async with self._condition:
+            if self._rebuilding:
+                self.waits += 1
+                await self._condition.wait_for(lambda: not self._rebuilding)
+            self._writers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def rebuilding(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._rebuilding)
+            # Claimed before draining, so new writes queue behind the chunk
+            self._rebuilding = True
+            await self._condition.wait_for(lambda: self._writers == 0)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._rebuilding = False
+                self._condition.notify_all()
+
+
+async def stamp_zones(db, classify) -> int:
+    """Record ``zone_type`` on located incidents written before it was stored."""
+    stamped = 0
+    batch = []
+
+    async def flush():
+        codes = classify([doc["location"]["lat"] for doc in batch], [doc["location"]["lng"] for doc in batch])
+        await db.incidents.bulk_write(
+            [UpdateOne({"id": doc["id"]}, {"$set": {"zone_type": ZONE_TYPES[code]}}) for doc, code in zip(batch, codes.tolist())],
+            ordered=False,
+        )
+
+    query = {"zone_type": None, "location.lat": {"$exists": True}, "location.lng": {"$exists": True}}
+    async for doc in db.incidents.find(query, {"_id": 0, "id": 1, "location": 1}).batch_size(ZONE_BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= ZONE_BATCH_SIZE:
+            await flush()
+            stamped += len(batch)
+            batch = []
+    if batch:
+        await flush()
+        stamped += len(batch)
+    return stamped
+
+
+async def rebuild(db, classify, gate: RebuildGate, chunk: timedelta = REBUILD_CHUNK) -> dict:
+    """Stamp missing zones, then recompute every rollup one ``chunk`` of incidents at a time."""
+    stamped = await stamp_zones(db, classify)
+    rebuild_id = uuid.uuid4().hex
+    dated = {"reported_at": {"$type": "date"}}
+    first = await db.incidents.find_one(dated, {"_id": 0, "reported_at": 1}, sort=[("reported_at", 1)])
+    last = await db.incidents.find_one(dated, {"_id": 0, "reported_at": 1}, sort=[("reported_at", -1)])
+    # Through the end of today, so incidents reported while this runs fall inside the range
+    today = bucket_start(datetime.now(timezone.utc), "day")
+    start = today if first is None else min(today, bucket_start(first["reported_at"], "day"))
+    end = (today if last is None else max(today, bucket_start(last["reported_at"], "day"))) + GRANULARITIES["day"]
+    chunks = 0
+    lower = start
+    while lower < end:
+        upper = min(lower + chunk, end)
+        async with gate.rebuilding():
+            for granularity in GRANULARITIES:
+                await db.incidents.aggregate(rebuild_pipeline(granularity, lower, upper, rebuild_id)).to_list(None)
+            # Combinations no incident has any more
+            await db.incident_rollups.delete_many(
+                {"bucket": {"$gte": lower, "$lt": upper}, "rebuild_id": {"$ne": rebuild_id}},
+            )
+        chunks += 1
+        lower = upper
+    async with gate.rebuilding():
+        await db.incident_rollups.delete_many({"$or": [{"bucket": {"$lt": start}}, {"bucket": {"$gte": end}}]})
+    return {
+        "zones_stamped": stamped,
+        "chunks": chunks,
+        "rollups": await db.incident_rollups.count_documents({}),
+    }
+
+
+def series(docs: Iterable[dict], granularity: str, start: datetime, end: datetime) -> List[dict]:
+    """One entry per bucket in ``[start, end)``, with totals broken down by every dimension."""
+    buckets: Dict[datetime, Dict[str, Counter]] = defaultdict(lambda: {d: Counter() for d in DIMENSIONS})
+    totals: Counter = Counter()
+    for doc in docs:
+        bucket = bucket_start(doc["bucket"], granularity)
+        count = doc.get("count", 0)
+        if count <= 0:
+            continue
+        totals[bucket] += count
+        for dimension in DIMENSIONS:
+            buckets[bucket][dimension][doc.get(dimension)] += count
+
+    step = GRANULARITIES[granularity]
+    result = []
+    bucket = bucket_start(start, granularity)
+    while bucket < end:
+        breakdown = buckets.get(bucket)
+        result.append({
+            "bucket": bucket,
+            "total": totals[bucket],
+            **{f"by_{dimension}": dict(breakdown[dimension]) if breakdown else {} for dimension in DIMENSIONS},
+        })
+        bucket += step
+    return result
@@ -0,0 +1,285 @@
+"""Vectorized tourist safety scoring.
+
+A score starts at 100 and loses points for the tourist's zone, nearby open
+incidents, time since the last location ping and risky itinerary items.
+Everything is computed over columnar NumPy arrays so a full population is
+scored in one pass; callers write back only the scores that changed.
+
+Pings rescore a tourist at ``last_seen`` of about now, so the staleness
+penalty would never show on a tourist who stops pinging.
+``StalenessRescorer`` covers that: every ``interval_s`` the lease holder
+queues the tourists whose penalty may have grown since its last pass.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from geo_index import METERS_PER_DEGREE_LAT
+from geofence import haversine_m_vec
+
+logger = logging.getLogger(__name__)
+
+# Indexed by geofence zone code: safe, caution, danger
+ZONE_PENALTY = np.array([0.0, 20.0, 45.0])
+SEVERITY_WEIGHT = {"low": 0.25, "medium": 0.5, "high": 0.75, "critical": 1.0}
+MAX_INCIDENT_PENALTY = 30.0
+STALENESS_PENALTY_PER_HOUR = 2.0
+MAX_STALENESS_PENALTY = 20.0
+# Ages at which the staleness penalty starts to round off a point, and stops growing
+STALENESS_FIRST_POINT_S = 3600.0 * 0.5 / STALENESS_PENALTY_PER_HOUR
+STALENESS_SATURATION_S = 3600.0 * MAX_STALENESS_PENALTY / STALENESS_PENALTY_PER_HOUR
+ITINERARY_PENALTY_PER_HIT = 5.0
+MAX_ITINERARY_PENALTY = 15.0
+ITINERARY_RISK_PATTERN = r"(?i)trek|remote|hik|climb|rafting|jungle|wildlife|border|night|adventure|cave"
+
+
+def itinerary_risk(itineraries: Sequence[Optional[str]]) -> np.ndarray:
+    """Number of risky keywords in each itinerary."""
+    return pd.Series(itineraries, dtype="object").fillna("").str.count(ITINERARY_RISK_PATTERN).to_numpy(dtype=np.float64)
+
+
+def incident_coordinates(incident: dict) -> Optional[Tuple[float, float]]:
+    """``(lat, lng)`` of an incident as floats, or None if it has no usable location."""
+    location = incident.get("location")
+    if not isinstance(location, dict):
+        return None
+    try:
+        lat, lng = float(location["lat"]), float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        # Also rejects NaN
+        return None
+    return lat, lng
+
+
+class _Bands:
+    """Points sorted into latitude bands one radius tall, then by longitude within a band.
+
+    Every point within ``radius_m`` of a query lies in the query's band or one
+    of its two neighbours, inside a longitude window; each of those is a
+    binary search, so a lookup costs O(log n) plus the candidates it returns.
+    """
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, radius_m: float):
+        self.band_deg = radius_m / METERS_PER_DEGREE_LAT
+        rows = np.floor(lats / self.band_deg).astype(np.int64)
+        self.order = np.lexsort((lngs, rows))
+        self.rows = rows[self.order]
+        self.lngs = lngs[self.order]
+
+    def candidates(self, lat: float, lng: float, dlng: float) -> np.ndarray:
+        """Indices, into the arrays given at construction, of points in the query's bounding box."""
+        row = math.floor(lat / self.band_deg)
+        lo = np.searchsorted(self.rows, [row - 1, row, row + 1], "left")
+        hi = np.searchsorted(self.rows, [row - 1, row, row + 1], "right")
+        spans = []
+        for start, end in zip(lo.tolist(), hi.tolist()):
+            if start == end:
+                continue
+            band = self.lngs[start:end]
+            first = start + int(np.searchsorted(band, lng - dlng, "left"))
+            last = start + int(np.searchsorted(band, lng + dlng, "right"))
+            if last > first:
+                spans.append(self.order[first:last])
+        if not spans:
+            return np.zeros(0, dtype=np.int64)
+        return spans[0] if len(spans) == 1 else np.concatenate(spans)
+
+
+class OpenIncidentIndex:
+    """Coordinates and severity weights of open incidents, kept current by the write paths.
+
+    Scoring reads this instead of fetching every open incident per rescore.
+    ``closeness`` walks whichever side is smaller, tourists or incidents, and
+    looks up the other through ``_Bands``, so its cost follows the number of
+    nearby pairs rather than tourists times incidents. ``version`` records the
+    shared incidents version the index was loaded at, so callers can reload
+    it once other workers have written incidents.
+    """
+
+    def __init__(self, radius_m: float):
+        self.radius_m = radius_m
+        self.ready = False
+        self.version = None
+        self._incidents: Dict[str, Tuple[float, float, float]] = {}
+        # (lats, lngs, weights, bands), rebuilt on the first lookup after a change
+        self._arrays = None
+
+    def __len__(self) -> int:
+        return len(self._incidents)
+
+    def add(self, incident: dict) -> None:
+        coordinates = incident_coordinates(incident)
+        if coordinates is None:
+            return
+        self._incidents[incident["id"]] = (*coordinates, SEVERITY_WEIGHT.get(incident.get("severity"), 0.5))
+        self._arrays = None
+
+    def remove(self, incident_id: str) -> None:
+        if self._incidents.pop(incident_id, None) is not None:
+            self._arrays = None
+
+    def load(self, incidents: Iterable[dict], version=None) -> None:
+        self._incidents = {}
+        self._arrays = None
+        for incident in incidents:
+            self.add(incident)
+        self.version = version
+        self.ready = True
+
+    def snapshot(self) -> tuple:
+        """Immutable ``(lats, lngs, weights, bands)`` view of the current incidents."""
+        if self._arrays is None:
+            values = np.array(list(self._incidents.values()), dtype=np.float64).reshape(-1, 3)
+            lats, lngs, weights = values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy()
+            self._arrays = (lats, lngs, weights, _Bands(lats, lngs, self.radius_m))
+        return self._arrays
+
+    def closeness(self, lats: np.ndarray, lngs: np.ndarray, snapshot: Optional[tuple] = None) -> np.ndarray:
+        """Worst severity-weighted closeness (0..1) of each point to any open incident within the radius.
+
+        Given a ``snapshot`` taken on the event loop, this touches nothing the
+        write paths change, so it can run in a worker thread.
+        """
+        incident_lats, incident_lngs, weights, incident_bands = snapshot or self.snapshot()
+        closeness = np.zeros(lats.shape, dtype=np.float64)
+        if not len(incident_lats) or not len(lats):
+            return closeness
+        radius_m = self.radius_m
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        if len(lats) <= len(incident_lats):
+            for i, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist())):
+                near = incident_bands.candidates(lat, lng, _dlng(lat, dlat))
+                if near.size == 0:
+                    continue
+                distance = haversine_m_vec(incident_lats[near], incident_lngs[near], lat, lng)
+                closeness[i] = np.max(weights[near] * np.clip(1.0 - distance / radius_m, 0.0, 1.0))
+            return closeness
+        tourist_bands = _Bands(lats, lngs, radius_m)
+        for lat, lng, weight in zip(incident_lats.tolist(), incident_lngs.tolist(), weights.tolist()):
+            near = tourist_bands.candidates(lat, lng, _dlng(lat, dlat))
+            if near.size == 0:
+                continue
+            distance = haversine_m_vec(lats[near], lngs[near], lat, lng)
+            closeness[near] = np.maximum(closeness[near], weight * np.clip(1.0 - distance / radius_m, 0.0, 1.0))
+        return closeness
+
+    def stats(self) -> dict:
+        return {"open_incidents": len(self._incidents), "ready": self.ready}
+
+
+def _dlng(lat: float, dlat: float) -> float:
+    # Longitude half-width of a box ``dlat`` tall; widest at the poleward edge of the box
+    return min(dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 90.0))), 1e-6), 180.0)
+
+
+def compute_scores(
+    zone_codes: np.ndarray,
+    closeness: np.ndarray,
+    hours_since_seen: np.ndarray,
+    itinerary_hits: np.ndarray,
+) -> np.ndarray:
+    penalty = (
+        ZONE_PENALTY[zone_codes]
+        + MAX_INCIDENT_PENALTY * closeness
+        + np.minimum(MAX_STALENESS_PENALTY, STALENESS_PENALTY_PER_HOUR * np.maximum(hours_since_seen, 0.0))
+        + np.minimum(MAX_ITINERARY_PENALTY, ITINERARY_PENALTY_PER_HIT * itinerary_hits)
+    )
+    return np.clip(np.rint(100.0 - penalty), 1, 100).astype(np.int64)
+
+
+class RescoreQueue:
+    """Collects tourist ids that need rescoring and drains them in batches on one background task."""
+
+    def __init__(self, rescore_fn: Callable[[List[str]], Awaitable[object]], batch_size: int = 5000):
+        self.rescore_fn = rescore_fn
+        self.batch_size = batch_size
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.rescored = 0
+
+    def schedule(self, tourist_ids: Iterable[str]) -> None:
+        self._pending.update(tourist_ids)
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._pending:
+            batch = [self._pending.pop() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self.rescore_fn(batch)
+                self.rescored += len(batch)
+            except Exception:
+                logger.exception("Incremental rescore of %d tourists failed", len(batch))
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "rescored": self.rescored}
+
+
+class StalenessRescorer:
+    """Periodically queues tourists whose staleness penalty is still growing.
+
+    ``find_stale(oldest, newest)`` returns the ids of tourists last seen
+    between those epoch seconds. Only the holder of ``lease`` runs passes.
+    """
+
+    def __init__(self, find_stale: Callable[[float, float], Awaitable[List[str]]], queue: RescoreQueue,
+                 lease, interval_s: float = 1800.0):
+        self.find_stale = find_stale
+        self.queue = queue
+        self.lease = lease
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+        self.passes = 0
+        self.scheduled = 0
+        self.errors = 0
+
+    async def tick(self, db) -> int:
+        if not await self.lease.acquire(db):
+            return 0
+        now = time.time()
+        # Saturated since the previous pass at the oldest; old enough to have lost a point at the newest
+        tourist_ids = await self.find_stale(now - STALENESS_SATURATION_S - self.interval_s, now - STALENESS_FIRST_POINT_S)
+        self.queue.schedule(tourist_ids)
+        self.passes += 1
+        self.scheduled += len(tourist_ids)
+        return len(tourist_ids)
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                await self.tick(db)
+            except Exception:
+                self.errors += 1
+                logger.exception("Staleness rescore pass failed")
+            await asyncio.sleep(self.interval_s)
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self, db) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.lease.release(db)
+
+    def stats(self) -> dict:
+        return {
+            "staleness_passes": self.passes,
+            "staleness_scheduled": self.scheduled,
+            "staleness_errors": self.errors,
+            "staleness_leader": self.lease.is_leader,
+        }
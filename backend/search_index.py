@@ -0,0 +1,254 @@
+"""Prefix search over tourists' name, passport number, phone and hotel.
+
+Every word of a name or hotel name, the whole passport number and the
+phone's digits are indexed as lowercase tokens. At bulk load they are sorted
+into one fixed-width numpy array. A query term then costs two binary searches
+for its prefix range, whatever the number of tourists. Tourists added later
+go into a small sorted overflow list that is merged into the arrays once it
+grows. Each query term must prefix-match some token of a tourist. Exact
+tokens outrank partial ones, and passport/phone matches outrank name
+matches, which outrank hotel matches.
+"""
+
+import bisect
+import functools
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAX_TOKEN_BYTES = 24
+# Per field code: name, passport_number, phone, hotel_name
+FIELD_WEIGHTS = np.array([3.0, 4.0, 4.0, 1.0], dtype=np.float32)
+_WORD = re.compile(r"\w+")
+_NON_WORD = re.compile(r"\W+")
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+@functools.lru_cache(maxsize=65536)
+def _hotel_words(hotel: str) -> Tuple[bytes, ...]:
+    # Many tourists share a hotel
+    return tuple(word.encode() for word in set(_WORD.findall(hotel.lower())))
+
+
+def document_tokens(doc: dict) -> List[Tuple[bytes, int]]:
+    """(token, field code) pairs for one tourist document."""
+    tokens = []
+    name = doc.get("name")
+    if name:
+        tokens.extend((word.encode(), 0) for word in set(_WORD.findall(name.lower())))
+    passport = doc.get("passport_number")
+    if passport:
+        tokens.append((_NON_WORD.sub("", passport.lower()).encode(), 1))
+    phone = doc.get("phone")
+    if phone:
+        digits = _NON_DIGIT.sub("", phone)
+        if digits:
+            tokens.append((digits.encode(), 2))
+            if len(digits) > 10:
+                # Also the national number, so numbers typed without the country code match
+                tokens.append((digits[-10:].encode(), 2))
+    hotel = doc.get("hotel_name")
+    if hotel:
+        tokens.extend((word, 3) for word in _hotel_words(hotel))
+    return [token for token in tokens if token[0]]
+
+
+def _best_per_doc(docs: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Highest score per document, as arrays sorted by document."""
+    if len(docs) == 0:
+        return docs, scores
+    order = np.lexsort((-scores, docs))
+    docs, scores = docs[order], scores[order]
+    first = np.ones(len(docs), dtype=bool)
+    first[1:] = docs[1:] != docs[:-1]
+    return docs[first], scores[first]
+
+
+class TouristSearchIndex:
+    def __init__(self, merge_threshold: int = 50000):
+        self.merge_threshold = merge_threshold
+        self._ids: List[str] = []
+        self._slot: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Sorted tokens with their document slot, field code and full length
+        self._tokens = np.zeros(0, dtype=f"S{MAX_TOKEN_BYTES}")
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._fields = np.zeros(0, dtype=np.int8)
+        self._lengths = np.zeros(0, dtype=np.uint16)
+        # Tokens added since the last merge: sorted (token, slot, field, length) tuples
+        self._overflow: List[Tuple[bytes, int, int, int]] = []
+        self.merges = 0
+        self.searches = 0
+        self.search_ns = 0
+        self.build_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def __contains__(self, tourist_id: str) -> bool:
+        return tourist_id in self._slot
+
+    def _new_slot(self, tourist_id: str) -> int:
+        previous = self._slot.get(tourist_id)
+        if previous is not None:
+            # Replaced tourists keep a dead slot until the next bulk load
+            self._alive[previous] = False
+        slot = len(self._ids)
+        self._ids.append(tourist_id)
+        self._slot[tourist_id] = slot
+        if slot >= len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(max(1024, len(self._alive)), dtype=bool)])
+        self._alive[slot] = True
+        return slot
+
+    def load(self, docs: Iterable[dict]) -> None:
+        started = time.perf_counter()
+        self._ids, self._slot = [], {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._overflow = []
+        tokens, slots, fields = [], [], []
+        for doc in docs:
+            slot = self._new_slot(doc["id"])
+            for token, code in document_tokens(doc):
+                tokens.append(token)
+                slots.append(slot)
+                fields.append(code)
+        self._set_arrays(tokens, slots, fields, [len(token) for token in tokens])
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def _set_arrays(self, tokens, slots, fields, lengths) -> None:
+        token_array = np.array(tokens, dtype=f"S{MAX_TOKEN_BYTES}")
+        order = np.argsort(token_array, kind="stable")
+        self._tokens = token_array[order]
+        self._docs = np.array(slots, dtype=np.int32)[order]
+        self._fields = np.array(fields, dtype=np.int8)[order]
+        self._lengths = np.minimum(np.array(lengths, dtype=np.int64), 65535).astype(np.uint16)[order]
+
+    def _merge(self) -> None:
+        tokens, slots, fields, lengths = zip(*self._overflow)
+        self._set_arrays(
+            np.concatenate([self._tokens, np.array(tokens, dtype=self._tokens.dtype)]),
+            np.concatenate([self._docs, np.array(slots, dtype=np.int32)]),
+            np.concatenate([self._fields, np.array(fields, dtype=np.int8)]),
+            np.concatenate([self._lengths, np.array(lengths, dtype=np.uint16)]),
+        )
+        self._overflow = []
+        self.merges += 1
+
+    def add(self, doc: dict) -> None:
+        """Index a new tourist, or re-index one whose searchable fields changed."""
+        slot = self._new_slot(doc["id"])
+        for token, code in document_tokens(doc):
+            bisect.insort(self._overflow, (token[:MAX_TOKEN_BYTES], slot, code, len(token)))
+        if len(self._overflow) >= self.merge_threshold:
+            self._merge()
+
+    def remove(self, tourist_id: str) -> None:
+        slot = self._slot.pop(tourist_id, None)
+        if slot is not None:
+            self._alive[slot] = False
+
+    def clear(self) -> None:
+        self.load(())
+
+    def _rows(self, term: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Document slot, field code and token length of every token starting with ``term``."""
+        key = term[:MAX_TOKEN_BYTES]
+        # UTF-8 never contains 0xff, so this bounds every token starting with ``key``
+        lo = np.searchsorted(self._tokens, key, "left")
+        hi = np.searchsorted(self._tokens, key + b"\xff", "left")
+        docs = self._docs[lo:hi]
+        fields = self._fields[lo:hi]
+        lengths = self._lengths[lo:hi]
+
+        start = bisect.bisect_left(self._overflow, (key,))
+        end = start
+        while end < len(self._overflow) and self._overflow[end][0].startswith(key):
+            end += 1
+        if end > start:
+            _, slots, codes, sizes = zip(*self._overflow[start:end])
+            docs = np.concatenate([docs, np.array(slots, dtype=np.int32)])
+            fields = np.concatenate([fields, np.array(codes, dtype=np.int8)])
+            lengths = np.concatenate([lengths, np.array(sizes, dtype=np.uint16)])
+        return docs, fields, lengths
+
+    def _term(self, term: bytes, rows, candidates: Optional[np.ndarray] = None,
+              limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best score per document for one query term, optionally only for ``candidates``."""
+        docs, fields, lengths = rows
+        if candidates is not None:
+            wanted = np.zeros(len(self._alive), dtype=bool)
+            wanted[candidates] = True
+            keep = wanted[docs]
+            docs, fields, lengths = docs[keep], fields[keep], lengths[keep]
+        # Weight times 1..2 by how much of the token the term covers; an exact token scores double
+        scores = (FIELD_WEIGHTS[fields] * (1 + np.minimum(1.0, len(term) / np.maximum(lengths, 1)))).astype(np.float32)
+        if limit is not None and len(docs) > limit * 32:
+            # A broad prefix: the best ``limit`` documents are among the highest-scoring rows
+            top = np.argpartition(-scores, limit * 32 - 1)[:limit * 32]
+            best_docs, best_scores = _best_per_doc(docs[top], scores[top])
+            if len(best_docs) >= limit:
+                return best_docs, best_scores
+        return _best_per_doc(docs, scores)
+
+    def _all_terms(self, terms: List[bytes], limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Most selective term first; the others only score documents still in the running
+        matches = sorted(((term, self._rows(term)) for term in terms), key=lambda match: len(match[1][0]))
+        if len(matches) == 1:
+            term, rows = matches[0]
+            return self._term(term, rows, limit=limit)
+        docs, scores = None, None
+        for term, rows in matches:
+            if docs is None:
+                docs, scores = self._term(term, rows)
+            else:
+                term_docs, term_scores = self._term(term, rows, candidates=docs)
+                docs, left, right = np.intersect1d(docs, term_docs, assume_unique=True, return_indices=True)
+                scores = scores[left] + term_scores[right]
+            if len(docs) == 0:
+                break
+        return docs, scores
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Up to ``limit`` (tourist id, score) pairs, best first."""
+        started = time.perf_counter_ns()
+        words = _words(query)
+        if not words:
+            return []
+        # Headroom so tourists replaced or removed since the last load don't leave the page short
+        wanted = limit + 16
+        docs, scores = self._all_terms([word.encode() for word in words], wanted)
+        if len(words) > 1:
+            # "+44 20 7946" or "AB 123": also try the words run together
+            joined = "".join(words).encode()
+            joined_docs, joined_scores = self._term(joined, self._rows(joined), limit=wanted)
+            docs, scores = _best_per_doc(np.concatenate([docs, joined_docs]), np.concatenate([scores, joined_scores]))
+
+        alive = self._alive[docs]
+        docs, scores = docs[alive], scores[alive]
+        if len(docs) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            docs, scores = docs[top], scores[top]
+        order = np.lexsort((docs, -scores))
+        results = [(self._ids[slot], round(float(score), 3)) for slot, score in zip(docs[order].tolist(), scores[order].tolist())]
+        self.searches += 1
+        self.search_ns += time.perf_counter_ns() - started
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "tourists": len(self._slot),
+            "tokens": int(len(self._tokens)) + len(self._overflow),
+            "overflow": len(self._overflow),
+            "merges": self.merges,
+            "bytes": int(self._tokens.nbytes + self._docs.nbytes + self._fields.nbytes + self._lengths.nbytes),
+            "last_build_ms": round(self.build_ms, 3),
+            "searches": self.searches,
+            "avg_search_us": round(self.search_ns / self.searches / 1000, 1) if self.searches else 0.0,
+        }
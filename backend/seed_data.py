@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Bulk synthetic data generator for scale testing.
+
+Creates tourists, incidents, per-day location tracks and officer accounts
+with a seeded RNG, so the same arguments always produce the same data. Every
+batch derives its own RNG from ``(seed, kind, batch start)``, which keeps runs
+reproducible even though batches are written by several concurrent writers
+using unordered ``insert_many``. Re-running with the same seed skips rows
+that already exist instead of duplicating them. Timestamps are laid out
+backwards from ``--now``, which defaults to a fixed instant rather than the
+wall clock; pass the current time to get data that looks live.
+
+    python seed_data.py --tourists 1000000 --incidents 100000 --officers 500
+    python seed_data.py --tourists 1000 --now "$(date +%s)"
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from geo_index import geo_point
+from geofence import ZONE_TYPES
+from tracks import track_buckets
+
+CENTER = (26.1445, 91.7362)  # Guwahati
+HOTSPOTS = [
+    (26.1445, 91.7362, 0.020),  # city centre
+    (26.1158, 91.7086, 0.015),  # riverside
+    (26.1733, 91.7458, 0.010),  # trekking belt
+    (26.1341, 91.7880, 0.015),  # resorts
+    (26.1689, 91.7631, 0.012),  # tea gardens
+    (26.6100, 93.3500, 0.080),  # Kaziranga
+]
+NATIONALITIES = [
+    ("India", "IN", "+91"), ("USA", "US", "+1"), ("UK", "UK", "+44"), ("Germany", "DE", "+49"),
+    ("Spain", "ES", "+34"), ("Japan", "JP", "+81"), ("France", "FR", "+33"), ("Australia", "AU", "+61"),
+]
+FIRST_NAMES = [
+    "Aarav", "Priya", "John", "Emma", "Hans", "Maria", "Yuki", "Liam", "Olivia", "Noah", "Sofia",
+    "Lukas", "Chloe", "Haruto", "Isabella", "Arjun", "Ananya", "Lucas", "Mia", "Kenji",
+]
+LAST_NAMES = [
+    "Sharma", "Das", "Smith", "Wilson", "Mueller", "Garcia", "Tanaka", "Brown", "Martin", "Sato",
+    "Baruah", "Gogoi", "Schmidt", "Lopez", "Taylor", "Dubois", "Suzuki", "Bora", "Kumar", "Clarke",
+]
+HOTELS = [
+    "Hotel Royal", "Brahmaputra Hotel", "Northeast Inn", "Paradise Resort", "Assam Palace",
+    "Riverside Lodge", "Tea Estate Bungalow", "Kaziranga Jungle Camp", None,
+]
+ITINERARIES = [
+    "Temple tour, Local markets", "Wildlife sanctuary, River cruise", "Adventure trekking, Remote villages",
+    "Cultural sites, Photography", "Tea gardens, Monasteries", "Jungle safari, Night camping",
+    "River rafting, Hiking", "Museums, Food walk", None,
+]
+INCIDENT_TYPES = [("panic", 0.35), ("missing", 0.15), ("medical", 0.3), ("security", 0.2)]
+SEVERITIES = [("low", 0.35), ("medium", 0.35), ("high", 0.2), ("critical", 0.1)]
+INCIDENT_STATUSES = [("open", 0.2), ("investigating", 0.2), ("resolved", 0.6)]
+TOURIST_STATUSES = [("active", 0.97), ("missing", 0.02), ("emergency", 0.01)]
+OFFICER_EMAIL_DOMAIN = "officers.sahyatri.test"
+# Reference time for generated timestamps unless one is given
+DEFAULT_NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _pick(rng: random.Random, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def parse_now(value: str) -> datetime:
+    """Epoch seconds or an ISO 8601 timestamp; a naive timestamp is taken as UTC."""
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class SyntheticData:
+    def __init__(self, seed: int = 42, now: datetime = DEFAULT_NOW):
+        self.seed = seed
+        self.now = now.astimezone(timezone.utc) if now.tzinfo else now.replace(tzinfo=timezone.utc)
+        self._namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"sahyatri-synthetic/{seed}")
+
+    def _rng(self, kind: str, start: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{start}")
+
+    def tourist_id(self, index: int) -> str:
+        return str(uuid.uuid5(self._namespace, f"tourist/{index}"))
+
+    def _position(self, rng: random.Random):
+        lat, lng, spread = rng.choice(HOTSPOTS)
+        return lat + rng.gauss(0, spread), lng + rng.gauss(0, spread)
+
+    def tourists(self, start: int, count: int) -> List[dict]:
+        rng = self._rng("tourists", start)
+        docs = []
+        for index in range(start, start + count):
+            nationality, code, dial = rng.choice(NATIONALITIES)
+            lat, lng = self._position(rng)
+            location = {"lat": lat, "lng": lng}
+            docs.append({
+                "id": self.tourist_id(index),
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "passport_number": f"{code}{rng.randrange(10**8, 10**9)}",
+                "nationality": nationality,
+                "phone": f"{dial}-{rng.randrange(10**9, 10**10)}",
+                "emergency_contact": f"{dial}-{rng.randrange(10**9, 10**10)}",
+                "location": location,
+                "geo": geo_point(location),
+                "safety_score": 100,
+                "zone_type": "safe",
+                "last_seen": self.now - timedelta(minutes=rng.expovariate(1 / 45)),
+                "status": _pick(rng, TOURIST_STATUSES),
+                "hotel_name": rng.choice(HOTELS),
+                "itinerary": rng.choice(ITINERARIES),
+            })
+        return docs
+
+    def incidents(self, start: int, count: int, tourist_count: int, days: int = 30) -> List[dict]:
+        rng = self._rng("incidents", start)
+        docs = []
+        for index in range(start, start + count):
+            lat, lng = self._position(rng)
+            docs.append({
+                "id": str(uuid.uuid5(self._namespace, f"incident/{index}")),
+                "tourist_id": self.tourist_id(rng.randrange(tourist_count)) if tourist_count else "unknown",
+                "type": _pick(rng, INCIDENT_TYPES),
+                "description": "Synthetic incident",
+                "location": {"lat": lat, "lng": lng},
+                "severity": _pick(rng, SEVERITIES),
+                "status": _pick(rng, INCIDENT_STATUSES),
+                "reported_at": self.now - timedelta(seconds=rng.randrange(days * 86400)),
+                "assigned_officer": None,
+            })
+        return docs
+
+    def track_pings(self, tourist_index: int, days: int, pings_per_day: int) -> Iterator[tuple]:
+        """Random-walk ``(ts, lat, lng)`` pings for one tourist, oldest first."""
+        rng = self._rng("tracks", tourist_index)
+        lat, lng = self._position(rng)
+        step = timedelta(seconds=86400 / pings_per_day)
+        # Whole UTC days ending at today's midnight: exactly one bucket per day
+        ts = (self.now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        heading = rng.uniform(0, 2 * math.pi)
+        for _ in range(days * pings_per_day):
+            heading += rng.gauss(0, 0.6)
+            distance_deg = abs(rng.gauss(0.0008, 0.0006))
+            lat += distance_deg * math.cos(heading)
+            lng += distance_deg * math.sin(heading)
+            yield ts, lat, lng
+            ts += step
+
+    def officers(self, start: int, count: int, password_hash: str) -> List[dict]:
+        rng = self._rng("officers", start)
+        return [
+            {
+                "id": str(uuid.uuid5(self._namespace, f"officer/{index}")),
+                "email": f"officer{index}@{OFFICER_EMAIL_DOMAIN}",
+                "name": f"Officer {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "role": "officer",
+                "created_at": self.now,
+                "password_hash": password_hash,
+            }
+            for index in range(start, start + count)
+        ]
+
+
+async def insert_batches(collection, batches: Iterable[List[dict]], writers: int,
+                         on_batch: Callable[[int, int], None]) -> None:
+    """Insert batches with up to ``writers`` unordered ``insert_many`` calls in flight.
+
+    ``on_batch(inserted, skipped)`` is called as each batch lands; duplicates
+    from an earlier run with the same seed are counted as skipped.
+    """
+
+    async def insert(batch):
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            on_batch(len(result.inserted_ids), 0)
+        except BulkWriteError as exc:
+            details = exc.details
+            duplicates = sum(1 for error in details.get("writeErrors", []) if error.get("code") == 11000)
+            if duplicates != len(details.get("writeErrors", [])):
+                raise
+            on_batch(details.get("nInserted", 0), duplicates)
+
+    pending = set()
+    for batch in batches:
+        if len(pending) >= writers:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        pending.add(asyncio.create_task(insert(batch)))
+        # Generating a batch is CPU work; let other tasks (and the writers) run
+        await asyncio.sleep(0)
+    for result in await asyncio.gather(*pending, return_exceptions=True):
+        if isinstance(result, Exception):
+            raise result
+
+
+async def generate(
+    db,
+    *,
+    tourists: int = 0,
+    incidents: int = 0,
+    officers: int = 0,
+    history_days: int = 0,
+    pings_per_day: int = 48,
+    seed: int = 42,
+    now: datetime = DEFAULT_NOW,
+    batch_size: int = 5000,
+    writers: int = 4,
+    officer_password_hash: Optional[str] = None,
+    clear: bool = False,
+    classify: Optional[Callable] = None,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> dict:
+    """Write a synthetic data set and return per-collection counts.
+
+    ``classify(lats, lngs)`` (the geofence engine) fills in ``zone_type``;
+    ``progress(kind, done, total)`` is called after every batch.
+    """
+    data = SyntheticData(seed, now)
+    started = time.perf_counter()
+    summary = {}
+
+    if clear:
+        await db.tourists.delete_many({})
+        await db.incidents.delete_many({})
+        await db.location_tracks.delete_many({})
+        await db.users.delete_many({"email": {"$regex": f"@{OFFICER_EMAIL_DOMAIN}$"}})
+
+    async def run(kind, collection, total, batches):
+        counts = {"inserted": 0, "skipped": 0}
+
+        def on_batch(inserted, skipped):
+            counts["inserted"] += inserted
+            counts["skipped"] += skipped
+            if progress:
+                progress(kind, counts["inserted"] + counts["skipped"], total)
+
+        await insert_batches(collection, batches, writers, on_batch)
+        summary[kind] = counts
+
+    def tourist_batches():
+        for start in range(0, tourists, batch_size):
+            docs = data.tourists(start, min(batch_size, tourists - start))
+            if classify is not None:
+                codes = classify([d["location"]["lat"] for d in docs], [d["location"]["lng"] for d in docs])
+                for doc, code in zip(docs, codes.tolist()):
+                    doc["zone_type"] = ZONE_TYPES[code]
+            yield docs
+
+    def incident_batches():
+        for start in range(0, incidents, batch_size):
+            yield data.incidents(start, min(batch_size, incidents - start), tourists)
+
+    def track_batches():
+        batch = []
+        for index in range(tourists):
+            batch.extend(track_buckets(data.tourist_id(index), data.track_pings(index, history_days, pings_per_day)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def officer_batches():
+        for start in range(0, officers, batch_size):
+            yield data.officers(start, min(batch_size, officers - start), officer_password_hash)
+
+    if tourists:
+        await run("tourists", db.tourists, tourists, tourist_batches())
+    if incidents:
+        await run("incidents", db.incidents, incidents, incident_batches())
+    if tourists and history_days:
+        await run("location_tracks", db.location_tracks, tourists * history_days, track_batches())
+    if officers:
+        if officer_password_hash is None:
+            raise ValueError("officer_password_hash is required to create officers")
+        await run("officers", db.users, officers, officer_batches())
+
+    summary["seed"] = seed
+    summary["now"] = data.now.isoformat()
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+async def main(args) -> None:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from geofence import GeofenceEngine
+    from hashing import PasswordHasher
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    geofence = GeofenceEngine()
+    geofence.load(await db.zones.find({}, {"_id": 0}).to_list(None))
+
+    officer_password_hash = None
+    if args.officers:
+        # One bcrypt call for every officer: they all share the same password
+        hasher = PasswordHasher(workers=1)
+        officer_password_hash = await hasher.hash(args.officer_password)
+        hasher.shutdown()
+
+    last_report = {}
+
+    def progress(kind, done, total):
+        now = time.monotonic()
+        if done < total and now - last_report.get(kind, 0) < 1:
+            return
+        last_report[kind] = now
+        print(f"  {kind:<16} {done:>10}/{total} ({done / total:.0%})", flush=True)
+
+    summary = await generate(
+        db,
+        tourists=args.tourists,
+        incidents=args.incidents,
+        officers=args.officers,
+        history_days=args.history_days,
+        pings_per_day=args.pings_per_day,
+        seed=args.seed,
+        now=args.now,
+        batch_size=args.batch_size,
+        writers=args.writers,
+        officer_password_hash=officer_password_hash,
+        clear=args.clear,
+        classify=geofence.classify if geofence.zones else None,
+        progress=progress,
+    )
+    print(f"Done: {summary}")
+    print("Safety scores start at 100; POST /api/safety-scores/recompute to score the new tourists.")
+    if args.officers:
+        print(f"Officer logins: officerN@{OFFICER_EMAIL_DOMAIN} / {args.officer_password}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tourists", type=int, default=10000)
+    parser.add_argument("--incidents", type=int, default=1000)
+    parser.add_argument("--officers", type=int, default=0)
+    parser.add_argument("--officer-password", default="demo123")
+    parser.add_argument("--history-days", type=int, default=0, help="days of location track per tourist")
+    parser.add_argument("--pings-per-day", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--now", type=parse_now, default=DEFAULT_NOW,
+                        help="reference time for generated timestamps, as epoch seconds or ISO 8601")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=4, help="concurrent insert_many calls")
+    parser.add_argument("--clear", action="store_true", help="delete existing tourists, incidents and tracks first")
+    asyncio.run(main(parser.parse_args()))
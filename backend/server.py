@@ -1,37 +1,156 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 import os
+import asyncio
+import json
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Dict, List, Optional
 import uuid
-from datetime import datetime, timezone
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
 import jwt
-from passlib.context import CryptContext
+import numpy as np
+
+from auth_cache import PrincipalCache
+from batch import BATCH_USER_SCOPE_KEY, combine, maybe_gzip, run_subrequest, split_path
+from clusters import MAX_CLUSTERS, ClusterIndex
+from coalescing import CoalescingWindow
+from dispatch import IMMEDIATE_SEVERITIES, SEVERITY_RANK, DispatchEngine
+import exports
+from hashing import PasswordHasher, PoolSaturated
+from heartbeat import HeartbeatMonitor
+from heatmap import IncidentHeatmap
+from leases import LeaderLease
+from geo_index import GridIndex, geo_point
+from index_resync import IndexResync
+from indexes import check_query_plans, ensure_indexes
+from geofence import DEFAULT_ZONE_TYPE, ZONE_CODES, ZONE_TYPES, GeofenceEngine
+import rollups
+import seed_data
+from search_index import TouristSearchIndex
+from safety_score import OpenIncidentIndex, RescoreQueue, StalenessRescorer, compute_scores, itinerary_risk
+from stats_counters import DashboardCounters, TOURIST_STATUSES
+from location_buffer import BufferFull, LocationWriteBuffer
+from metrics import HttpMetrics, MetricsMiddleware, MongoCommandMetrics, StackSampler, component_gauges, render
+from realtime import Broadcaster, parse_viewport
+from tracks import BUCKET_MAX_POINTS, TrackCompactor, bucket_updates, track_rows
+from versions import CollectionVersions
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, InvalidCursor,
+    incident_cursor, incident_keyset, ndjson_rows, tourist_cursor, tourist_keyset,
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+mongo_metrics = MongoCommandMetrics()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_metrics])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '4')),
+    max_queue=int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '32')),
+)
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
+ACCESS_TOKEN_TTL_S = int(os.environ.get('ACCESS_TOKEN_TTL_S', str(12 * 3600)))
+# Build the principal straight from the token's uid/name/role claims instead of
+# looking the user up. A demoted or deleted user keeps the old role until the
+# token expires, so revocation takes up to ACCESS_TOKEN_TTL_S; tokens without
+# an expiry are always looked up.
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+principal_cache = PrincipalCache(
+    max_size=int(os.environ.get('AUTH_CACHE_SIZE', '10000')),
+    ttl_s=float(os.environ.get('AUTH_CACHE_TTL_S', '60')),
+)
+
+# In-memory mirror of tourist positions, kept in sync on every write
+tourist_grid = GridIndex(cell_deg=float(os.environ.get('GEO_GRID_CELL_DEG', '0.01')))
+
+# Prefix index over name, passport, phone and hotel for officer lookups
+tourist_search = TouristSearchIndex()
+
+# Per-zoom map clusters, counts kept current as tourists move or change status
+map_clusters = ClusterIndex(max_clusters=int(os.environ.get('MAP_MAX_CLUSTERS', str(MAX_CLUSTERS))))
+
+# Incident density per day; rebuilt from Mongo once older than its staleness bound
+_heatmap_bounds = [float(part) for part in os.environ.get('HEATMAP_BOUNDS', '89.5,21.9,97.5,29.5').split(',')]
+incident_heatmap = IncidentHeatmap(
+    bounds=(_heatmap_bounds[1], _heatmap_bounds[0], _heatmap_bounds[3], _heatmap_bounds[2]),
+    cell_deg=float(os.environ.get('HEATMAP_CELL_DEG', '0.01')),
+    retention_days=int(os.environ.get('HEATMAP_RETENTION_DAYS', '30')),
+    max_staleness_s=float(os.environ.get('HEATMAP_MAX_STALENESS_S', '300')),
+)
+heatmap_refresh: Optional[asyncio.Task] = None
+
+# Zone polygons/circles; derives tourists' zone_type on every location write
+geofence = GeofenceEngine()
+ZONE_RELOAD_INTERVAL_S = float(os.environ.get('ZONE_RELOAD_INTERVAL_S', '30'))
+
+# Safety scores are recomputed from zone, nearby open incidents, staleness and itinerary
+SAFETY_INCIDENT_RADIUS_M = float(os.environ.get('SAFETY_INCIDENT_RADIUS_M', '2000'))
+OPEN_INCIDENT_STATUSES = ["open", "investigating"]
+# Kept current by the incident write paths; reloaded once other workers' incident writes are synced
+open_incidents = OpenIncidentIndex(SAFETY_INCIDENT_RADIUS_M)
+
+# Map deltas pushed to WebSocket clients
+broadcaster = Broadcaster(max_queue=int(os.environ.get('WS_CLIENT_QUEUE_SIZE', '256')))
+
+# Dashboard counters, maintained by the write paths and recounted once stale
+dashboard_counters = DashboardCounters(max_staleness_s=float(os.environ.get('STATS_MAX_STALENESS_S', '30')))
+
+# Waiting incidents and free officers; high/critical incidents go to the nearest one
+dispatch = DispatchEngine()
+DISPATCH_MAX_ATTEMPTS = int(os.environ.get('DISPATCH_MAX_ATTEMPTS', '3'))
+
+# Repeat reports of the same (tourist, type) fold into the open incident
+incident_window = CoalescingWindow(
+    window_s=float(os.environ.get('INCIDENT_COALESCE_WINDOW_S', '60')),
+    max_keys=int(os.environ.get('INCIDENT_COALESCE_MAX_KEYS', '100000')),
+)
+
+# Bumped by every write path; list routes derive their ETags from these
+collection_versions = CollectionVersions(
+    ("tourists", "incidents"),
+    sync_interval_s=float(os.environ.get('VERSION_SYNC_INTERVAL_S', '1.0')),
+)
+
+# Prometheus metrics at /metrics and the on-demand stack sampler
+http_metrics = HttpMetrics()
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+stack_sampler = StackSampler()
+
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_RESPONSE_BYTES = int(os.environ.get('BATCH_MAX_RESPONSE_BYTES', str(4 * 1024 * 1024)))
+ROLLUP_MAX_BUCKETS = int(os.environ.get('ROLLUP_MAX_BUCKETS', '2000'))
+# Holds this worker's incident writes while a rollup rebuild recomputes a chunk
+rollup_gate = rollups.RebuildGate()
+MAX_PINGS_PER_BATCH = int(os.environ.get('LOCATION_MAX_PINGS_PER_BATCH', '10000'))
+# How far ahead of the server clock a tracker's ping timestamp may be
+LOCATION_MAX_CLOCK_SKEW_S = float(os.environ.get('LOCATION_MAX_CLOCK_SKEW_S', '300'))
 
 # Models
 class User(BaseModel):
@@ -42,10 +161,10 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserCreate(BaseModel):
+    # No role: self-registered accounts are always officers, and admins are promoted out of band
     email: str
     password: str
     name: str
-    role: str = "officer"
 
 class UserLogin(BaseModel):
     email: str
@@ -55,6 +174,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class Location(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+
 class Tourist(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -62,9 +185,9 @@ class Tourist(BaseModel):
     nationality: str
     phone: str
     emergency_contact: str
-    location: dict  # {"lat": float, "lng": float}
-    safety_score: int  # 1-100
-    zone_type: str  # "safe", "caution", "danger"
+    location: Location
+    safety_score: int = 100  # 1-100, maintained by the scoring engine
+    zone_type: str = DEFAULT_ZONE_TYPE  # "safe", "caution", "danger"; derived from zones
     last_seen: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     status: str = "active"  # active, missing, emergency
     hotel_name: Optional[str] = None
@@ -80,32 +203,492 @@ class Incident(BaseModel):
     status: str = "open"  # open, investigating, resolved
     reported_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     assigned_officer: Optional[str] = None
+    zone_type: Optional[str] = None  # zone at the incident's location when it was reported
+    occurrence_count: int = 1  # reports folded into this incident
+    last_reported_at: Optional[datetime] = None  # latest folded report
+
+class IncidentStatusUpdate(BaseModel):
+    status: str = Field(pattern="^(open|investigating|resolved)$")
+
+class OfficerPosition(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    available: Optional[bool] = None  # on/off duty; unchanged when omitted
+
+class Zone(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    zone_type: str  # "safe", "caution", "danger"
+    shape: str  # "circle", "polygon"
+    center: Optional[Location] = None  # circle
+    radius_m: Optional[float] = None  # circle
+    polygon: Optional[List[Location]] = None  # polygon vertices, in order
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ZoneInput(BaseModel):
+    name: str
+    zone_type: str
+    shape: str
+    center: Optional[Location] = None
+    radius_m: Optional[float] = None
+    polygon: Optional[List[Location]] = None
+
+class SeedRequest(BaseModel):
+    tourists: int = Field(10000, ge=0, le=5_000_000)
+    incidents: int = Field(1000, ge=0, le=5_000_000)
+    officers: int = Field(0, ge=0, le=100_000)
+    officer_password: str = "demo123"
+    history_days: int = Field(0, ge=0, le=30)
+    pings_per_day: int = Field(48, ge=1, le=1440)
+    seed: int = 42
+    # Generated timestamps count back from here; fixed by default so a seed reproduces the same data
+    now: datetime = seed_data.DEFAULT_NOW
+    clear: bool = False
+
+class NearbyTourist(Tourist):
+    distance_m: float
+
+class TouristMatch(Tourist):
+    score: float
+
+class TouristStatusUpdate(BaseModel):
+    status: str
+
+class LocationPing(BaseModel):
+    tourist_id: str
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @field_validator('ts')
+    @classmethod
+    def ts_in_utc(cls, value: datetime) -> datetime:
+        # Naive timestamps are UTC; mixing them with aware ones would break the per-tourist ordering
+        value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        if value > datetime.now(timezone.utc) + timedelta(seconds=LOCATION_MAX_CLOCK_SKEW_S):
+            # A far-future ping would outrank every real one and keep last_seen from ever expiring
+            raise ValueError("ts is ahead of the server clock")
+        return value
+
+class LocationBatch(BaseModel):
+    pings: List[LocationPing] = Field(max_length=MAX_PINGS_PER_BATCH)
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back so clients can match responses
+    path: str  # GET route under /api, with its query string
+    headers: Dict[str, str] = {}  # e.g. If-None-Match
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(min_length=1, max_length=BATCH_MAX_REQUESTS)
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
+
+def tourist_document(tourist: Tourist) -> dict:
+    """Mongo document for a tourist, including the GeoJSON point behind the 2dsphere index."""
+    doc = tourist.dict()
+    doc['geo'] = geo_point(doc['location'])
+    doc['changed_at'] = datetime.now(timezone.utc)
+    return doc
+
+async def apply_location_updates(pings):
+    """Flush callback for the location buffer: one unordered bulk write per window."""
+    if geofence.loaded_at is None or time.monotonic() - geofence.loaded_at > ZONE_RELOAD_INTERVAL_S:
+        # Pick up zone edits made by other workers
+        await load_zones()
+    zone_codes = geofence.classify([p[1] for p in pings], [p[2] for p in pings])
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"id": tourist_id, "last_seen": {"$lt": ts}},
+            {"$set": {
+                "location": {"lat": lat, "lng": lng},
+                "geo": geo_point({"lat": lat, "lng": lng}),
+                "zone_type": ZONE_TYPES[code],
+                "last_seen": ts,
+                "changed_at": now,
+            }},
+        )
+        for (tourist_id, lat, lng, ts), code in zip(pings, zone_codes.tolist())
+    ]
+    result = await db.tourists.bulk_write(operations, ordered=False)
+    collection_versions.bump("tourists")
+    stale = set()
+    if result.matched_count < len(operations):
+        # Some pings lost to a newer last_seen (or were for unknown tourists); they must not move anything in memory
+        sent = {tourist_id: utc_timestamp(ts) for tourist_id, _, _, ts in pings}
+        async for doc in db.tourists.find({"id": {"$in": list(sent)}}, {"_id": 0, "id": 1, "last_seen": 1}):
+            # Mongo keeps milliseconds, so a ping that won reads back up to 1 ms early
+            if doc.get('last_seen') is not None and utc_timestamp(doc['last_seen']) >= sent[doc['id']] + 0.001:
+                stale.add(doc['id'])
+    moves = []
+    for (tourist_id, lat, lng, ts), code in zip(pings, zone_codes.tolist()):
+        if tourist_id in tourist_grid and tourist_id not in stale:
+            tourist_grid.upsert(tourist_id, lat, lng)
+            heartbeat.touch(tourist_id, utc_timestamp(ts))
+            zone_type = ZONE_TYPES[code]
+            previous_zone = geofence.zone_of.get(tourist_id)
+            if previous_zone != zone_type:
+                geofence.zone_of[tourist_id] = zone_type
+                dashboard_counters.tourist_changed({"zone_type": previous_zone}, {"zone_type": zone_type})
+            map_clusters.update(tourist_id, lat, lng, zone_type=zone_type)
+            moves.append({"id": tourist_id, "lat": lat, "lng": lng, "zone_type": zone_type, "ts": ts.isoformat()})
+    broadcaster.publish_moves(moves)
+    rescore_queue.schedule(move['id'] for move in moves)
+
+async def load_zones():
+    zones = await db.zones.find({}, {"_id": 0}).to_list(None)
+    geofence.load(zones)
+
+async def reclassify_tourists():
+    """Re-derive every tourist's zone_type after a zone edit.
+
+    Positions come from Mongo rather than this worker's grid so the result is
+    authoritative; classification is one vectorized pass and only tourists
+    whose zone actually changed are written back.
+    """
+    ids, lats, lngs, current = [], [], [], []
+    async for doc in db.tourists.find({}, {"_id": 0, "id": 1, "location": 1, "zone_type": 1}).batch_size(10000):
+        ids.append(doc['id'])
+        lats.append(doc['location']['lat'])
+        lngs.append(doc['location']['lng'])
+        current.append(doc.get('zone_type'))
+    zone_codes = geofence.classify(lats, lngs).tolist()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+    operations = []
+    changed_ids = []
+    for tourist_id, zone_type, code in zip(ids, current, zone_codes):
+        if ZONE_TYPES[code] != zone_type:
+            operations.append(UpdateOne(
+                {"id": tourist_id}, {"$set": {"zone_type": ZONE_TYPES[code], "changed_at": datetime.now(timezone.utc)}},
+            ))
+            changed_ids.append(tourist_id)
+        if tourist_id in tourist_grid:
+            geofence.zone_of[tourist_id] = ZONE_TYPES[code]
+            map_clusters.update(tourist_id, zone_type=ZONE_TYPES[code])
+    for start in range(0, len(operations), 10000):
+        await db.tourists.bulk_write(operations[start:start + 10000], ordered=False)
+    if operations:
+        collection_versions.bump("tourists")
+    rescore_queue.schedule(changed_ids)
+
+    await dashboard_counters.refresh(db)
+    if operations:
+        broadcaster.publish({"type": "zones.changed", "reclassified": len(operations)})
+    return len(operations)
+
+def utc_timestamp(value):
+    if value is None:
+        return np.nan
+    if value.tzinfo is None:
+        # Mongo hands back naive datetimes that are already UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+async def load_open_incidents():
+    version = collection_versions.shared("incidents")
+    incidents = await db.incidents.find(
+        {"status": {"$in": OPEN_INCIDENT_STATUSES}}, {"_id": 0, "id": 1, "location": 1, "severity": 1}
+    ).to_list(None)
+    open_incidents.load(incidents, version)
+
+async def rescore_tourists(tourist_ids=None):
+    """Recompute safety scores for every tourist (or just ``tourist_ids``) and write back the changed ones."""
+    started = time.perf_counter()
+    query = {} if tourist_ids is None else {"id": {"$in": list(tourist_ids)}}
+    projection = {"_id": 0, "id": 1, "location": 1, "zone_type": 1, "last_seen": 1, "itinerary": 1, "safety_score": 1}
+    ids, lats, lngs, zones, seen, itineraries, current = [], [], [], [], [], [], []
+    async for doc in db.tourists.find(query, projection).batch_size(10000):
+        ids.append(doc['id'])
+        lats.append(doc['location']['lat'])
+        lngs.append(doc['location']['lng'])
+        zones.append(doc.get('zone_type'))
+        seen.append(utc_timestamp(doc.get('last_seen')))
+        itineraries.append(doc.get('itinerary'))
+        current.append(doc.get('safety_score', -1))
+    if not ids:
+        return {"scored": 0, "changed": 0, "elapsed_ms": 0.0}
+
+    if not open_incidents.ready or open_incidents.version != collection_versions.shared("incidents"):
+        await load_open_incidents()
+    snapshot = open_incidents.snapshot()
+
+    def score():
+        lat_array = np.array(lats, dtype=np.float64)
+        lng_array = np.array(lngs, dtype=np.float64)
+        zone_codes = np.array([ZONE_CODES.get(zone, 0) for zone in zones], dtype=np.int64)
+        hours_since_seen = np.nan_to_num((time.time() - np.array(seen, dtype=np.float64)) / 3600.0)
+        return compute_scores(
+            zone_codes,
+            open_incidents.closeness(lat_array, lng_array, snapshot),
+            hours_since_seen,
+            itinerary_risk(itineraries),
+        )
+
+    # A full population takes long enough to keep off the event loop
+    scores = await asyncio.to_thread(score)
+
+    changed = np.flatnonzero(scores != np.array(current, dtype=np.int64))
+    operations = [UpdateOne({"id": ids[i]}, {"$set": {"safety_score": int(scores[i])}}) for i in changed.tolist()]
+    for start in range(0, len(operations), 10000):
+        await db.tourists.bulk_write(operations[start:start + 10000], ordered=False)
+    if operations:
+        collection_versions.bump("tourists")
+    return {
+        "scored": len(ids),
+        "changed": len(operations),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+rescore_queue = RescoreQueue(rescore_tourists)
+
+async def stale_tourist_ids(oldest, newest):
+    """Tourists last seen between the epoch seconds ``oldest`` and ``newest``."""
+    cursor = db.tourists.find(
+        # Every status, so the (status, last_seen) index serves the range
+        {"status": {"$in": list(TOURIST_STATUSES)}, "last_seen": {
+            "$gte": datetime.fromtimestamp(oldest, timezone.utc), "$lt": datetime.fromtimestamp(newest, timezone.utc),
+        }},
+        {"_id": 0, "id": 1},
+    )
+    return [doc['id'] async for doc in cursor]
+
+# Applies the staleness penalty to tourists who stopped pinging
+STALENESS_RESCORE_INTERVAL_S = float(os.environ.get('STALENESS_RESCORE_INTERVAL_S', '1800'))
+staleness_rescorer = StalenessRescorer(
+    stale_tourist_ids,
+    rescore_queue,
+    # Renewed once per pass, so it has to outlive the interval
+    LeaderLease("staleness-rescore", ttl_s=STALENESS_RESCORE_INTERVAL_S * 2),
+    interval_s=STALENESS_RESCORE_INTERVAL_S,
+)
+
+def dispatch_entry(incident: dict) -> dict:
+    return {key: incident.get(key) for key in ("id", "tourist_id", "type", "severity", "reported_at", "location")}
+
+def has_location(incident: dict) -> bool:
+    location = incident.get('location') or {}
+    return 'lat' in location and 'lng' in location
+
+async def claim_nearest_officer(incident_id: str, location: dict) -> Optional[str]:
+    """Pick the nearest free officer in memory, then claim them in Mongo."""
+    for _ in range(DISPATCH_MAX_ATTEMPTS):
+        nearest = dispatch.nearest_available(location['lat'], location['lng'])
+        if nearest is None:
+            return None
+        officer_id, _ = nearest
+        # Reserved before the first await so concurrent requests skip this officer
+        dispatch.reserve(officer_id, incident_id)
+        claimed = await db.officer_positions.update_one(
+            {"officer_id": officer_id, "available": True, "incident_id": None},
+            {"$set": {"incident_id": incident_id}},
+        )
+        if claimed.modified_count:
+            return officer_id
+        # Claimed through another worker; the officer's next position update resyncs us
+    return None
+
+async def release_officer(officer_id: str, incident_id: str):
+    await db.officer_positions.update_one(
+        {"officer_id": officer_id, "incident_id": incident_id},
+        {"$set": {"incident_id": None}},
+    )
+    dispatch.release_officer(officer_id)
+
+dispatch_lock = asyncio.Lock()
+
+async def dispatch_waiting():
+    """Hand queued incidents to free officers, highest severity and oldest first."""
+    async with dispatch_lock:
+        while len(dispatch.available):
+            incident = dispatch.next_waiting()
+            if incident is None:
+                return
+            officer_id = await claim_nearest_officer(incident['id'], incident['location'])
+            if officer_id is None:
+                return
+            assigned = await db.incidents.update_one(
+                {"id": incident['id'], "assigned_officer": None, "status": {"$in": OPEN_INCIDENT_STATUSES}},
+                {"$set": {"assigned_officer": officer_id}},
+            )
+            if assigned.modified_count:
+                dispatch.confirm(incident['id'])
+                collection_versions.bump("incidents")
+                broadcaster.publish(
+                    {"type": "incident.assigned", "id": incident['id'], "assigned_officer": officer_id},
+                    lat=incident['location']['lat'], lng=incident['location']['lng'],
+                )
+            else:
+                # Resolved or assigned elsewhere since it was queued
+                dispatch.discard(incident['id'])
+                await release_officer(officer_id, incident['id'])
+
+async def load_dispatch_state():
+    dispatch.clear()
+    async for doc in db.officer_positions.find({"location.lat": {"$exists": True}}, {"_id": 0}):
+        dispatch.update_officer(doc['officer_id'], doc['location']['lat'], doc['location']['lng'],
+                                doc.get('available', True), doc.get('incident_id'))
+    async for doc in db.incidents.find(
+        {"status": {"$in": OPEN_INCIDENT_STATUSES}, "assigned_officer": None, "location.lat": {"$exists": True}},
+        {"_id": 0, "id": 1, "tourist_id": 1, "type": 1, "severity": 1, "reported_at": 1, "location": 1},
+    ):
+        dispatch.enqueue(dispatch_entry(doc))
+    stats = dispatch.stats()
+    logger.info("Dispatch: %d officers (%d free), %d incidents waiting",
+                stats['officers_tracked'], stats['officers_available'], stats['incidents_waiting'])
+
+async def flag_missing_tourists(tourist_ids):
+    """Expiry callback for the heartbeat monitor; returns how many tourists were flagged."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=heartbeat.timeout_s)
+    flagged = 0
+    async for doc in db.tourists.find({"id": {"$in": tourist_ids}}, {"_id": 0, "id": 1, "last_seen": 1, "status": 1}):
+        if doc.get('status') != "active" or doc.get('last_seen') is None:
+            continue
+        if utc_timestamp(doc['last_seen']) > cutoff.timestamp():
+            # Pinged through another worker since this one last saw it
+            heartbeat.touch(doc['id'], utc_timestamp(doc['last_seen']))
+            continue
+        before = await db.tourists.find_one_and_update(
+            {"id": doc['id'], "status": "active", "last_seen": {"$lt": cutoff}},
+            {"$set": {"status": "missing", "changed_at": datetime.now(timezone.utc)}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not before:
+            continue
+        collection_versions.bump("tourists")
+        dashboard_counters.tourist_changed(before, {"status": "missing"})
+        map_clusters.update(before['id'], status="missing")
+        location = before.get('location') or {}
+        broadcaster.publish(
+            {"type": "tourist.status", "id": before['id'], "status": "missing",
+             "lat": location.get('lat'), "lng": location.get('lng')},
+            lat=location.get('lat'), lng=location.get('lng'),
+        )
+        await open_incident(Incident(
+            tourist_id=before['id'],
+            type="missing",
+            description=f"No location update since {before['last_seen'].strftime('%Y-%m-%d %H:%M')} UTC",
+            location=location,
+            severity="high",
+        ))
+        flagged += 1
+    return flagged
+
+async def overdue_tourists(cutoff, limit):
+    """Heartbeat sweep: active tourists last seen before ``cutoff``, whichever worker took their pings."""
+    cursor = db.tourists.find(
+        {"status": "active", "last_seen": {"$lt": datetime.fromtimestamp(cutoff, timezone.utc)}},
+        {"_id": 0, "id": 1},
+    ).limit(limit)
+    return [doc['id'] async for doc in cursor]
+
+# Flags tourists missing once their last_seen is older than the timeout
+heartbeat = HeartbeatMonitor(
+    flag_missing_tourists,
+    LeaderLease("heartbeat-monitor", ttl_s=float(os.environ.get('LEADER_LEASE_TTL_S', '30'))),
+    timeout_s=float(os.environ.get('HEARTBEAT_TIMEOUT_S', '7200')),
+    tick_s=float(os.environ.get('HEARTBEAT_TICK_S', '5')),
+    max_expiries_per_tick=int(os.environ.get('HEARTBEAT_MAX_EXPIRIES_PER_TICK', '1000')),
+    sweep_fn=overdue_tourists,
+    sweep_s=float(os.environ.get('HEARTBEAT_SWEEP_S', '60')),
+)
+
+def validate_zone(zone: ZoneInput):
+    if zone.zone_type not in ZONE_TYPES:
+        raise HTTPException(status_code=400, detail=f"zone_type must be one of: {', '.join(ZONE_TYPES)}")
+    if zone.shape == "circle":
+        if zone.center is None or not zone.radius_m or zone.radius_m <= 0:
+            raise HTTPException(status_code=400, detail="Circle zones need a center and a positive radius_m")
+    elif zone.shape == "polygon":
+        if not zone.polygon or len(zone.polygon) < 3:
+            raise HTTPException(status_code=400, detail="Polygon zones need at least 3 vertices")
+    else:
+        raise HTTPException(status_code=400, detail="shape must be 'circle' or 'polygon'")
+
+async def append_track_points(pings):
+    """History callback for the location buffer: ``$push`` upserts per tourist-day.
+
+    Returns the positions of the pings whose write failed, for the buffer to retry.
+    """
+    known = [position for position, ping in enumerate(pings) if ping[0] in tourist_grid]
+    updates = bucket_updates([pings[position] for position in known], TRACK_BUCKET_MAX_POINTS)
+    if not updates:
+        return []
+    try:
+        await db.location_tracks.bulk_write([operation for operation, _ in updates], ordered=False)
+    except BulkWriteError as exc:
+        # The other operations were applied; pushing them again would duplicate their points
+        failed = {error['index'] for error in exc.details.get('writeErrors', [])}
+        return [known[position] for index in sorted(failed) for position in updates[index][1]]
+    return []
+
+location_buffer = LocationWriteBuffer(
+    apply_location_updates,
+    flush_interval_s=float(os.environ.get('LOCATION_FLUSH_INTERVAL_S', '1.0')),
+    flush_size=int(os.environ.get('LOCATION_FLUSH_SIZE', '5000')),
+    max_pending=int(os.environ.get('LOCATION_BUFFER_MAX', '100000')),
+    history_fn=append_track_points,
+    max_history=int(os.environ.get('LOCATION_HISTORY_MAX', '500000')),
+    max_history_attempts=int(os.environ.get('LOCATION_HISTORY_MAX_ATTEMPTS', '5')),
+)
+
+# Aged location history is thinned with Douglas-Peucker in the background
+track_compactor = TrackCompactor(
+    after_days=int(os.environ.get('TRACK_SIMPLIFY_AFTER_DAYS', '2')),
+    tolerance_m=float(os.environ.get('TRACK_SIMPLIFY_TOLERANCE_M', '15')),
+    interval_s=float(os.environ.get('TRACK_COMPACT_INTERVAL_S', '3600')),
+)
+TRACK_BUCKET_MAX_POINTS = int(os.environ.get('TRACK_BUCKET_MAX_POINTS', str(BUCKET_MAX_POINTS)))
+TRACK_MAX_RANGE_DAYS = int(os.environ.get('TRACK_MAX_RANGE_DAYS', '31'))
 
 def create_access_token(data: dict):
     to_encode = data.copy()
+    to_encode["exp"] = datetime.now(timezone.utc) + timedelta(seconds=ACCESS_TOKEN_TTL_S)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Sub-requests of /api/batch carry the principal the batch already authenticated
+    user = request.scope.get(BATCH_USER_SCOPE_KEY)
+    if user is not None:
+        return user
+    return await authenticate_token(credentials.credentials)
+
+async def require_admin(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return current_user
+
+async def authenticate_token(token: str) -> User:
+    started = time.perf_counter_ns()
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    
-    user = await db.users.find_one({"email": email})
+
+    if AUTH_TRUST_TOKEN_CLAIMS and "uid" in payload and "role" in payload and "exp" in payload:
+        principal_cache.claim_hits += 1
+        principal_cache.record(time.perf_counter_ns() - started)
+        return User(id=payload["uid"], email=email, name=payload.get("name", ""), role=payload["role"],
+                    created_at=payload.get("created_at") or datetime.now(timezone.utc))
+
+    user = principal_cache.get(email)
     if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+        user_doc = await db.users.find_one({"email": email})
+        if user_doc is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = User(**user_doc)
+        principal_cache.put(email, user)
+    principal_cache.record(time.perf_counter_ns() - started)
+    return user
 
 # Auth routes
 @api_router.post("/auth/register", response_model=User)
@@ -116,78 +699,885 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     user_dict = user_data.dict()
     del user_dict['password']
     user_dict['password_hash'] = hashed_password
     
     user = User(**user_dict)
     await db.users.insert_one({**user.dict(), 'password_hash': hashed_password})
+    principal_cache.invalidate(user.email)
     return user
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"email": user_data.email})
-    if not user or not verify_password(user_data.password, user['password_hash']):
+    if not user or not await verify_password(user_data.password, user['password_hash']):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
-    access_token = create_access_token(data={"sub": user['email']})
+    access_token = create_access_token(data={
+        "sub": user['email'],
+        "uid": user['id'],
+        "name": user['name'],
+        "role": user['role'],
+        "created_at": user['created_at'].isoformat(),
+    })
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Dashboard routes
+def conditional_etag(request: Request, *collections: str):
+    """ETag for a read of ``collections`` with this query string, and a 304 if the client already has it."""
+    etag = f'W/"{collection_versions.tag(*collections)}-{zlib.crc32(request.url.query.encode()):08x}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, None
+
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    total_tourists = await db.tourists.count_documents({})
-    active_tourists = await db.tourists.count_documents({"status": "active"})
-    missing_tourists = await db.tourists.count_documents({"status": "missing"})
-    emergency_incidents = await db.incidents.count_documents({"status": "open", "severity": {"$in": ["high", "critical"]}})
-    
-    # Zone counts
-    safe_zone_count = await db.tourists.count_documents({"zone_type": "safe"})
-    caution_zone_count = await db.tourists.count_documents({"zone_type": "caution"})
-    danger_zone_count = await db.tourists.count_documents({"zone_type": "danger"})
-    
-    return {
-        "total_tourists": total_tourists,
-        "active_tourists": active_tourists,
-        "missing_tourists": missing_tourists,
-        "emergency_incidents": emergency_incidents,
-        "zone_stats": {
-            "safe": safe_zone_count,
-            "caution": caution_zone_count,
-            "danger": danger_zone_count
-        }
-    }
+async def get_dashboard_stats(request: Request, current_user: User = Depends(get_current_user)):
+    etag, not_modified = conditional_etag(request, "tourists", "incidents")
+    if not_modified:
+        return not_modified
+    await dashboard_counters.ensure_fresh(db)
+    return ORJSONResponse(dashboard_counters.snapshot(), headers={"ETag": etag})
+
+def field_projection(fields: Optional[str], model, always=("id",)) -> dict:
+    """Mongo projection for a ``?fields=a,b,c`` parameter; everything but internals when omitted."""
+    if not fields:
+        return {"_id": 0, "geo": 0, "changed_at": 0}
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return {"_id": 0, **{field: 1 for field in requested | set(always)}}
+
+async def list_page(collection, keyset, make_cursor, cursor, limit, format, projection, etag):
+    """Shared body of the paginated list routes.
+
+    JSON pages return at most ``limit`` rows and advertise the next page in
+    ``X-Next-Cursor``; NDJSON streams every remaining row (or ``limit`` rows)
+    straight off the Motor cursor. Rows come from our own collections, so they
+    are encoded as-is with orjson rather than re-validated through pydantic.
+    """
+    try:
+        query, sort = keyset(cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if format == "ndjson":
+        rows = collection.find(query, projection).sort(sort).batch_size(STREAM_BATCH_SIZE)
+        if limit:
+            rows = rows.limit(limit)
+        return StreamingResponse(ndjson_rows(rows), media_type="application/x-ndjson", headers={"ETag": etag})
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    headers = {"ETag": etag}
+    if len(docs) > limit:
+        docs = docs[:limit]
+        headers["X-Next-Cursor"] = make_cursor(docs[-1])
+    return ORJSONResponse(docs, headers=headers)
 
 @api_router.get("/tourists", response_model=List[Tourist])
-async def get_tourists(current_user: User = Depends(get_current_user)):
-    tourists = await db.tourists.find().to_list(1000)
-    return [Tourist(**tourist) for tourist in tourists]
+async def get_tourists(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields, e.g. id,location,zone_type,status"),
+    current_user: User = Depends(get_current_user),
+):
+    etag, not_modified = conditional_etag(request, "tourists")
+    if not_modified:
+        return not_modified
+    projection = field_projection(fields, Tourist)
+    return await list_page(db.tourists, tourist_keyset, tourist_cursor, cursor, limit, format, projection, etag)
+
+@api_router.get("/tourists/nearby", response_model=List[NearbyTourist])
+async def get_nearby_tourists(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000, gt=0, le=50000),
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    projection = field_projection(fields, Tourist)
+    if not tourist_grid.ready:
+        # Index still warming up: let Mongo's 2dsphere index do the work
+        pipeline = [
+            {"$geoNear": {
+                "near": geo_point({"lat": lat, "lng": lng}),
+                "key": "geo",
+                "distanceField": "distance_m",
+                "maxDistance": radius_m,
+                "spherical": True,
+            }},
+            {"$limit": limit},
+            {"$project": projection if fields is None else {**projection, "distance_m": 1}},
+        ]
+        docs = await db.tourists.aggregate(pipeline).to_list(limit)
+        return ORJSONResponse(docs)
+
+    hits = tourist_grid.nearby(lat, lng, radius_m, limit)
+    if not hits:
+        return ORJSONResponse([])
+    docs = await db.tourists.find({"id": {"$in": [key for key, _ in hits]}}, projection).to_list(len(hits))
+    by_id = {doc['id']: doc for doc in docs}
+    return ORJSONResponse([
+        {**by_id[key], "distance_m": distance}
+        for key, distance in hits
+        if key in by_id
+    ])
+
+@api_router.get("/tourists/search", response_model=List[TouristMatch])
+async def search_tourists(
+    q: str = Query(..., min_length=2, max_length=100, description="Partial name, passport number, phone or hotel"),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Ranked matches from the in-memory index; Mongo is only asked for the hits, by id."""
+    hits = tourist_search.search(q, limit)
+    if not hits:
+        return ORJSONResponse([])
+    docs = await db.tourists.find({"id": {"$in": [key for key, _ in hits]}}, field_projection(fields, Tourist)).to_list(len(hits))
+    by_id = {doc['id']: doc for doc in docs}
+    return ORJSONResponse([{**by_id[key], "score": score} for key, score in hits if key in by_id])
+
+@api_router.post("/tourists/locations:batch", status_code=202)
+async def ingest_locations(batch: LocationBatch, current_user: User = Depends(get_current_user)):
+    try:
+        coalesced = location_buffer.offer((p.tourist_id, p.lat, p.lng, p.ts) for p in batch.pings)
+    except BufferFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Location buffer is full, retry shortly",
+            headers={"Retry-After": str(max(1, round(location_buffer.flush_interval_s)))},
+        )
+    return {"accepted": len(batch.pings), "coalesced": coalesced, "pending": len(location_buffer)}
 
 @api_router.get("/tourists/{tourist_id}", response_model=Tourist)
-async def get_tourist(tourist_id: str, current_user: User = Depends(get_current_user)):
-    tourist = await db.tourists.find_one({"id": tourist_id})
+async def get_tourist(tourist_id: str, fields: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    tourist = await db.tourists.find_one({"id": tourist_id}, field_projection(fields, Tourist))
     if not tourist:
         raise HTTPException(status_code=404, detail="Tourist not found")
-    return Tourist(**tourist)
+    return ORJSONResponse(tourist)
+
+@api_router.get("/tourists/{tourist_id}/track")
+async def get_tourist_track(
+    tourist_id: str,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    tolerance: float = Query(10.0, ge=0, le=5000, description="Simplification tolerance in metres"),
+    current_user: User = Depends(get_current_user),
+):
+    """Stream the tourist's path as NDJSON, one simplified polyline per day."""
+    end = to or datetime.now(timezone.utc)
+    start = from_ or end - timedelta(days=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if end - start > timedelta(days=TRACK_MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"Track range is limited to {TRACK_MAX_RANGE_DAYS} days")
+    if not await db.tourists.find_one({"id": tourist_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Tourist not found")
+    return StreamingResponse(track_rows(db, tourist_id, start, end, tolerance), media_type="application/x-ndjson")
+
+@api_router.patch("/tourists/{tourist_id}/status", response_model=Tourist)
+async def update_tourist_status(tourist_id: str, update: TouristStatusUpdate, current_user: User = Depends(get_current_user)):
+    if update.status not in TOURIST_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status must be one of: {', '.join(TOURIST_STATUSES)}")
+    changes = {"status": update.status}
+    if update.status == "active":
+        # An officer confirming the tourist counts as a sighting
+        changes["last_seen"] = datetime.now(timezone.utc)
+    before = await db.tourists.find_one_and_update(
+        {"id": tourist_id},
+        {"$set": {**changes, "changed_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not before:
+        raise HTTPException(status_code=404, detail="Tourist not found")
+    collection_versions.bump("tourists")
+    if update.status == "active":
+        heartbeat.touch(tourist_id, changes["last_seen"].timestamp())
+    dashboard_counters.tourist_changed(before, {"status": update.status})
+    map_clusters.update(tourist_id, status=update.status)
+    tourist = Tourist(**{**before, **changes})
+    if before.get('status') != update.status:
+        broadcaster.publish(
+            {"type": "tourist.status", "id": tourist.id, "status": tourist.status,
+             "lat": tourist.location.lat, "lng": tourist.location.lng},
+            lat=tourist.location.lat, lng=tourist.location.lng,
+        )
+    return tourist
 
 @api_router.get("/incidents", response_model=List[Incident])
-async def get_incidents(current_user: User = Depends(get_current_user)):
-    incidents = await db.incidents.find().to_list(1000)
-    return [Incident(**incident) for incident in incidents]
+async def get_incidents(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields"),
+    current_user: User = Depends(get_current_user),
+):
+    # The keyset columns are always returned so the next cursor can be built
+    etag, not_modified = conditional_etag(request, "incidents")
+    if not_modified:
+        return not_modified
+    projection = field_projection(fields, Incident, always=("id", "reported_at"))
+    return await list_page(db.incidents, incident_keyset, incident_cursor, cursor, limit, format, projection, etag)
 
 @api_router.post("/incidents", response_model=Incident)
 async def create_incident(incident_data: dict, current_user: User = Depends(get_current_user)):
-    incident = Incident(**incident_data)
-    await db.incidents.insert_one(incident.dict())
+    # Validated up front: a bad location would otherwise be stored and counted before the indexes reject it
+    try:
+        incident = Incident(**incident_data)
+        incident.location = Location(**incident.location).dict()
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    return await open_incident(incident)
+
+async def open_incident(incident: Incident) -> Incident:
+    """Open an incident, or fold it into the open one for the same tourist and type."""
+    if not incident_window.enabled:
+        return await insert_incident(incident)
+    key = (incident.tourist_id, incident.type)
+    async with incident_window.hold(key):
+        repeated = await fold_repeat(key, incident)
+        if repeated:
+            return repeated
+        incident = await insert_incident(incident)
+        incident_window.opened_incident(key, incident.id)
+        return incident
+
+async def fold_repeat(key, incident: Incident) -> Optional[Incident]:
+    """Count ``incident`` as a repeat of the key's open incident in one atomic update.
+
+    Returns ``None`` when there is nothing to fold into: no report inside the
+    window, the incident has since been resolved, or the repeat is more severe
+    and should be opened (and dispatched) on its own.
+    """
+    incident_id = incident_window.get(key)
+    if incident_id is None:
+        return None
+    rank = SEVERITY_RANK.get(incident.severity, 0)
+    after = await db.incidents.find_one_and_update(
+        {
+            "id": incident_id,
+            "status": {"$ne": "resolved"},
+            "severity": {"$in": [severity for severity, r in SEVERITY_RANK.items() if r >= rank]},
+        },
+        {
+            "$inc": {"occurrence_count": 1},
+            "$set": {"location": incident.location, "last_reported_at": incident.reported_at},
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not after:
+        return None
+    incident_window.repeated(key, incident_id)
+    collection_versions.bump("incidents")
+    if after.get('status') in OPEN_INCIDENT_STATUSES:
+        open_incidents.add(after)
+    location = incident.location or {}
+    broadcaster.publish(
+        {"type": "incident.repeated", "id": incident_id, "occurrence_count": after['occurrence_count'],
+         "location": location, "last_reported_at": incident.reported_at.isoformat()},
+        lat=location.get('lat'), lng=location.get('lng'),
+    )
+    return Incident(**after)
+
+async def insert_incident(incident: Incident) -> Incident:
+    """Insert an incident and fan it out to counters, rollups, dispatch, scoring and live clients."""
+    location = incident.location or {}
+    if incident.zone_type is None and has_location(incident.dict()):
+        incident.zone_type = geofence.classify_one(location['lat'], location['lng'])
+    dispatchable = has_location(incident.dict()) and incident.assigned_officer is None
+    if dispatchable and incident.severity in IMMEDIATE_SEVERITIES:
+        incident.assigned_officer = await claim_nearest_officer(incident.id, location)
+    # The incident and its rollup increments land on the same side of a rollup rebuild chunk
+    async with rollup_gate.writing():
+        try:
+            await db.incidents.insert_one(incident.dict())
+        except Exception:
+            if dispatchable and incident.assigned_officer:
+                # Otherwise the officer stays claimed by an incident that was never stored
+                await release_officer(incident.assigned_officer, incident.id)
+            raise
+        await db.incident_rollups.bulk_write(rollups.rollup_updates(None, incident.dict()), ordered=False)
+    if dispatchable and incident.assigned_officer:
+        dispatch.confirm(incident.id)
+    collection_versions.bump("incidents")
+    dashboard_counters.incident_changed(None, incident.dict())
+    if has_location(incident.dict()):
+        incident_heatmap.add(location['lat'], location['lng'], incident.reported_at, incident.id)
+    if incident.status in OPEN_INCIDENT_STATUSES:
+        open_incidents.add(incident.dict())
+    if dispatchable and incident.assigned_officer is None:
+        dispatch.enqueue(dispatch_entry(incident.dict()))
+    if 'lat' in location and 'lng' in location:
+        nearby = tourist_grid.nearby(location['lat'], location['lng'], SAFETY_INCIDENT_RADIUS_M)
+        rescore_queue.schedule([incident.tourist_id] + [tourist_id for tourist_id, _ in nearby])
+    broadcaster.publish(
+        {"type": "incident.created", "incident": jsonable_encoder(incident)},
+        lat=location.get('lat'), lng=location.get('lng'),
+    )
     return incident
 
+@api_router.patch("/incidents/{incident_id}/status", response_model=Incident)
+async def update_incident_status(incident_id: str, update: IncidentStatusUpdate, current_user: User = Depends(get_current_user)):
+    changes = {"status": update.status}
+    if update.status == "resolved":
+        # The officer is released below; a reopened incident is dispatched afresh
+        changes["assigned_officer"] = None
+    async with rollup_gate.writing():
+        before = await db.incidents.find_one_and_update(
+            {"id": incident_id},
+            {"$set": changes},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not before:
+            raise HTTPException(status_code=404, detail="Incident not found")
+        after = {**before, **changes}
+        rollup_operations = rollups.rollup_updates(before, after)
+        if rollup_operations:
+            await db.incident_rollups.bulk_write(rollup_operations, ordered=False)
+    collection_versions.bump("incidents")
+    dashboard_counters.incident_changed(before, after)
+    if before.get('status') == update.status:
+        return Incident(**after)
+    if update.status in OPEN_INCIDENT_STATUSES:
+        open_incidents.add(after)
+    else:
+        open_incidents.remove(incident_id)
+
+    if update.status == "resolved":
+        dispatch.discard(incident_id)
+        if before.get('assigned_officer'):
+            await release_officer(before['assigned_officer'], incident_id)
+            await dispatch_waiting()
+    elif before.get('status') == "resolved":
+        if before.get('assigned_officer'):
+            # Resolved without clearing the assignment (older data); that officer was released back then
+            await db.incidents.update_one(
+                {"id": incident_id, "assigned_officer": before['assigned_officer']},
+                {"$set": {"assigned_officer": None}},
+            )
+            after['assigned_officer'] = None
+        if has_location(before):
+            dispatch.enqueue(dispatch_entry(before))
+            await dispatch_waiting()
+
+    location = before.get('location') or {}
+    if has_location(before):
+        nearby = tourist_grid.nearby(location['lat'], location['lng'], SAFETY_INCIDENT_RADIUS_M)
+        rescore_queue.schedule([before['tourist_id']] + [tourist_id for tourist_id, _ in nearby])
+    broadcaster.publish(
+        {"type": "incident.status", "id": incident_id, "status": update.status},
+        lat=location.get('lat'), lng=location.get('lng'),
+    )
+    return Incident(**after)
+
+# Dispatch routes
+@api_router.put("/officers/me/position")
+async def update_officer_position(position: OfficerPosition, current_user: User = Depends(get_current_user)):
+    update = {
+        "name": current_user.name,
+        "location": {"lat": position.lat, "lng": position.lng},
+        "updated_at": datetime.now(timezone.utc),
+    }
+    on_insert = {"incident_id": None}
+    if position.available is None:
+        on_insert["available"] = True
+    else:
+        update["available"] = position.available
+    officer = await db.officer_positions.find_one_and_update(
+        {"officer_id": current_user.id},
+        {"$set": update, "$setOnInsert": on_insert},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    dispatch.update_officer(current_user.id, position.lat, position.lng,
+                            officer['available'], officer.get('incident_id'))
+    if officer['available'] and officer.get('incident_id') is None:
+        await dispatch_waiting()
+        officer['incident_id'] = dispatch.officers[current_user.id]['incident_id']
+    return officer
+
+@api_router.get("/dispatch/queue")
+async def get_dispatch_queue(limit: int = Query(100, ge=1, le=1000), current_user: User = Depends(get_current_user)):
+    return {**dispatch.stats(), "waiting": dispatch.waiting(limit)}
+
+# Map routes
+def parse_bbox(bbox: str):
+    """``min_lng,min_lat,max_lng,max_lat`` -> (min_lat, min_lng, max_lat, max_lng)."""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in bbox.split(','))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise HTTPException(status_code=400, detail="bbox is out of range or inverted")
+    return min_lat, min_lng, max_lat, max_lng
+
+@api_router.get("/map/clusters")
+async def get_map_clusters(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(..., ge=0, le=22),
+    current_user: User = Depends(get_current_user),
+):
+    min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+    effective_zoom, clusters = map_clusters.clusters(min_lat, min_lng, max_lat, max_lng, zoom)
+    return {
+        "zoom": effective_zoom,
+        "cell_deg": map_clusters.cell_deg(effective_zoom),
+        "tourists": sum(cluster["count"] for cluster in clusters),
+        "clusters": clusters,
+    }
+
+# Analytics routes
+async def load_heatmap(window_only: bool = False):
+    """Rebuild the heatmap; ``window_only`` rereads just the days it keeps separately."""
+    query = {"location.lat": {"$exists": True}}
+    window_only = window_only and incident_heatmap.built_at is not None
+    if window_only:
+        query["reported_at"] = {"$gte": incident_heatmap.window_start()}
+    points = []
+    incident_heatmap.begin_rebuild()
+    try:
+        async for doc in db.incidents.find(
+            query, {"_id": 0, "id": 1, "reported_at": 1, "location": 1},
+        ).batch_size(10000):
+            points.append((doc['id'], doc['reported_at'], doc['location']['lat'], doc['location']['lng']))
+    except Exception:
+        incident_heatmap.cancel_rebuild()
+        raise
+    incident_heatmap.load(points, window_only=window_only)
+
+@api_router.get("/analytics/heatmap")
+async def get_incident_heatmap(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    resolution: int = Query(64, ge=1, le=512, description="Maximum cells per side"),
+    since: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    global heatmap_refresh
+    if incident_heatmap.is_stale() and (heatmap_refresh is None or heatmap_refresh.done()):
+        # Picks up incidents created through other workers; this request is served as-is
+        heatmap_refresh = asyncio.create_task(load_heatmap(window_only=True))
+    min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+    heatmap = incident_heatmap.query(min_lat, min_lng, max_lat, max_lng, resolution, since)
+    return {"bbox": [min_lng, min_lat, max_lng, max_lat], "since": since, **heatmap}
+
+@api_router.get("/analytics/incidents")
+async def get_incident_trends(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    type: Optional[str] = Query(None, description="Comma-separated incident types"),
+    severity: Optional[str] = Query(None, description="Comma-separated severities"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    zone: Optional[str] = Query(None, description="Comma-separated zone types, or unknown"),
+    current_user: User = Depends(get_current_user),
+):
+    """Incident counts per bucket, broken down by type, severity, status and zone; read from the rollups only."""
+    end = to or datetime.now(timezone.utc)
+    start = from_ or end - timedelta(days=1 if granularity == "hour" else 30)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if (end - start) / rollups.GRANULARITIES[granularity] > ROLLUP_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {ROLLUP_MAX_BUCKETS} {granularity} buckets per request")
+
+    query = {"granularity": granularity, "bucket": {"$gte": rollups.bucket_start(start, granularity), "$lt": end}}
+    filters = (
+        ("type", type, None, "type"),
+        ("severity", severity, SEVERITY_RANK, "severity"),
+        ("status", status, ("open", "investigating", "resolved"), "status"),
+        ("zone_type", zone, ZONE_TYPES + (rollups.UNKNOWN_ZONE,), "zone"),
+    )
+    for field, value, allowed, name in filters:
+        values = export_filter_values(value, allowed, name)
+        if values:
+            query[field] = {"$in": values}
+    docs = await db.incident_rollups.find(query, {"_id": 0}).to_list(None)
+    buckets = rollups.series(docs, granularity, start, end)
+    return {
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "total": sum(bucket["total"] for bucket in buckets),
+        "buckets": buckets,
+    }
+
+# Export routes
+def export_filter_values(value: Optional[str], allowed, name: str) -> Optional[List[str]]:
+    """Split a comma-separated filter, rejecting values outside ``allowed`` unless it is None."""
+    if not value:
+        return None
+    values = [part.strip() for part in value.split(",") if part.strip()]
+    unknown = set(values) - set(allowed) if allowed is not None else set()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {name}: {', '.join(sorted(unknown))}")
+    return values
+
+def export_range(field: str, from_: Optional[datetime], to: Optional[datetime]) -> dict:
+    # Naive bounds are UTC, like the stored timestamps
+    if from_ and from_.tzinfo is None:
+        from_ = from_.replace(tzinfo=timezone.utc)
+    if to and to.tzinfo is None:
+        to = to.replace(tzinfo=timezone.utc)
+    bounds = {}
+    if from_:
+        bounds["$gte"] = from_
+    if to:
+        bounds["$lt"] = to
+    if from_ and to and from_ >= to:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    return {field: bounds} if bounds else {}
+
+def export_response(rows, columns, format: str, name: str) -> StreamingResponse:
+    if format == "parquet" and not exports.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+    body = exports.parquet_stream(rows, columns) if format == "parquet" else exports.csv_stream(rows, columns)
+    filename = f"{name}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@api_router.get("/export/incidents")
+async def export_incidents(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    status: Optional[str] = Query(None, description="Comma-separated, e.g. open,investigating"),
+    severity: Optional[str] = Query(None, description="Comma-separated, e.g. high,critical"),
+    zone: Optional[str] = Query(None, description="Comma-separated zone types recorded when the incident was reported"),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    current_user: User = Depends(require_admin),
+):
+    """Stream every matching incident, oldest first."""
+    query = export_range("reported_at", from_, to)
+    statuses = export_filter_values(status, ("open", "investigating", "resolved"), "status")
+    if statuses:
+        query["status"] = {"$in": statuses}
+    severities = export_filter_values(severity, SEVERITY_RANK, "severity")
+    if severities:
+        query["severity"] = {"$in": severities}
+    zones = export_filter_values(zone, ZONE_TYPES, "zone")
+    if zones:
+        # The stored zone, so later zone edits don't change what an old export contains
+        query["zone_type"] = {"$in": zones}
+    cursor = db.incidents.find(query, exports.projection(exports.INCIDENT_COLUMNS)).sort([("reported_at", 1), ("id", 1)])
+    return export_response(exports.batches(cursor), exports.INCIDENT_COLUMNS, format, "incidents")
+
+@api_router.get("/export/tourists")
+async def export_tourists(
+    from_: Optional[datetime] = Query(None, alias="from", description="Last seen at or after"),
+    to: Optional[datetime] = Query(None, description="Last seen before"),
+    status: Optional[str] = Query(None, description="Comma-separated, e.g. missing,emergency"),
+    zone: Optional[str] = Query(None, description="Comma-separated zone types"),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    current_user: User = Depends(require_admin),
+):
+    """Stream every matching tourist, ordered by id."""
+    query = export_range("last_seen", from_, to)
+    statuses = export_filter_values(status, TOURIST_STATUSES, "status")
+    if statuses:
+        query["status"] = {"$in": statuses}
+    zones = export_filter_values(zone, ZONE_TYPES, "zone")
+    if zones:
+        query["zone_type"] = {"$in": zones}
+    cursor = db.tourists.find(query, exports.projection(exports.TOURIST_COLUMNS)).sort("id", 1)
+    return export_response(exports.batches(cursor), exports.TOURIST_COLUMNS, format, "tourists")
+
+# Batch route
+# Sub-responses are buffered whole, so streaming and long-running routes are left out
+BATCH_EXCLUDED_PREFIXES = ("/api/batch", "/api/export/", "/api/system/profile")
+BATCH_EXCLUDED_SUFFIXES = ("/track",)
+
+@api_router.post("/batch")
+async def run_batch(batch: BatchRequest, request: Request, current_user: User = Depends(get_current_user)):
+    """Run several GETs against the read routes concurrently and return every response in one body."""
+    for item in batch.requests:
+        path, query = split_path(item.path)
+        if (not path.startswith("/api/") or path.startswith(BATCH_EXCLUDED_PREFIXES)
+                or path.rstrip("/").endswith(BATCH_EXCLUDED_SUFFIXES)):
+            raise HTTPException(status_code=400, detail=f"Path not allowed in a batch: {path}")
+        if any(value != "json" for value in parse_qs(query).get("format", [])):
+            raise HTTPException(status_code=400, detail=f"Only JSON responses can be batched: {item.path}")
+        if any(name.lower() == "authorization" for name in item.headers):
+            raise HTTPException(status_code=400, detail="Sub-requests use the batch's credentials")
+    results = await asyncio.gather(*(
+        run_subrequest(app, request.scope, item.path, item.headers, current_user, BATCH_MAX_RESPONSE_BYTES)
+        for item in batch.requests
+    ))
+    body, headers = await maybe_gzip(
+        combine([item.id for item in batch.requests], results), request.headers.get("accept-encoding", ""),
+    )
+    return Response(body, media_type="application/json", headers=headers)
+
+# Zone routes
+@api_router.get("/zones", response_model=List[Zone])
+async def get_zones(current_user: User = Depends(get_current_user)):
+    zones = await db.zones.find({}, {"_id": 0}).to_list(None)
+    return [Zone(**zone) for zone in zones]
+
+@api_router.post("/zones", response_model=Zone)
+async def create_zone(zone_data: ZoneInput, current_user: User = Depends(require_admin)):
+    validate_zone(zone_data)
+    zone = Zone(**zone_data.dict())
+    await db.zones.insert_one(zone.dict())
+    await load_zones()
+    await reclassify_tourists()
+    return zone
+
+@api_router.put("/zones/{zone_id}", response_model=Zone)
+async def update_zone(zone_id: str, zone_data: ZoneInput, current_user: User = Depends(require_admin)):
+    validate_zone(zone_data)
+    existing = await db.zones.find_one({"id": zone_id})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    zone = Zone(**zone_data.dict(), id=zone_id, created_at=existing['created_at'])
+    await db.zones.replace_one({"id": zone_id}, zone.dict())
+    await load_zones()
+    await reclassify_tourists()
+    return zone
+
+@api_router.delete("/zones/{zone_id}")
+async def delete_zone(zone_id: str, current_user: User = Depends(require_admin)):
+    result = await db.zones.delete_one({"id": zone_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    await load_zones()
+    reclassified = await reclassify_tourists()
+    return {"message": "Zone deleted", "reclassified": reclassified}
+
+@api_router.post("/safety-scores/recompute")
+async def recompute_safety_scores(current_user: User = Depends(require_admin)):
+    await load_open_incidents()
+    return await rescore_tourists()
+
+# Admin routes
+seed_job = {"status": "idle"}
+rollup_job = {"status": "idle"}
+
+async def run_seed_job(request: SeedRequest):
+    def progress(kind, done, total):
+        seed_job["progress"][kind] = {"done": done, "total": total}
+
+    try:
+        officer_password_hash = None
+        if request.officers:
+            # Hashed once and shared by every generated officer
+            officer_password_hash = await password_hasher.hash(request.officer_password)
+        seed_job["summary"] = await seed_data.generate(
+            db,
+            tourists=request.tourists,
+            incidents=request.incidents,
+            officers=request.officers,
+            history_days=request.history_days,
+            pings_per_day=request.pings_per_day,
+            seed=request.seed,
+            now=request.now,
+            officer_password_hash=officer_password_hash,
+            clear=request.clear,
+            classify=geofence.classify,
+            progress=progress,
+        )
+        seed_job["status"] = "rebuilding"
+        collection_versions.bump("tourists")
+        collection_versions.bump("incidents")
+        await load_tourist_grid()
+        await dashboard_counters.refresh(db)
+        await load_open_incidents()
+        await rescore_tourists()
+        await load_dispatch_state()
+        await load_heatmap()
+        await rollups.rebuild(db, geofence.classify, rollup_gate)
+        seed_job["status"] = "done"
+    except Exception as exc:
+        logger.exception("Synthetic data generation failed")
+        seed_job["status"] = "failed"
+        seed_job["error"] = str(exc)
+    seed_job["finished_at"] = datetime.now(timezone.utc)
+
+async def run_rollup_rebuild():
+    """Stamp zones on old incidents and rebuild every rollup from ``incidents``."""
+    try:
+        rollup_job["summary"] = await rollups.rebuild(db, geofence.classify, rollup_gate)
+        rollup_job["status"] = "done"
+    except Exception as exc:
+        logger.exception("Incident rollup rebuild failed")
+        rollup_job["status"] = "failed"
+        rollup_job["error"] = str(exc)
+    rollup_job["finished_at"] = datetime.now(timezone.utc)
+
+def start_rollup_rebuild() -> dict:
+    rollup_job.clear()
+    rollup_job.update({"status": "running", "started_at": datetime.now(timezone.utc)})
+    rollup_job["task"] = asyncio.create_task(run_rollup_rebuild())
+    return {key: value for key, value in rollup_job.items() if key != "task"}
+
+@api_router.post("/admin/rollups/rebuild", status_code=202)
+async def rebuild_incident_rollups(current_user: User = Depends(require_admin)):
+    if rollup_job["status"] == "running":
+        raise HTTPException(status_code=409, detail="A rollup rebuild is already running")
+    return start_rollup_rebuild()
+
+@api_router.get("/admin/rollups/rebuild")
+async def get_rollup_rebuild(current_user: User = Depends(require_admin)):
+    return {key: value for key, value in rollup_job.items() if key != "task"}
+
+@api_router.post("/admin/seed", status_code=202)
+async def start_seed_job(request: SeedRequest, current_user: User = Depends(require_admin)):
+    if seed_job["status"] in ("running", "rebuilding"):
+        raise HTTPException(status_code=409, detail="A seed job is already running")
+    seed_job.clear()
+    seed_job.update({
+        "status": "running",
+        "request": request.dict(exclude={"officer_password"}),
+        "started_at": datetime.now(timezone.utc),
+        "progress": {},
+    })
+    seed_job["task"] = asyncio.create_task(run_seed_job(request))
+    return {key: value for key, value in seed_job.items() if key != "task"}
+
+@api_router.get("/admin/seed")
+async def get_seed_job(current_user: User = Depends(require_admin)):
+    return {key: value for key, value in seed_job.items() if key != "task"}
+
+@api_router.websocket("/ws")
+async def live_updates(websocket: WebSocket, token: str):
+    """Push map deltas to one client.
+
+    Authenticate with ``?token=<jwt>``. Clients narrow the stream by sending
+    ``{"type": "subscribe", "bbox": [min_lng, min_lat, max_lng, max_lat]}``
+    (``"bbox": null`` for everything) and should reload the lists when they
+    receive ``{"type": "resync"}``.
+    """
+    try:
+        await authenticate_token(token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+    await websocket.accept()
+    subscriber = broadcaster.subscribe()
+
+    async def read_subscriptions():
+        while True:
+            message = await websocket.receive_json()
+            if isinstance(message, dict) and message.get('type') == 'subscribe':
+                try:
+                    subscriber.bbox = parse_viewport(message.get('bbox'))
+                except ValueError:
+                    await websocket.close(code=1008)
+                    return
+
+    async def write_events():
+        while True:
+            event = await subscriber.next_event()
+            if event is None:
+                # Dropped by the broadcaster after a failed delivery
+                await websocket.close(code=1011)
+                return
+            await websocket.send_text(json.dumps(event))
+
+    tasks = [asyncio.create_task(read_subscriptions()), asyncio.create_task(write_events())]
+    try:
+        # Either side ending (disconnect, bad message, send failure) closes the stream
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        broadcaster.unsubscribe(subscriber)
+
+def component_stats() -> dict:
+    return {
+        "location_ingest": location_buffer.stats(),
+        "realtime": broadcaster.stats(),
+        "auth": principal_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "geofence": geofence.stats(),
+        "safety_scores": {**rescore_queue.stats(), **open_incidents.stats(), **staleness_rescorer.stats()},
+        "dispatch": dispatch.stats(),
+        "tracks": track_compactor.stats(),
+        "heartbeat": heartbeat.stats(),
+        "map_clusters": map_clusters.stats(),
+        "tourist_search": tourist_search.stats(),
+        "tourist_resync": tourist_resync.stats(),
+        "heatmap": incident_heatmap.stats(),
+        "versions": collection_versions.stats(),
+        "incident_coalescing": incident_window.stats(),
+    }
+
+@api_router.get("/system/stats")
+async def get_system_stats(current_user: User = Depends(get_current_user)):
+    return component_stats()
+
+@api_router.get("/system/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: float = Query(5.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    limit: int = Query(200, ge=1, le=10000),
+    current_user: User = Depends(require_admin),
+):
+    """Sample every thread's stack for a while; collapsed stacks, hottest first."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set PROFILER_ENABLED=true")
+    if stack_sampler.running:
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
+    stacks = await asyncio.to_thread(stack_sampler.sample, seconds, interval_ms / 1000)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common(limit))
+
 # Sample data initialization
 @api_router.post("/init-sample-data")
 async def init_sample_data():
     # Clear existing data
     await db.tourists.delete_many({})
     await db.incidents.delete_many({})
+    await db.zones.delete_many({})
+    collection_versions.bump("tourists")
+    collection_versions.bump("incidents")
+    
+    # Sample zones; tourists' zone_type is derived from these
+    sample_zones = [
+        {
+            "name": "Remote trekking belt",
+            "zone_type": "danger",
+            "shape": "circle",
+            "center": {"lat": 26.1733, "lng": 91.7458},
+            "radius_m": 1000
+        },
+        {
+            "name": "Riverside wildlife area",
+            "zone_type": "caution",
+            "shape": "polygon",
+            "polygon": [
+                {"lat": 26.1058, "lng": 91.6986},
+                {"lat": 26.1058, "lng": 91.7186},
+                {"lat": 26.1258, "lng": 91.7186},
+                {"lat": 26.1258, "lng": 91.6986}
+            ]
+        }
+    ]
+    
+    for zone_data in sample_zones:
+        zone = Zone(**zone_data)
+        await db.zones.insert_one(zone.dict())
+    await load_zones()
     
     # Sample tourists data
     sample_tourists = [
@@ -198,8 +1588,6 @@ async def init_sample_data():
             "phone": "+1-555-0123",
             "emergency_contact": "+1-555-0124",
             "location": {"lat": 26.1445, "lng": 91.7362},  # Guwahati
-            "safety_score": 85,
-            "zone_type": "safe",
             "status": "active",
             "hotel_name": "Hotel Royal",
             "itinerary": "Temple tour, Local markets"
@@ -211,8 +1599,6 @@ async def init_sample_data():
             "phone": "+44-20-7946-0958",
             "emergency_contact": "+44-20-7946-0959",
             "location": {"lat": 26.1158, "lng": 91.7086},
-            "safety_score": 67,
-            "zone_type": "caution",
             "status": "active",
             "hotel_name": "Brahmaputra Hotel",
             "itinerary": "Wildlife sanctuary, River cruise"
@@ -224,8 +1610,6 @@ async def init_sample_data():
             "phone": "+49-30-12345678",
             "emergency_contact": "+49-30-12345679",
             "location": {"lat": 26.1733, "lng": 91.7458},
-            "safety_score": 40,
-            "zone_type": "danger",
             "status": "active",
             "hotel_name": "Northeast Inn",
             "itinerary": "Adventure trekking, Remote villages"
@@ -237,8 +1621,6 @@ async def init_sample_data():
             "phone": "+34-91-123-4567",
             "emergency_contact": "+34-91-123-4568",
             "location": {"lat": 26.1341, "lng": 91.7880},
-            "safety_score": 78,
-            "zone_type": "safe",
             "status": "active",
             "hotel_name": "Paradise Resort",
             "itinerary": "Cultural sites, Photography"
@@ -250,8 +1632,6 @@ async def init_sample_data():
             "phone": "+81-3-1234-5678",
             "emergency_contact": "+81-3-1234-5679",
             "location": {"lat": 26.1689, "lng": 91.7631},
-            "safety_score": 92,
-            "zone_type": "safe",
             "status": "active",
             "hotel_name": "Assam Palace",
             "itinerary": "Tea gardens, Monasteries"
@@ -259,9 +1639,21 @@ async def init_sample_data():
     ]
     
     # Insert sample tourists
+    tourist_grid.clear()
+    geofence.zone_of.clear()
+    heartbeat.clear()
+    map_clusters.clear()
+    incident_window.clear()
+    tourist_search.clear()
     for tourist_data in sample_tourists:
         tourist = Tourist(**tourist_data)
-        await db.tourists.insert_one(tourist.dict())
+        tourist.zone_type = geofence.classify_one(tourist.location.lat, tourist.location.lng)
+        await db.tourists.insert_one(tourist_document(tourist))
+        tourist_search.add(tourist.dict())
+        tourist_grid.upsert(tourist.id, tourist.location.lat, tourist.location.lng)
+        geofence.zone_of[tourist.id] = tourist.zone_type
+        heartbeat.touch(tourist.id, tourist.last_seen.timestamp())
+        map_clusters.update(tourist.id, tourist.location.lat, tourist.location.lng, tourist.zone_type, tourist.status)
     
     # Sample incidents
     sample_incidents = [
@@ -279,8 +1671,29 @@ async def init_sample_data():
         incident = Incident(**incident_data)
         await db.incidents.insert_one(incident.dict())
     
+    await dashboard_counters.refresh(db)
+    await load_open_incidents()
+    await rescore_tourists()
+    await load_dispatch_state()
+    await load_heatmap()
+    await rollups.rebuild(db, geofence.classify, rollup_gate)
     return {"message": "Sample data initialized successfully"}
 
+@app.exception_handler(PoolSaturated)
+async def password_pool_saturated(request, exc):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many concurrent sign-ins, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body = render(http_metrics.render(), mongo_metrics.render(), component_gauges(component_stats()))
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -290,7 +1703,10 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Outermost, so the timings include every other middleware
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
 
 # Configure logging
 logging.basicConfig(
@@ -299,6 +1715,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+TOURIST_INDEX_PROJECTION = {
+    "_id": 0, "id": 1, "location": 1, "zone_type": 1, "status": 1, "last_seen": 1,
+    "name": 1, "passport_number": 1, "phone": 1, "hotel_name": 1,
+}
+SEARCH_FIELDS = ("id", "name", "passport_number", "phone", "hotel_name")
+
+async def load_tourist_grid():
+    # Backfill the GeoJSON field on documents written before it existed
+    await db.tourists.update_many(
+        {"geo": {"$exists": False}, "location.lat": {"$exists": True}},
+        [{"$set": {"geo": {"type": "Point", "coordinates": ["$location.lng", "$location.lat"]}}}],
+    )
+
+    points = []
+    heartbeats = []
+    members = []
+    searchable = []
+    zone_of = {}
+    async for doc in db.tourists.find({}, TOURIST_INDEX_PROJECTION):
+        searchable.append({field: doc.get(field) for field in SEARCH_FIELDS})
+        location = doc.get('location') or {}
+        if 'lat' in location and 'lng' in location:
+            points.append((doc['id'], location['lat'], location['lng']))
+            zone_of[doc['id']] = doc.get('zone_type')
+            members.append((doc['id'], location['lat'], location['lng'],
+                            doc.get('zone_type') or DEFAULT_ZONE_TYPE, doc.get('status') or "active"))
+        if doc.get('status') == "active" and doc.get('last_seen') is not None:
+            heartbeats.append((doc['id'], utc_timestamp(doc['last_seen'])))
+    # Swapped in without an await, so the write paths never see a half-loaded worker
+    geofence.zone_of.clear()
+    geofence.zone_of.update(zone_of)
+    tourist_grid.load(points)
+    heartbeat.load(heartbeats)
+    map_clusters.load(members)
+    tourist_search.load(searchable)
+    logger.info("Loaded %d tourist positions into the spatial index", len(tourist_grid))
+
+async def apply_tourist_changes(since):
+    """Fold tourists changed at or after epoch seconds ``since`` into this worker's in-memory indexes."""
+    changed = 0
+    cursor = db.tourists.find({"changed_at": {"$gte": datetime.fromtimestamp(since, timezone.utc)}}, TOURIST_INDEX_PROJECTION)
+    async for doc in cursor.batch_size(10000):
+        tourist_id = doc['id']
+        location = doc.get('location') or {}
+        if 'lat' in location and 'lng' in location:
+            tourist_grid.upsert(tourist_id, location['lat'], location['lng'])
+            geofence.zone_of[tourist_id] = doc.get('zone_type')
+            map_clusters.update(tourist_id, location['lat'], location['lng'],
+                                doc.get('zone_type') or DEFAULT_ZONE_TYPE, doc.get('status') or "active")
+        if doc.get('status') == "active" and doc.get('last_seen') is not None:
+            heartbeat.touch(tourist_id, utc_timestamp(doc['last_seen']))
+        elif doc.get('status') != "active":
+            heartbeat.forget(tourist_id)
+        if tourist_id not in tourist_search:
+            # Search fields never change after registration, so only new tourists need indexing
+            tourist_search.add({field: doc.get(field) for field in SEARCH_FIELDS})
+        changed += 1
+    return changed
+
+# Folds other workers' tourist writes into the grid, clusters, search and heartbeats
+tourist_resync = IndexResync(
+    collection_versions,
+    "tourists",
+    apply_tourist_changes,
+    load_tourist_grid,
+    poll_s=float(os.environ.get('TOURIST_RESYNC_INTERVAL_S', '2')),
+    reload_s=float(os.environ.get('TOURIST_RELOAD_INTERVAL_S', '300')),
+)
+
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes(db)
+    if os.environ.get('QUERY_PLAN_CHECK', 'false').lower() in ('1', 'true', 'yes'):
+        await check_query_plans(db)
+    await load_zones()
+    await load_tourist_grid()
+    await dashboard_counters.refresh(db)
+    await load_dispatch_state()
+    await load_heatmap()
+    if not await db.incident_rollups.find_one({}, {"_id": 1}) and await db.incidents.find_one({}, {"_id": 1}):
+        # First start with rollups: backfill them without holding up startup
+        start_rollup_rebuild()
+    await collection_versions.sync(db)
+    collection_versions.start(db)
+    location_buffer.start()
+    track_compactor.start(db)
+    heartbeat.start(db)
+    staleness_rescorer.start(db)
+    tourist_resync.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await tourist_resync.stop()
+    await location_buffer.stop()
+    await track_compactor.stop()
+    await heartbeat.stop(db)
+    await staleness_rescorer.stop(db)
+    await collection_versions.stop(db)
+    password_hasher.shutdown()
     client.close()
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""In-process dashboard counters.
+
+The counters are seeded from a single ``$facet`` aggregation and then updated
+by the write paths as tourists and incidents change, so serving the dashboard
+is a dictionary read. A full recount runs whenever the snapshot is older than
+``max_staleness_s`` which also bounds drift from writes made by other workers.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+TOURIST_STATUSES = ("active", "missing", "emergency")
+ZONE_TYPES = ("safe", "caution", "danger")
+EMERGENCY_SEVERITIES = ("high", "critical")
+
+TOURIST_FACET_PIPELINE = [
+    {"$facet": {
+        "total": [{"$count": "n"}],
+        "by_status": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+        "by_zone": [{"$group": {"_id": "$zone_type", "n": {"$sum": 1}}}],
+    }},
+]
+
+EMERGENCY_INCIDENT_QUERY = {"status": "open", "severity": {"$in": list(EMERGENCY_SEVERITIES)}}
+
+
+def is_emergency_incident(incident: Optional[dict]) -> bool:
+    return bool(incident) and incident.get("status") == "open" and incident.get("severity") in EMERGENCY_SEVERITIES
+
+
+class DashboardCounters:
+    def __init__(self, max_staleness_s: float = 30.0):
+        self.max_staleness_s = max_staleness_s
+        self.total_tourists = 0
+        self.by_status: Counter = Counter()
+        self.by_zone: Counter = Counter()
+        self.emergency_incidents = 0
+        self.as_of: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def age_s(self) -> Optional[float]:
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def is_stale(self) -> bool:
+        age = self.age_s
+        return age is None or age > self.max_staleness_s
+
+    async def refresh(self, db) -> None:
+        """Recount everything: one ``$facet`` over tourists plus one indexed incident count."""
+        facets = await db.tourists.aggregate(TOURIST_FACET_PIPELINE).to_list(1)
+        emergency = await db.incidents.count_documents(EMERGENCY_INCIDENT_QUERY)
+        facet = facets[0] if facets else {}
+        total = facet.get("total") or [{"n": 0}]
+        self.total_tourists = total[0]["n"]
+        self.by_status = Counter({row["_id"]: row["n"] for row in facet.get("by_status", [])})
+        self.by_zone = Counter({row["_id"]: row["n"] for row in facet.get("by_zone", [])})
+        self.emergency_incidents = emergency
+        self.as_of = datetime.now(timezone.utc)
+        self._loaded_at = time.monotonic()
+
+    async def ensure_fresh(self, db) -> None:
+        """Recount if the snapshot is past its staleness bound; concurrent callers share one recount."""
+        if not self.is_stale():
+            return
+        async with self._refresh_lock:
+            if self.is_stale():
+                await self.refresh(db)
+
+    def tourist_added(self, tourist: dict) -> None:
+        self.total_tourists += 1
+        self.by_status[tourist.get("status")] += 1
+        self.by_zone[tourist.get("zone_type")] += 1
+
+    def tourist_removed(self, tourist: dict) -> None:
+        self.total_tourists -= 1
+        self.by_status[tourist.get("status")] -= 1
+        self.by_zone[tourist.get("zone_type")] -= 1
+
+    def tourist_changed(self, before: dict, after: dict) -> None:
+        """Apply a status and/or zone transition; missing keys mean "unchanged"."""
+        if "status" in after and before.get("status") != after["status"]:
+            self.by_status[before.get("status")] -= 1
+            self.by_status[after["status"]] += 1
+        if "zone_type" in after and before.get("zone_type") != after["zone_type"]:
+            self.by_zone[before.get("zone_type")] -= 1
+            self.by_zone[after["zone_type"]] += 1
+
+    def incident_changed(self, before: Optional[dict], after: Optional[dict]) -> None:
+        """Track an incident insert (``before`` is None), update or delete (``after`` is None)."""
+        self.emergency_incidents += int(is_emergency_incident(after)) - int(is_emergency_incident(before))
+
+    def snapshot(self) -> dict:
+        age = self.age_s
+        return {
+            "total_tourists": self.total_tourists,
+            "active_tourists": self.by_status["active"],
+            "missing_tourists": self.by_status["missing"],
+            "emergency_incidents": self.emergency_incidents,
+            "zone_stats": {zone: self.by_zone[zone] for zone in ZONE_TYPES},
+            "as_of": self.as_of,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "max_staleness_seconds": self.max_staleness_s,
+        }
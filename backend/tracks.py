@@ -0,0 +1,276 @@
+"""Location history: columnar bucket documents per tourist per UTC day.
+
+Each bucket holds parallel ``ts``/``lat``/``lng`` arrays. Pings are appended
+with ``$push`` upserts, one per bucket per flush. A bucket takes pings only
+while it holds fewer than ``BUCKET_MAX_POINTS``; a busy day then rolls over
+into another bucket document, so none can approach Mongo's 16 MB document
+limit before it is compacted. Once a day has aged past
+``TrackCompactor.after_days`` its arrays are thinned with Douglas–Peucker
+and the bucket is marked ``simplified``. That bounds storage per tourist-day
+and keeps track reads to a handful of small documents.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from pymongo import UpdateOne
+
+from geo_index import METERS_PER_DEGREE_LAT
+
+logger = logging.getLogger(__name__)
+
+# About 1.5 MB of arrays; a bucket overshoots by at most one flush's worth
+BUCKET_MAX_POINTS = 20000
+
+
+def day_key(ts: datetime) -> str:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.strftime("%Y-%m-%d")
+
+
+def track_buckets(tourist_id: str, pings: Iterable[tuple], max_points: int = BUCKET_MAX_POINTS) -> List[dict]:
+    """Pack ``(ts, lat, lng)`` pings into columnar documents of at most ``max_points`` per tourist per UTC day."""
+    buckets = []
+    open_buckets = {}
+    for ts, lat, lng in pings:
+        day = day_key(ts)
+        bucket = open_buckets.get(day)
+        if bucket is None or len(bucket["ts"]) >= max_points:
+            bucket = open_buckets[day] = {
+                "tourist_id": tourist_id, "day": day, "start": ts,
+                "ts": [], "lat": [], "lng": [], "simplified": False,
+            }
+            buckets.append(bucket)
+        bucket["ts"].append(ts)
+        bucket["lat"].append(lat)
+        bucket["lng"].append(lng)
+        bucket["end"] = ts
+    for bucket in buckets:
+        bucket["count"] = len(bucket["ts"])
+    return buckets
+
+
+def bucket_updates(pings: List[tuple], max_points: int = BUCKET_MAX_POINTS) -> List[Tuple[UpdateOne, List[int]]]:
+    """``$push`` upserts for a batch of ``(tourist_id, lat, lng, ts)`` pings.
+
+    Each operation comes with the positions in ``pings`` it writes, so a
+    caller can retry just the pings of the operations that failed. There is
+    one operation per (tourist, day), or more when a day has over
+    ``max_points`` pings in the batch.
+    """
+    grouped = {}
+    for position, (tourist_id, lat, lng, ts) in enumerate(pings):
+        grouped.setdefault((tourist_id, day_key(ts)), []).append((ts, lat, lng, position))
+    operations = []
+    for (tourist_id, day), points in grouped.items():
+        points.sort(key=lambda point: point[0])
+        for start in range(0, len(points), max_points):
+            chunk = points[start:start + max_points]
+            operations.append((UpdateOne(
+                # Only a bucket with room takes the pings; otherwise a new one is upserted
+                {"tourist_id": tourist_id, "day": day, "count": {"$lt": max_points}},
+                {
+                    "$push": {
+                        "ts": {"$each": [point[0] for point in chunk]},
+                        "lat": {"$each": [point[1] for point in chunk]},
+                        "lng": {"$each": [point[2] for point in chunk]},
+                    },
+                    "$inc": {"count": len(chunk)},
+                    "$min": {"start": chunk[0][0]},
+                    "$max": {"end": chunk[-1][0]},
+                    # Late pings for an old day get it simplified again
+                    "$set": {"simplified": False},
+                },
+                upsert=True,
+            ), [point[3] for point in chunk]))
+    return operations
+
+
+def douglas_peucker(lat: np.ndarray, lng: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Boolean mask of the points kept when simplifying a polyline to ``tolerance_m``."""
+    count = len(lat)
+    keep = np.zeros(count, dtype=bool)
+    if count <= 2 or tolerance_m <= 0:
+        keep[:] = True
+        return keep
+
+    # Local equirectangular projection; plenty accurate at the scale of one day's walk
+    cos_lat = math.cos(math.radians(float(lat[0])))
+    y = (lat - lat[0]) * METERS_PER_DEGREE_LAT
+    x = (lng - lng[0]) * METERS_PER_DEGREE_LAT * cos_lat
+
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            distances = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+            distances = np.hypot(px - t * dx, py - t * dy)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def simplify_bucket(bucket: dict, tolerance_m: float, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> dict:
+    """The bucket's points in time order, restricted to ``[start, end]`` and simplified."""
+    ts = np.array(bucket["ts"], dtype="datetime64[ms]")
+    lat = np.asarray(bucket["lat"], dtype=np.float64)
+    lng = np.asarray(bucket["lng"], dtype=np.float64)
+    order = np.argsort(ts, kind="stable")
+    if start is not None or end is not None:
+        in_range = np.ones(len(order), dtype=bool)
+        if start is not None:
+            in_range &= ts[order] >= np.datetime64(_naive_utc(start), "ms")
+        if end is not None:
+            in_range &= ts[order] <= np.datetime64(_naive_utc(end), "ms")
+        order = order[in_range]
+    kept = order[douglas_peucker(lat[order], lng[order], tolerance_m)]
+    return {
+        "ts": [bucket["ts"][i] for i in kept.tolist()],
+        "lat": lat[kept].tolist(),
+        "lng": lng[kept].tolist(),
+    }
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def track_rows(db, tourist_id: str, start: datetime, end: datetime,
+                     tolerance_m: float) -> AsyncIterator[bytes]:
+    """NDJSON, one line per day: the simplified polyline for that part of the range."""
+    cursor = db.location_tracks.find(
+        {"tourist_id": tourist_id, "day": {"$gte": day_key(start), "$lte": day_key(end)}},
+        {"_id": 0, "day": 1, "ts": 1, "lat": 1, "lng": 1, "count": 1},
+    ).sort([("day", 1), ("start", 1)])
+
+    def line(day):
+        simplified = simplify_bucket(day, tolerance_m, start, end)
+        if simplified["ts"]:
+            return orjson.dumps({"day": day["day"], "stored": day["count"], **simplified},
+                                option=orjson.OPT_APPEND_NEWLINE)
+        return None
+
+    # A busy day spans several buckets; they are joined before simplifying
+    day = None
+    async for bucket in cursor:
+        if day is not None and day["day"] != bucket["day"]:
+            row = line(day)
+            if row:
+                yield row
+            day = None
+        if day is None:
+            day = {"day": bucket["day"], "ts": [], "lat": [], "lng": [], "count": 0}
+        day["ts"].extend(bucket["ts"])
+        day["lat"].extend(bucket["lat"])
+        day["lng"].extend(bucket["lng"])
+        day["count"] += bucket.get("count", len(bucket["ts"]))
+    if day is not None:
+        row = line(day)
+        if row:
+            yield row
+
+
+class TrackCompactor:
+    """Periodically simplifies buckets older than ``after_days``."""
+
+    def __init__(self, after_days: int = 2, tolerance_m: float = 15.0,
+                 interval_s: float = 3600.0, batch_size: int = 500):
+        self.after_days = after_days
+        self.tolerance_m = tolerance_m
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self.buckets_simplified = 0
+        self.points_before = 0
+        self.points_after = 0
+        self.runs = 0
+        self.errors = 0
+        self.last_run_ms = 0.0
+
+    async def compact(self, db) -> int:
+        """Simplify every aged, unsimplified bucket; returns how many were rewritten."""
+        cutoff = day_key(datetime.now(timezone.utc) - timedelta(days=self.after_days))
+        started = time.perf_counter()
+        done = 0
+        while True:
+            buckets = await db.location_tracks.find(
+                {"simplified": False, "day": {"$lt": cutoff}},
+                {"_id": 1, "ts": 1, "lat": 1, "lng": 1, "count": 1},
+            ).limit(self.batch_size).to_list(self.batch_size)
+            if not buckets:
+                break
+            operations = []
+            for bucket in buckets:
+                line = simplify_bucket(bucket, self.tolerance_m)
+                self.points_before += len(bucket["ts"])
+                self.points_after += len(line["ts"])
+                # Matching on count skips buckets that gained pings meanwhile
+                operations.append(UpdateOne(
+                    {"_id": bucket["_id"], "count": bucket.get("count")},
+                    {"$set": {**line, "count": len(line["ts"]), "simplified": True}},
+                ))
+            result = await db.location_tracks.bulk_write(operations, ordered=False)
+            done += result.modified_count
+            if result.modified_count == 0:
+                break
+        self.buckets_simplified += done
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        return done
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                await self.compact(db)
+            except Exception:
+                self.errors += 1
+                logger.exception("Track compaction failed")
+            await asyncio.sleep(self.interval_s)
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "buckets_simplified": self.buckets_simplified,
+            "points_before": self.points_before,
+            "points_after": self.points_after,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_ms": round(self.last_run_ms, 3),
+            "after_days": self.after_days,
+            "tolerance_m": self.tolerance_m,
+        }
@@ -0,0 +1,117 @@
+"""Per-collection version counters behind the list routes' ETags.
+
+Every write path calls ``bump(collection)``. This worker's tag changes at
+once. The bumps are then added to a shared counter in Mongo's ``versions``
+collection on the next sync, and every worker adopts that counter on its
+own sync. All workers therefore converge on the same tag within
+``sync_interval_s``. A quiet collection keeps its tag, so conditional GETs
+are answered with no database work at all. ``foreign(name)`` counts just the
+bumps other workers shared, which tells in-memory state when it may be
+missing writes this worker never saw.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionVersions:
+    def __init__(self, names: Iterable[str], sync_interval_s: float = 1.0):
+        self.names = tuple(names)
+        self.sync_interval_s = sync_interval_s
+        self.worker = f"{os.getpid():x}{uuid.uuid4().hex[:4]}"
+        # name -> (epoch, shared version) as last read from Mongo
+        self._shared: Dict[str, Tuple[str, int]] = {name: ("0", 0) for name in self.names}
+        # bumps not yet added to the shared counter, and a never-reset local sequence
+        self._dirty: Dict[str, int] = {name: 0 for name in self.names}
+        self._sequence: Dict[str, int] = {name: 0 for name in self.names}
+        # bumps adopted from other workers (or a reset counter) since startup
+        self._foreign: Dict[str, int] = {name: 0 for name in self.names}
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def bump(self, name: str) -> None:
+        self._dirty[name] += 1
+        self._sequence[name] += 1
+
+    def tag(self, *names: str) -> str:
+        parts = []
+        for name in names:
+            epoch, version = self._shared[name]
+            part = f"{epoch}.{version}"
+            if self._dirty[name]:
+                # Local writes not yet shared: unique to this worker until the next sync
+                part += f"+{self.worker}.{self._sequence[name]}"
+            parts.append(part)
+        return "-".join(parts)
+
+    def shared(self, name: str) -> Tuple[str, int]:
+        """(epoch, version) of ``name`` as last read from Mongo; moves when any worker's writes are synced."""
+        return self._shared[name]
+
+    def foreign(self, name: str) -> int:
+        """How many of ``name``'s bumps came from other workers; moves only when their writes are synced."""
+        return self._foreign[name]
+
+    def _adopt(self, name: str, epoch: str, version: int, own: int = 0) -> None:
+        previous_epoch, previous = self._shared[name]
+        if epoch != previous_epoch:
+            self._foreign[name] += 1
+        else:
+            self._foreign[name] += max(0, version - previous - own)
+        self._shared[name] = (epoch, version)
+
+    async def sync(self, db) -> None:
+        for name in self.names:
+            pending = self._dirty[name]
+            if not pending:
+                continue
+            doc = await db.versions.find_one_and_update(
+                {"_id": name},
+                {"$inc": {"v": pending}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            self._dirty[name] -= pending
+            self._adopt(name, doc["epoch"], doc["v"], own=pending)
+        async for doc in db.versions.find({"_id": {"$in": list(self.names)}}):
+            self._adopt(doc["_id"], doc["epoch"], doc["v"])
+        self.syncs += 1
+
+    async def _run(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval_s)
+            try:
+                await self.sync(db)
+            except Exception:
+                self.sync_errors += 1
+                logger.exception("Collection version sync failed")
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self, db) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync(db)
+
+    def stats(self) -> dict:
+        return {
+            **{f"{name}_version": self._shared[name][1] for name in self.names},
+            **{f"{name}_unsynced": self._dirty[name] for name in self.names},
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+        }
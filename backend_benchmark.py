@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""In-process load test for the Tourist Safety API.
+
+Starts ``backend/server.py``'s FastAPI app inside this process (no network,
+no uvicorn), seeds tourists and incidents, then drives concurrent requests
+at the hot endpoints and reports p50/p95/p99 latency and requests/second.
+
+    python backend_benchmark.py --in-memory --tourists 20000
+    python backend_benchmark.py --mongo-url mongodb://localhost:27017 --output run.json
+    python backend_benchmark.py --in-memory --compare run.json
+
+``--in-memory`` needs ``pip install mongomock-motor``; results against a real
+local Mongo are the ones worth comparing between runs.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+CENTER = (26.1445, 91.7362)  # Guwahati
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--mongo-url", default=None, help="local Mongo to benchmark against")
+    parser.add_argument("--db-name", default="sahyatri_benchmark")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of a Mongo server")
+    parser.add_argument("--tourists", type=int, default=10000)
+    parser.add_argument("--incidents", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--compare", default=None, help="previous results JSON to diff against")
+    return parser.parse_args()
+
+
+def load_server(args):
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+    return server
+
+
+async def seed(server, args):
+    import seed_data
+
+    summary = await seed_data.generate(
+        server.db,
+        tourists=args.tourists,
+        incidents=args.incidents,
+        seed=args.seed,
+        clear=True,
+        classify=server.geofence.classify,
+    )
+    await server.db.users.delete_many({"email": "bench@example.com"})
+
+    # Rebuild the in-process indexes the way startup would
+    await server.load_tourist_grid()
+    await server.dashboard_counters.refresh(server.db)
+    return summary
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(make_request, args):
+    latencies = []
+    errors = 0
+    remaining = iter(range(args.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+async def benchmark(server, args):
+    import httpx
+
+    await server.app.router.startup()
+    try:
+        print(f"Seeding {args.tourists} tourists and {args.incidents} incidents...")
+        await seed(server, args)
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench/api") as client:
+            credentials = {"email": "bench@example.com", "password": "bench-password"}
+            await client.post("/auth/register", json={**credentials, "name": "Bench Officer"})
+            token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            rng = random.Random(args.seed)
+
+            def jitter():
+                return CENTER[0] + rng.gauss(0, 0.05), CENTER[1] + rng.gauss(0, 0.05)
+
+            async def nearby(_):
+                lat, lng = jitter()
+                return await client.get("/tourists/nearby", headers=headers,
+                                        params={"lat": lat, "lng": lng, "radius_m": 2000, "limit": 50})
+
+            async def create_incident(i):
+                lat, lng = jitter()
+                return await client.post("/incidents", headers=headers, json={
+                    "tourist_id": f"bench-{i}", "type": "medical", "description": "Benchmark",
+                    "location": {"lat": lat, "lng": lng}, "severity": "medium",
+                })
+
+            scenarios = {
+                "login": lambda _: client.post("/auth/login", json=credentials),
+                "dashboard_stats": lambda _: client.get("/dashboard/stats", headers=headers),
+                "list_tourists": lambda _: client.get("/tourists", headers=headers, params={"limit": 100}),
+                "list_tourists_map_fields": lambda _: client.get(
+                    "/tourists", headers=headers, params={"limit": 100, "fields": "id,location,zone_type,status"}),
+                "list_incidents": lambda _: client.get("/incidents", headers=headers, params={"limit": 100}),
+                "nearby": nearby,
+                "create_incident": create_incident,
+            }
+
+            results = {}
+            for name, make_request in scenarios.items():
+                results[name] = await run_scenario(make_request, args)
+                print(f"  {name:<26} {results[name]['rps']:>9} rps   p50 {results[name]['p50_ms']:>8} ms"
+                      f"   p95 {results[name]['p95_ms']:>8} ms   p99 {results[name]['p99_ms']:>8} ms"
+                      f"   errors {results[name]['errors']}")
+            return results
+    finally:
+        await server.app.router.shutdown()
+
+
+def compare(results, previous_path):
+    previous = json.loads(Path(previous_path).read_text())["results"]
+    print(f"\nChange vs {previous_path} (negative latency / positive rps is better):")
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        rps_delta = (current["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        p99_delta = (current["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100 if before["p99_ms"] else 0.0
+        print(f"  {name:<26} rps {rps_delta:+7.1f}%   p99 {p99_delta:+7.1f}%")
+
+
+def main():
+    args = parse_args()
+    server = load_server(args)
+    results = asyncio.run(benchmark(server, args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "backend": "in-memory" if args.in_memory else os.environ["MONGO_URL"],
+            "tourists": args.tourists,
+            "incidents": args.incidents,
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
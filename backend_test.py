@@ -179,6 +179,40 @@ class TouristSafetyAPITester:
                 print(f"   Sample incident: {incident['type']} - {incident['severity']} severity")
         return success
 
+    def test_nearby_tourists(self):
+        """Test radius lookup around a sample tourist"""
+        success, response = self.run_test(
+            "Nearby Tourists",
+            "GET",
+            "tourists/nearby?lat=26.1445&lng=91.7362&radius_m=5000&limit=10",
+            200
+        )
+        
+        if success and isinstance(response, list):
+            print(f"   Found {len(response)} tourists within 5 km")
+            distances = [tourist.get('distance_m', 0) for tourist in response]
+            if distances != sorted(distances):
+                print("   Warning: Nearby tourists are not sorted by distance")
+                return False
+        return success
+
+    def test_get_zones(self):
+        """Test that sample zones drive tourist zone types"""
+        success, response = self.run_test(
+            "Get Zones",
+            "GET",
+            "zones",
+            200
+        )
+        
+        if success and isinstance(response, list):
+            print(f"   Found {len(response)} zones")
+            for zone in response:
+                if zone.get('shape') not in ('circle', 'polygon'):
+                    print(f"   Warning: Unexpected zone shape '{zone.get('shape')}'")
+                    return False
+        return success
+
     def test_create_incident(self):
         """Test creating a new incident"""
         incident_data = {
@@ -265,6 +299,8 @@ def main():
     tester.test_dashboard_stats()
     tester.test_get_tourists()
     tester.test_get_incidents()
+    tester.test_nearby_tourists()
+    tester.test_get_zones()
     
     # Test 5: Data creation
     print("\n📋 PHASE 5: Data Creation Tests")
@@ -10,8 +10,7 @@ const SignupPage = ({ onLogin }) => {
     name: '',
     email: '',
     password: '',
-    confirmPassword: '',
-    role: 'officer'
+    confirmPassword: ''
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
@@ -40,8 +39,7 @@ const SignupPage = ({ onLogin }) => {
       await axios.post(`${API}/auth/register`, {
         name: formData.name,
         email: formData.email,
-        password: formData.password,
-        role: formData.role
+        password: formData.password
       });
 
       // Login automatically
@@ -104,22 +102,6 @@ const SignupPage = ({ onLogin }) => {
           />
         </div>
 
-        <div className="form-group">
-          <label htmlFor="role" className="form-label">
-            Role
-          </label>
-          <select
-            id="role"
-            name="role"
-            className="form-input"
-            value={formData.role}
-            onChange={handleChange}
-          >
-            <option value="officer">Officer</option>
-            <option value="admin">Admin</option>
-          </select>
-        </div>
-
         <div className="form-group">
           <label htmlFor="password" className="form-label">
             Password
@@ -0,0 +1,42 @@
+import auth_cache
+from auth_cache import PrincipalCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_expired_principals_are_misses_and_dropped(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth_cache.time, "monotonic", clock)
+    cache = PrincipalCache(ttl_s=60)
+    cache.put("a@example.com", "alice")
+    assert cache.get("a@example.com") == "alice"
+    clock.now += 61
+    assert cache.get("a@example.com") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_least_recently_used_principal_is_evicted_first():
+    cache = PrincipalCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_counts_only_cached_subjects():
+    cache = PrincipalCache()
+    cache.put("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
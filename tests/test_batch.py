@@ -0,0 +1,64 @@
+import asyncio
+import gzip
+
+import orjson
+
+from batch import BATCH_USER_SCOPE_KEY, combine, maybe_gzip, run_subrequest
+
+
+def app_returning(body, content_type=b"application/json", chunks=1):
+    async def app(scope, receive, send):
+        app.scope = scope
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type), (b"set-cookie", b"secret")]})
+        for _ in range(chunks):
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+def test_subrequest_carries_the_principal_and_forwards_only_listed_headers():
+    app = app_returning(b'{"ok":true}')
+    parent = {"headers": [(b"authorization", b"Bearer t"), (b"cookie", b"c")]}
+    result = asyncio.run(run_subrequest(app, parent, "/api/tourists?limit=5", {}, "officer"))
+    assert result == {"status": 200, "headers": {"content-type": "application/json"}, "body": b'{"ok":true}'}
+    assert app.scope[BATCH_USER_SCOPE_KEY] == "officer"
+    assert (app.scope["path"], app.scope["query_string"]) == ("/api/tourists", b"limit=5")
+    assert app.scope["headers"] == [(b"authorization", b"Bearer t")]
+
+
+def test_body_past_the_limit_is_answered_413_in_its_slot():
+    app = app_returning(b"x" * 100, chunks=1000)
+    result = asyncio.run(run_subrequest(app, {}, "/api/export", {}, None, max_bytes=1000))
+    assert result["status"] == 413
+    assert b"1000 byte limit" in result["body"]
+
+
+def test_failing_route_becomes_a_500_slot():
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    result = asyncio.run(run_subrequest(app, {}, "/api/broken", {}, None))
+    assert result["status"] == 500
+
+
+def test_combine_splices_json_and_quotes_everything_else():
+    results = [
+        {"status": 200, "headers": {"content-type": "application/json"}, "body": b'{"a":1}'},
+        {"status": 200, "headers": {"content-type": "text/csv"}, "body": b"a,b\n"},
+        {"status": 204, "headers": {}, "body": b""},
+    ]
+    combined = orjson.loads(combine(["one", "two", None], results))
+    assert [entry["body"] for entry in combined["responses"]] == [{"a": 1}, "a,b\n", None]
+    assert combined["responses"][2]["id"] is None
+
+
+def test_only_large_bodies_are_gzipped_and_only_when_accepted():
+    small, headers = asyncio.run(maybe_gzip(b"{}", "gzip"))
+    assert small == b"{}" and "Content-Encoding" not in headers
+    large = b"[" + b"1," * 2000 + b"1]"
+    plain, _ = asyncio.run(maybe_gzip(large, "identity"))
+    assert plain == large
+    compressed, headers = asyncio.run(maybe_gzip(large, "gzip, br"))
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed) == large
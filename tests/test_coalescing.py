@@ -0,0 +1,65 @@
+import asyncio
+
+import coalescing
+from coalescing import CoalescingWindow
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeats_slide_the_window_until_reports_go_quiet(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(coalescing.time, "monotonic", clock)
+    window = CoalescingWindow(window_s=60)
+    window.opened_incident(("t1", "panic"), "inc-1")
+    clock.now += 50
+    assert window.get(("t1", "panic")) == "inc-1"
+    window.repeated(("t1", "panic"), "inc-1")
+    clock.now += 50
+    assert window.get(("t1", "panic")) == "inc-1"
+    clock.now += 61
+    assert window.get(("t1", "panic")) is None
+    assert window.stats()["expired"] == 1
+
+
+def test_disabled_window_remembers_nothing():
+    window = CoalescingWindow(window_s=0)
+    window.opened_incident(("t1", "panic"), "inc-1")
+    assert not window.enabled
+    assert window.get(("t1", "panic")) is None
+
+
+def test_oldest_keys_are_dropped_beyond_max_keys():
+    window = CoalescingWindow(max_keys=2)
+    for n in range(3):
+        window.opened_incident(("t", n), f"inc-{n}")
+    assert window.get(("t", 0)) is None
+    assert window.stats()["open_windows"] == 2
+
+
+def test_hold_serialises_a_burst_and_releases_after_a_failure():
+    window = CoalescingWindow()
+    opened = []
+
+    async def report(fail=False):
+        async with window.hold(("t1", "panic")):
+            if window.get(("t1", "panic")) is None:
+                await asyncio.sleep(0)
+                if fail:
+                    raise RuntimeError("insert failed")
+                opened.append("inc")
+                window.opened_incident(("t1", "panic"), "inc")
+
+    async def scenario():
+        return await asyncio.gather(report(fail=True), report(), report(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert isinstance(results[0], RuntimeError)
+    # The failed report doesn't hold the key, and only one of the others opens an incident
+    assert opened == ["inc"]
+    assert window._locks == {}
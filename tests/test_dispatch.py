@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+from dispatch import DispatchEngine
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def entry(incident_id, severity, minutes=0):
+    return {"id": incident_id, "severity": severity, "reported_at": NOW + timedelta(minutes=minutes)}
+
+
+def test_waiting_orders_by_severity_then_age():
+    engine = DispatchEngine()
+    engine.enqueue(entry("low", "low"))
+    engine.enqueue(entry("late", "critical", 5))
+    engine.enqueue(entry("early", "critical", 1))
+    assert [incident["id"] for incident in engine.waiting()] == ["early", "late", "low"]
+    assert engine.next_waiting()["id"] == "early"
+
+
+def test_requeued_incident_is_listed_once():
+    engine = DispatchEngine()
+    engine.enqueue(entry("a", "high"))
+    engine.enqueue(entry("b", "low"))
+    engine.discard("a")
+    engine.enqueue(entry("a", "high"))
+    assert [incident["id"] for incident in engine.waiting()] == ["a", "b"]
+    assert [incident["id"] for incident in engine.waiting(limit=1)] == ["a"]
+
+
+def test_nearest_available_skips_reserved_officers():
+    engine = DispatchEngine()
+    engine.update_officer("near", 28.600, 77.200)
+    engine.update_officer("far", 28.650, 77.250)
+    assert engine.nearest_available(28.601, 77.201)[0] == "near"
+    engine.reserve("near", "incident")
+    assert engine.nearest_available(28.601, 77.201)[0] == "far"
+    engine.release_officer("near")
+    assert engine.nearest_available(28.601, 77.201)[0] == "near"
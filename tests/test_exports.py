@@ -0,0 +1,58 @@
+import asyncio
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+import exports
+
+COLUMNS = [
+    ("id", ("id",), "str"),
+    ("lat", ("location", "lat"), "float"),
+    ("reported_at", ("reported_at",), "datetime"),
+]
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+def collect(stream):
+    async def run():
+        return [chunk async for chunk in stream]
+    return asyncio.run(run())
+
+
+def docs(count):
+    return [{"id": str(i), "location": {"lat": 28.5 + i}, "reported_at": datetime(2024, 5, 1, i)} for i in range(count)]
+
+
+def test_batches_group_the_cursor():
+    assert [len(batch) for batch in collect(exports.batches(Cursor(docs(5)), batch_size=2))] == [2, 2, 1]
+
+
+def test_csv_writes_naive_datetimes_as_utc_and_blanks_missing_values():
+    rows = docs(1) + [{"id": "x", "location": "unknown"}]
+    body = b"".join(collect(exports.csv_stream(exports.batches(Cursor(rows)), COLUMNS))).decode()
+    assert body.splitlines() == ["id,lat,reported_at", "0,28.5,2024-05-01T00:00:00+00:00", "x,,"]
+
+
+def test_parquet_round_trip_has_one_row_group_per_batch():
+    pq = pytest.importorskip("pyarrow.parquet")
+    body = b"".join(collect(exports.parquet_stream(exports.batches(Cursor(docs(3)), batch_size=2), COLUMNS)))
+    parquet = pq.ParquetFile(io.BytesIO(body))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column("id").to_pylist() == ["0", "1", "2"]
+    assert table.column("reported_at").to_pylist()[0] == datetime(2024, 5, 1, tzinfo=timezone.utc)
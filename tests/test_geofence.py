@@ -0,0 +1,56 @@
+import numpy as np
+
+from geofence import GeofenceEngine, ZONE_CODES, points_in_polygon
+
+SQUARE_LATS = np.array([0.0, 0.0, 1.0, 1.0])
+SQUARE_LNGS = np.array([0.0, 1.0, 1.0, 0.0])
+
+
+def contains(points, poly_lats, poly_lngs):
+    lats = np.array([lat for lat, _ in points], dtype=np.float64)
+    lngs = np.array([lng for _, lng in points], dtype=np.float64)
+    return points_in_polygon(lats, lngs, poly_lats, poly_lngs).tolist()
+
+
+def test_square_inside_and_outside():
+    assert contains([(0.5, 0.5), (1.5, 0.5), (0.5, -0.5), (-0.1, -0.1)], SQUARE_LATS, SQUARE_LNGS) == [
+        True, False, False, False,
+    ]
+
+
+def test_edges_are_half_open():
+    # Points on the low edges are inside and on the high edges outside, so zones sharing an edge never both claim a point
+    points = [(0.0, 0.5), (0.5, 0.0), (0.0, 0.0), (1.0, 0.5), (0.5, 1.0), (1.0, 1.0)]
+    assert contains(points, SQUARE_LATS, SQUARE_LNGS) == [True, True, True, False, False, False]
+
+
+def test_ray_through_a_vertex_counts_once():
+    diamond_lats = np.array([0.0, 0.5, 1.0, 0.5])
+    diamond_lngs = np.array([0.5, 1.0, 0.5, 0.0])
+    assert contains([(0.5, 0.5), (0.5, 0.99), (0.5, -0.2), (0.5, 1.2)], diamond_lats, diamond_lngs) == [
+        True, True, False, False,
+    ]
+
+
+def test_concave_notch_is_outside():
+    # A U shape open to the north
+    u_lats = np.array([0.0, 0.0, 1.0, 1.0, 0.3, 0.3, 1.0, 1.0])
+    u_lngs = np.array([0.0, 1.0, 1.0, 0.7, 0.7, 0.3, 0.3, 0.0])
+    assert contains([(0.6, 0.5), (0.2, 0.5), (0.6, 0.1), (0.6, 0.9)], u_lats, u_lngs) == [False, True, True, True]
+
+
+def test_degenerate_polygon_contains_nothing():
+    line_lats = np.array([0.0, 1.0, 0.5])
+    line_lngs = np.array([0.0, 1.0, 0.5])
+    assert contains([(0.5, 0.5), (0.25, 0.25)], line_lats, line_lngs) == [False, False]
+
+
+def test_engine_takes_the_most_severe_overlapping_zone():
+    engine = GeofenceEngine()
+    square = [{"lat": lat, "lng": lng} for lat, lng in zip(SQUARE_LATS, SQUARE_LNGS)]
+    engine.load([
+        {"id": "caution", "zone_type": "caution", "shape": "polygon", "polygon": square},
+        {"id": "danger", "zone_type": "danger", "shape": "circle", "center": {"lat": 0.5, "lng": 0.5}, "radius_m": 1000},
+    ])
+    codes = engine.classify([0.5, 0.2, 2.0], [0.5, 0.2, 2.0])
+    assert codes.tolist() == [ZONE_CODES["danger"], ZONE_CODES["caution"], ZONE_CODES["safe"]]
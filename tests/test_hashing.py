@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from hashing import PasswordHasher, PoolSaturated
+
+
+class BlockingContext:
+    """Stands in for passlib so a test decides when each hash finishes."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+    def verify(self, password, hashed):
+        return hashed == f"hashed:{password}"
+
+
+def hasher(workers=1, max_queue=0):
+    pool = PasswordHasher(workers=workers, max_queue=max_queue)
+    pool._context = BlockingContext()
+    return pool
+
+
+def test_interactive_calls_are_rejected_once_the_backlog_is_full():
+    pool = hasher()
+
+    async def scenario():
+        first = asyncio.create_task(pool.hash("one"))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturated):
+            await pool.hash("two")
+        pool._context.release.set()
+        return await first
+
+    assert asyncio.run(scenario()) == "hashed:one"
+    stats = pool.stats()
+    assert (stats["rejected"], stats["completed"], stats["in_flight"]) == (1, 1, 0)
+    pool.shutdown()
+
+
+def test_bulk_hashing_waits_instead_of_being_rejected():
+    pool = hasher()
+
+    async def scenario():
+        batch = asyncio.create_task(pool.hash_many(["a", "b", "c"]))
+        while pool.stats()["in_flight"] < 3:
+            await asyncio.sleep(0)
+        # The bulk calls count as in flight, so interactive callers see the pool as full
+        with pytest.raises(PoolSaturated):
+            await pool.hash("login")
+        pool._context.release.set()
+        return await batch
+
+    assert asyncio.run(scenario()) == ["hashed:a", "hashed:b", "hashed:c"]
+    assert pool.stats()["completed"] == 3
+    pool.shutdown()
+
+
+def test_failed_hash_still_frees_its_slot():
+    pool = hasher()
+
+    def broken(password):
+        raise ValueError("backend missing")
+
+    pool._context.hash = broken
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await pool.hash("x")
+        pool._context.release.set()
+        return await pool.verify("y", "hashed:y")
+
+    assert asyncio.run(scenario()) is True
+    assert pool.stats()["in_flight"] == 0
+    pool.shutdown()
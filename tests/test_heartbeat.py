@@ -0,0 +1,40 @@
+import asyncio
+
+from heartbeat import HeartbeatMonitor
+
+
+class Leader:
+    is_leader = True
+
+    async def acquire(self, db):
+        return True
+
+
+def monitor(flagged, overdue=()):
+    async def on_expired(tourist_ids):
+        flagged.extend(tourist_ids)
+        return len(tourist_ids)
+
+    async def sweep(cutoff, limit):
+        return list(overdue)[:limit]
+
+    return HeartbeatMonitor(on_expired, Leader(), timeout_s=60, sweep_fn=sweep if overdue else None)
+
+
+def test_due_skips_deadlines_moved_by_later_pings():
+    heartbeat = HeartbeatMonitor(None, Leader(), timeout_s=60)
+    heartbeat.load([("a", 0.0), ("b", 10.0)])
+    heartbeat.touch("a", 100.0)
+    assert heartbeat.due(75.0, 10) == ["b"]
+    assert heartbeat.due(200.0, 10) == ["a"]
+
+
+def test_leader_sweeps_tourists_pinged_through_other_workers():
+    flagged = []
+    heartbeat = monitor(flagged, overdue=["remote", "local"])
+    heartbeat.load([("local", 0.0)])
+    asyncio.run(heartbeat.tick(None))
+    # Once each, whether it surfaced from the heap or the sweep
+    assert sorted(flagged) == ["local", "remote"]
+    assert heartbeat.stats()["swept"] == 1
+    assert len(heartbeat) == 0
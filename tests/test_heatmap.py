@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+from heatmap import IncidentHeatmap
+
+BOUNDS = (20.0, 80.0, 30.0, 90.0)
+NOW = datetime.now(timezone.utc)
+OLD = NOW - timedelta(days=100)
+
+
+def heatmap():
+    return IncidentHeatmap(bounds=BOUNDS, cell_deg=0.1, retention_days=7)
+
+
+def total(grid, since=None):
+    return grid.query(*BOUNDS, resolution=16, since=since)["total"]
+
+
+def test_load_splits_recent_days_from_older_ones():
+    grid = heatmap()
+    grid.load([("a", NOW, 25.0, 85.0), ("b", OLD, 25.0, 85.0), ("c", NOW, 50.0, 85.0)])
+    assert (grid.total, grid.out_of_bounds) == (2, 1)
+    assert total(grid) == 2
+    assert total(grid, since=NOW - timedelta(days=1)) == 1
+
+
+def test_adds_during_a_rebuild_are_replayed_once():
+    grid = heatmap()
+    grid.load([])
+    grid.begin_rebuild()
+    grid.add(25.0, 85.0, NOW, "seen")     # the rebuild query returns this one
+    grid.add(25.0, 85.0, NOW, "missed")   # inserted after the query read past it
+    grid.load([("seen", NOW, 25.0, 85.0), ("other", NOW, 26.0, 86.0)])
+    assert grid.replayed == 1
+    assert grid.total == total(grid) == 3
+
+
+def test_cancelled_rebuild_stops_recording():
+    grid = heatmap()
+    grid.load([])
+    grid.begin_rebuild()
+    grid.cancel_rebuild()
+    grid.add(25.0, 85.0, NOW, "a")
+    grid.load([])
+    assert grid.replayed == 0 and grid.total == 0
+
+
+def test_window_rebuild_keeps_older_counts():
+    grid = heatmap()
+    grid.load([("old", OLD, 25.0, 85.0), ("recent", NOW, 25.0, 85.0)])
+    assert grid.window_start() <= NOW - timedelta(days=6)
+
+    grid.begin_rebuild()
+    grid.add(25.0, 85.0, OLD, "backdated")
+    grid.add(25.0, 85.0, NOW, "new")
+    # Only incidents inside the window come back from the windowed query
+    grid.load([("recent", NOW, 25.0, 85.0)], window_only=True)
+    assert grid.total == total(grid) == 4
+    assert total(grid, since=NOW - timedelta(days=1)) == 2
+
+
+def test_window_rebuild_folds_days_that_left_the_window():
+    grid = heatmap()
+    grid.load([("a", NOW - timedelta(days=3), 25.0, 85.0)])
+    # Pretend the day is now past the window
+    day = int((NOW - timedelta(days=3)).timestamp() // 86400)
+    grid._days[day - 30] = grid._days.pop(day)
+    grid.load([], window_only=True)
+    assert grid.total == total(grid) == 1
+    assert total(grid, since=NOW - timedelta(days=6)) == 0
+
+
+def test_partial_window_queries_match_per_day_counts():
+    grid = heatmap()
+    grid.load([(f"d{n}", NOW - timedelta(days=n), 25.0 + n / 10, 85.0) for n in range(7)])
+    # Few days wanted: summed from the sparse days; most days wanted: taken off the running total
+    assert total(grid, since=NOW - timedelta(days=1)) == 2
+    assert total(grid, since=NOW - timedelta(days=5)) == 6
+    assert total(grid, since=NOW + timedelta(days=1)) == 0
+    box = grid.query(25.0, 80.0, 25.25, 90.0, resolution=16, since=NOW - timedelta(days=5))
+    assert box["total"] == 3
+
+
+def test_adds_roll_expired_days_into_the_all_time_counts():
+    grid = heatmap()
+    grid.load([])
+    grid.add(25.0, 85.0, NOW - timedelta(days=6), "a")
+    grid.add(25.0, 85.0, NOW + timedelta(days=3), "b")
+    assert total(grid) == 2
+    assert total(grid, since=NOW) == 1
+    assert grid.stats()["day_cells"] == 1
+
+
+def test_storage_does_not_grow_with_retention_days():
+    small = IncidentHeatmap(bounds=BOUNDS, cell_deg=0.1, retention_days=1)
+    large = IncidentHeatmap(bounds=BOUNDS, cell_deg=0.1, retention_days=365)
+    assert small.stats()["bytes"] == large.stats()["bytes"]
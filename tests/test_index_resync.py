@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from index_resync import IndexResync
+from versions import CollectionVersions
+
+
+class AsyncCollection:
+    """Just enough of Motor's collection API over a mongomock collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return self.collection.find_one_and_update(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        docs = list(self.collection.find(*args, **kwargs))
+
+        async def iterate():
+            for doc in docs:
+                yield doc
+        return iterate()
+
+
+class Versions:
+    def __init__(self):
+        self.count = 0
+
+    def foreign(self, name):
+        return self.count
+
+
+def test_foreign_counts_only_other_workers_bumps():
+    mongomock = pytest.importorskip("mongomock")
+    db = type("Db", (), {"versions": AsyncCollection(mongomock.MongoClient().db.versions)})()
+    ours, theirs = CollectionVersions(["tourists"]), CollectionVersions(["tourists"])
+
+    async def scenario():
+        theirs.bump("tourists")
+        await theirs.sync(db)
+        await ours.sync(db)
+        start = ours.foreign("tourists"), theirs.foreign("tourists")
+        ours.bump("tourists")
+        ours.bump("tourists")
+        await ours.sync(db)
+        await theirs.sync(db)
+        return start, (ours.foreign("tourists"), theirs.foreign("tourists"))
+
+    (ours_before, theirs_before), (ours_after, theirs_after) = asyncio.run(scenario())
+    assert ours_after == ours_before
+    assert theirs_after == theirs_before + 2
+
+
+def test_resync_applies_changes_only_after_foreign_writes():
+    versions = Versions()
+    calls = []
+
+    async def apply_changes(since):
+        calls.append(("changes", since))
+        return 3
+
+    async def reload():
+        calls.append(("reload", None))
+
+    resync = IndexResync(versions, "tourists", apply_changes, reload, reload_s=3600)
+    resync.mark_loaded()
+
+    async def scenario():
+        await resync.tick()
+        versions.count += 1
+        await resync.tick()
+        await resync.tick()
+
+    asyncio.run(scenario())
+    assert [kind for kind, _ in calls] == ["changes"]
+    assert resync.stats()["changes_applied"] == 3
+
+
+def test_resync_reloads_once_the_reload_interval_passed():
+    versions = Versions()
+    calls = []
+
+    async def apply_changes(since):
+        calls.append("changes")
+        return 0
+
+    async def reload():
+        calls.append("reload")
+
+    resync = IndexResync(versions, "tourists", apply_changes, reload, reload_s=0)
+    resync.mark_loaded()
+    versions.count += 1
+    asyncio.run(resync.tick())
+    asyncio.run(resync.tick())
+    assert calls == ["reload"]
+    assert resync.stats()["reloads"] == 1
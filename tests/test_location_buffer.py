@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from location_buffer import BufferFull, LocationWriteBuffer
+
+T0 = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def ping(tourist_id, minutes, lat=28.6):
+    return (tourist_id, lat, 77.2, T0 + timedelta(minutes=minutes))
+
+
+def make_buffer(**kwargs):
+    written, history = [], []
+
+    async def flush_fn(pings):
+        written.extend(pings)
+
+    async def history_fn(pings):
+        history.extend(pings)
+
+    return LocationWriteBuffer(flush_fn, history_fn=history_fn, **kwargs), written, history
+
+
+def test_latest_ping_wins_per_tourist():
+    buffer, written, history = make_buffer()
+    assert buffer.offer([ping("a", 2, 1.0), ping("a", 1, 2.0), ping("b", 0)]) == 1
+    assert buffer.offer([ping("a", 3, 3.0)]) == 1
+    asyncio.run(buffer.flush())
+    assert sorted((p[0], p[1]) for p in written) == [("a", 3.0), ("b", 28.6)]
+    assert len(history) == 4
+
+
+def test_uncomparable_batch_leaves_buffer_untouched():
+    buffer, _, _ = make_buffer()
+    buffer.offer([ping("a", 0)])
+    with pytest.raises(TypeError):
+        buffer.offer([ping("b", 0), ("a", 28.6, 77.2, datetime(2024, 5, 1))])
+    assert len(buffer) == 1
+    assert buffer.stats()["history_pending"] == 1
+
+
+def test_full_buffer_refuses_the_whole_batch():
+    buffer, _, _ = make_buffer(max_pending=2)
+    buffer.offer([ping("a", 0)])
+    with pytest.raises(BufferFull):
+        buffer.offer([ping("b", 0), ping("c", 0)])
+    assert len(buffer) == 1
+    assert buffer.stats()["rejected"] == 2
+
+
+def test_only_failed_history_is_retried_until_dropped():
+    calls = []
+
+    async def flush_fn(pings):
+        pass
+
+    async def history_fn(pings):
+        calls.append([p[0] for p in pings])
+        # "bad" never writes; everything else does
+        return [position for position, p in enumerate(pings) if p[0] == "bad"]
+
+    buffer = LocationWriteBuffer(flush_fn, history_fn=history_fn, max_history_attempts=3)
+
+    async def scenario():
+        buffer.offer([ping("a", 0), ping("bad", 0), ping("b", 0)])
+        for _ in range(4):
+            await buffer.flush()
+            buffer.offer([ping("c", 1)])
+
+    asyncio.run(scenario())
+    assert calls[0] == ["a", "bad", "b"]
+    assert calls[1] == ["bad", "c"]
+    assert calls[2] == ["bad", "c"]
+    assert calls[3] == ["c"]
+    stats = buffer.stats()
+    assert stats["history_dropped"] == 1
+    assert stats["history_written"] == 5
+    assert stats["history_pending"] == 1
+
+
+def test_history_callback_exception_retries_everything():
+    async def flush_fn(pings):
+        pass
+
+    async def history_fn(pings):
+        raise ConnectionError("mongo down")
+
+    buffer = LocationWriteBuffer(flush_fn, history_fn=history_fn, max_history_attempts=2)
+    buffer.offer([ping("a", 0), ping("b", 0)])
+    asyncio.run(buffer.flush())
+    assert buffer.stats()["history_pending"] == 2
+    asyncio.run(buffer.flush())
+    assert buffer.stats()["history_pending"] == 0
+    assert buffer.stats()["history_dropped"] == 2
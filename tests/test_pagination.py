@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, incident_cursor, incident_keyset, tourist_cursor, tourist_keyset,
+)
+
+
+@pytest.mark.parametrize("key", [
+    {"id": "abc"},
+    {"id": "ünïcødé/+="},
+    {"reported_at": "2024-05-01T12:30:00+00:00", "id": "z"},
+    {},
+])
+def test_cursor_round_trip(key):
+    cursor = encode_cursor(key)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == key
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", "WzEsMl0"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_tourist_keyset_resumes_after_the_last_id():
+    assert tourist_keyset(None) == ({}, [("id", 1)])
+    query, sort = tourist_keyset(tourist_cursor({"id": "t-42", "name": "ignored"}))
+    assert query == {"id": {"$gt": "t-42"}}
+    assert sort == [("id", 1)]
+    with pytest.raises(InvalidCursor):
+        tourist_keyset(encode_cursor({"id": 42}))
+
+
+def test_incident_keyset_round_trips_the_timestamp():
+    reported_at = datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+    query, sort = incident_keyset(incident_cursor({"reported_at": reported_at, "id": "i-9"}))
+    assert sort == [("reported_at", -1), ("id", -1)]
+    assert query == {"$or": [
+        {"reported_at": {"$lt": reported_at}},
+        {"reported_at": reported_at, "id": {"$lt": "i-9"}},
+    ]}
+
+
+@pytest.mark.parametrize("key", [{"id": "i-9"}, {"reported_at": "yesterday", "id": "i-9"}, {"reported_at": None}])
+def test_incident_keyset_rejects_incomplete_keys(key):
+    with pytest.raises(InvalidCursor):
+        incident_keyset(encode_cursor(key))
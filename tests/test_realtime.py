@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from realtime import Broadcaster, parse_viewport
+
+
+@pytest.mark.parametrize("value", [
+    ["a", "b", "c", "d"],
+    [77.0, 28.0, 78.0],
+    [77.0, 28.0, float("nan"), 29.0],
+    [77.0, 28.0, float("inf"), 29.0],
+    [78.0, 28.0, 77.0, 29.0],
+    [True, 28.0, 78.0, 29.0],
+    "77,28,78,29",
+])
+def test_parse_viewport_rejects_malformed_boxes(value):
+    with pytest.raises(ValueError):
+        parse_viewport(value)
+
+
+def test_parse_viewport_accepts_numbers_and_none():
+    assert parse_viewport([77, 28, 78.5, 29]) == (77.0, 28.0, 78.5, 29.0)
+    assert parse_viewport(None) is None
+
+
+def test_failing_subscriber_is_dropped_without_raising():
+    async def scenario():
+        broadcaster = Broadcaster()
+        good, bad = broadcaster.subscribe(), broadcaster.subscribe()
+        good.bbox = (77.0, 28.0, 78.0, 29.0)
+        # Bypasses parse_viewport, as a bug elsewhere might
+        bad.bbox = ["a", "b", "c", "d"]
+        broadcaster.publish({"type": "incident.created"}, lat=28.5, lng=77.5)
+        broadcaster.publish_moves([{"id": "t", "lat": 28.5, "lng": 77.5}])
+        return broadcaster, good, bad, [await good.next_event(), await good.next_event()], await bad.next_event()
+
+    broadcaster, good, bad, events, closed = asyncio.run(scenario())
+    assert [event["type"] for event in events] == ["incident.created", "tourists.moved"]
+    assert closed is None
+    assert broadcaster.subscribers == {good}
+    assert broadcaster.stats()["failed"] == 1
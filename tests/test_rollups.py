@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from indexes import INDEX_SPECS
+from rollups import DIMENSIONS, GRANULARITIES, RebuildGate, bucket_start, rebuild_pipeline, rollup_updates, series
+
+DAY = datetime(2024, 5, 1, tzinfo=timezone.utc)
+INCIDENTS = [
+    {"id": "a", "reported_at": datetime(2024, 5, 1, 9, 15), "type": "theft", "severity": "low", "status": "open", "zone_type": "safe"},
+    {"id": "b", "reported_at": datetime(2024, 5, 1, 9, 45), "type": "theft", "severity": "low", "status": "open", "zone_type": "safe"},
+    {"id": "c", "reported_at": datetime(2024, 5, 1, 23, 59), "type": "medical", "severity": "high", "status": "resolved"},
+    {"id": "d", "reported_at": datetime(2024, 5, 2, 0, 0), "type": "theft", "severity": "low", "status": "open", "zone_type": "danger"},
+    {"id": "e", "reported_at": datetime(2024, 4, 30, 23, 59), "type": "theft", "severity": "low", "status": "open", "zone_type": "safe"},
+    {"id": "f", "reported_at": datetime(2024, 5, 1, 10, 0), "type": None, "severity": "low", "status": "open"},
+]
+
+
+def expected_rollups(incidents, granularity, start, end):
+    """What the ``$inc`` write paths would hold for the incidents reported in ``[start, end)``."""
+    counts = Counter()
+    for incident in incidents:
+        reported_at = incident["reported_at"].replace(tzinfo=timezone.utc)
+        if not start <= reported_at < end or incident.get("type") is None:
+            continue
+        for operation in rollup_updates(None, incident):
+            key = operation._filter
+            if key["granularity"] == granularity:
+                counts[tuple(key[field] for field in ("bucket", *DIMENSIONS))] += 1
+    return counts
+
+
+@pytest.mark.parametrize("granularity", list(GRANULARITIES))
+def test_rebuild_pipeline_matches_the_incremental_rollups(granularity):
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.incidents
+    collection.insert_many([dict(incident) for incident in INCIDENTS])
+
+    pipeline = rebuild_pipeline(granularity, DAY, DAY + timedelta(days=1), "run-1")
+    # mongomock has no $merge; every stage before it is executed as written
+    rows = list(collection.aggregate(pipeline[:-1]))
+
+    assert {row["rebuild_id"] for row in rows} == {"run-1"}
+    assert {row["granularity"] for row in rows} == {granularity}
+    produced = Counter({
+        (row["bucket"].replace(tzinfo=timezone.utc), *(row[d] for d in DIMENSIONS)): row["count"] for row in rows
+    })
+    assert produced == expected_rollups(INCIDENTS, granularity, DAY, DAY + timedelta(days=1))
+
+
+def test_rebuild_pipeline_merges_on_the_unique_rollup_key():
+    merge = rebuild_pipeline("hour", DAY, DAY + timedelta(days=1), "run-1")[-1]["$merge"]
+    unique = next(index for index in INDEX_SPECS["incident_rollups"] if index.document.get("unique"))
+    assert merge["into"] == "incident_rollups"
+    assert merge["on"] == list(unique.document["key"])
+    assert merge["whenMatched"] == "replace"
+
+
+def test_rollup_updates_move_a_status_change_between_combinations():
+    before = INCIDENTS[0]
+    after = {**before, "status": "resolved"}
+    operations = rollup_updates(before, after)
+    assert [(op._filter["granularity"], op._filter["status"], op._doc["$inc"]["count"]) for op in operations] == [
+        ("hour", "open", -1), ("hour", "resolved", 1), ("day", "open", -1), ("day", "resolved", 1),
+    ]
+    assert rollup_updates(before, dict(before)) == []
+
+
+def test_series_fills_empty_buckets():
+    docs = [
+        {"bucket": datetime(2024, 5, 1, 9), "count": 2, "type": "theft", "severity": "low", "status": "open", "zone_type": "safe"},
+        {"bucket": datetime(2024, 5, 1, 11), "count": 0, "type": "theft", "severity": "low", "status": "open", "zone_type": "safe"},
+    ]
+    result = series(docs, "hour", DAY + timedelta(hours=8), DAY + timedelta(hours=12))
+    assert [entry["total"] for entry in result] == [0, 2, 0, 0]
+    assert result[1]["by_type"] == {"theft": 2}
+    assert bucket_start(datetime(2024, 5, 1, 9, 59), "day") == DAY
+
+
+def test_gate_holds_writes_while_a_chunk_is_rebuilt():
+    async def scenario():
+        gate = RebuildGate()
+        events = []
+
+        async def write(name):
+            async with gate.writing():
+                events.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} end")
+
+        async def rebuild_chunk():
+            async with gate.rebuilding():
+                events.append("chunk start")
+                await asyncio.sleep(0.01)
+                events.append("chunk end")
+
+        first = asyncio.create_task(write("w1"))
+        await asyncio.sleep(0)
+        chunk = asyncio.create_task(rebuild_chunk())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(write("w2"))
+        await asyncio.gather(first, chunk, second)
+        return events, gate.waits
+
+    events, waits = asyncio.run(scenario())
+    # The chunk waits for the write in flight, and the write that arrived during it waits for the chunk
+    assert events == ["w1 start", "w1 end", "chunk start", "chunk end", "w2 start", "w2 end"]
+    assert waits == 1
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from geofence import haversine_m_vec
+from safety_score import (
+    SEVERITY_WEIGHT,
+    STALENESS_FIRST_POINT_S,
+    STALENESS_SATURATION_S,
+    OpenIncidentIndex,
+    StalenessRescorer,
+    compute_scores,
+    incident_coordinates,
+)
+
+
+def incident(incident_id, lat, lng, severity="high"):
+    return {"id": incident_id, "severity": severity, "location": {"lat": lat, "lng": lng}}
+
+
+def brute_force(lats, lngs, incidents, radius_m):
+    closeness = np.zeros(len(lats))
+    for doc in incidents:
+        distance = haversine_m_vec(lats, lngs, doc["location"]["lat"], doc["location"]["lng"])
+        closeness = np.maximum(closeness, SEVERITY_WEIGHT[doc["severity"]] * np.clip(1 - distance / radius_m, 0, 1))
+    return closeness
+
+
+@pytest.mark.parametrize("location, expected", [
+    ({"lat": 28.6, "lng": 77.2}, (28.6, 77.2)),
+    ({"lat": "28.6", "lng": "77.2"}, (28.6, 77.2)),
+    ({"lat": "north", "lng": 77.2}, None),
+    ({"lat": 28.6}, None),
+    ({"lat": float("nan"), "lng": 77.2}, None),
+    ({"lat": 128.6, "lng": 77.2}, None),
+    (None, None),
+    ("28.6,77.2", None),
+])
+def test_incident_coordinates(location, expected):
+    assert incident_coordinates({"location": location}) == expected
+
+
+@pytest.mark.parametrize("tourists, incidents", [(2000, 40), (40, 2000), (500, 500)])
+def test_closeness_matches_brute_force(tourists, incidents):
+    rng = np.random.default_rng(tourists)
+    lats, lngs = rng.uniform(28.5, 28.7, tourists), rng.uniform(77.1, 77.3, tourists)
+    docs = [
+        incident(str(i), lat, lng, severity)
+        for i, (lat, lng, severity) in enumerate(zip(
+            rng.uniform(28.5, 28.7, incidents).tolist(), rng.uniform(77.1, 77.3, incidents).tolist(),
+            rng.choice(list(SEVERITY_WEIGHT), incidents).tolist(),
+        ))
+    ]
+    index = OpenIncidentIndex(2000)
+    index.load(docs)
+    np.testing.assert_allclose(index.closeness(lats, lngs), brute_force(lats, lngs, docs, 2000))
+
+
+def test_bad_rows_are_skipped():
+    index = OpenIncidentIndex(1000)
+    index.load([incident("bad", "x", 77.2), {"id": "none", "location": None}, incident("good", 28.6, 77.2, "critical")])
+    assert len(index) == 1
+    assert index.closeness(np.array([28.6, 10.0]), np.array([77.2, 10.0])).tolist() == [1.0, 0.0]
+
+
+def test_add_and_remove_update_lookups():
+    index = OpenIncidentIndex(1000)
+    index.load([])
+    point = (np.array([28.6]), np.array([77.2]))
+    assert index.closeness(*point).tolist() == [0.0]
+    index.add(incident("a", 28.6, 77.2, "low"))
+    assert index.closeness(*point).tolist() == [0.25]
+    snapshot = index.snapshot()
+    index.remove("a")
+    assert index.closeness(*point).tolist() == [0.0]
+    # A snapshot taken earlier is unaffected by later writes
+    assert index.closeness(*point, snapshot).tolist() == [0.25]
+
+
+def test_staleness_pass_queues_tourists_whose_penalty_can_still_grow():
+    windows, scheduled = [], []
+
+    class Leader:
+        is_leader = True
+
+        async def acquire(self, db):
+            return True
+
+    class Queue:
+        def schedule(self, tourist_ids):
+            scheduled.extend(tourist_ids)
+
+    async def find_stale(oldest, newest):
+        windows.append((oldest, newest))
+        return ["stale"]
+
+    rescorer = StalenessRescorer(find_stale, Queue(), Leader(), interval_s=600)
+    now = time.time()
+    assert asyncio.run(rescorer.tick(None)) == 1
+    oldest, newest = windows[0]
+    assert now - STALENESS_SATURATION_S - 600 - 5 < oldest < now - STALENESS_SATURATION_S - 600 + 5
+    assert newest <= time.time() - STALENESS_FIRST_POINT_S
+    assert scheduled == ["stale"]
+    assert compute_scores(np.zeros(1, dtype=np.int64), np.zeros(1), np.array([(STALENESS_FIRST_POINT_S + 60) / 3600]),
+                          np.zeros(1)).tolist() == [99]
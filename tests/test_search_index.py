@@ -0,0 +1,87 @@
+from search_index import TouristSearchIndex, document_tokens
+
+
+def tourist(tourist_id, name, passport="", phone="", hotel=""):
+    return {"id": tourist_id, "name": name, "passport_number": passport, "phone": phone, "hotel_name": hotel}
+
+
+def ids(results):
+    return [tourist_id for tourist_id, _ in results]
+
+
+def build(*docs, merge_threshold=50000):
+    index = TouristSearchIndex(merge_threshold=merge_threshold)
+    index.load(docs)
+    return index
+
+
+def test_document_tokens_normalise_every_field():
+    tokens = document_tokens(tourist("t1", "Anna-Marie Smith", "AB 12-345", "+44 20 7946 0958", "Grand Hotel"))
+    assert set(tokens) == {
+        (b"anna", 0), (b"marie", 0), (b"smith", 0),
+        (b"ab12345", 1),
+        (b"442079460958", 2), (b"2079460958", 2),
+        (b"grand", 3), (b"hotel", 3),
+    }
+
+
+def test_document_tokens_skip_missing_fields():
+    assert document_tokens({"id": "t1", "name": None, "phone": "n/a"}) == []
+
+
+def test_prefix_matches_any_word():
+    index = build(tourist("t1", "Anna Smith"), tourist("t2", "Annabel Jones"), tourist("t3", "Bob Annan"))
+    assert sorted(ids(index.search("ann"))) == ["t1", "t2", "t3"]
+    assert ids(index.search("smi")) == ["t1"]
+    assert index.search("zzz") == []
+    assert index.search("  ") == []
+
+
+def test_exact_token_outranks_prefix():
+    index = build(tourist("t1", "Annabel Jones"), tourist("t2", "Ann Jones"))
+    assert ids(index.search("ann")) == ["t2", "t1"]
+
+
+def test_passport_outranks_name_outranks_hotel():
+    index = build(
+        tourist("hotel", "Zed", hotel="Kazi Lodge"),
+        tourist("name", "Kazi Roy"),
+        tourist("passport", "Zed", passport="KAZI"),
+    )
+    assert ids(index.search("kazi")) == ["passport", "name", "hotel"]
+
+
+def test_every_term_must_match():
+    index = build(tourist("t1", "Anna Smith"), tourist("t2", "Anna Jones"))
+    assert ids(index.search("anna jon")) == ["t2"]
+    assert index.search("anna brown") == []
+
+
+def test_phone_matches_with_or_without_country_code():
+    index = build(tourist("t1", "Anna", phone="+44 20 7946 0958"))
+    assert ids(index.search("2079460958")) == ["t1"]
+    assert ids(index.search("+44 20 7946")) == ["t1"]
+
+
+def test_added_and_removed_tourists():
+    index = build(tourist("t1", "Anna Smith"), merge_threshold=3)
+    index.add(tourist("t2", "Annie Hall"))
+    assert sorted(ids(index.search("ann"))) == ["t1", "t2"]
+    index.add(tourist("t3", "Anne Frank"))  # crosses the threshold and merges the overflow
+    assert index.merges == 1
+    assert sorted(ids(index.search("ann"))) == ["t1", "t2", "t3"]
+
+    index.add(tourist("t1", "Zoe Smith"))
+    index.remove("t2")
+    assert ids(index.search("ann")) == ["t3"]
+    assert ids(index.search("zoe")) == ["t1"]
+    assert len(index) == 2
+
+
+def test_limit_keeps_the_best():
+    index = build(*(tourist(f"t{i}", f"Ann{'a' * i}") for i in range(30)))
+    results = index.search("ann", limit=5)
+    assert len(results) == 5
+    assert results[0][0] == "t0"
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
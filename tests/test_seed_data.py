@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
+from seed_data import DEFAULT_NOW, SyntheticData, parse_now
+
+
+def test_same_seed_reproduces_the_same_rows():
+    first, second = SyntheticData(7), SyntheticData(7)
+    assert first.tourists(0, 5) == second.tourists(0, 5)
+    assert first.incidents(0, 5, 5) == second.incidents(0, 5, 5)
+    assert list(first.track_pings(3, 2, 4)) == list(second.track_pings(3, 2, 4))
+    assert first.now == DEFAULT_NOW
+
+
+def test_track_pings_start_at_midnight_whatever_the_reference_time():
+    data = SyntheticData(7, now=datetime(2025, 3, 4, 15, 37, 12))
+    first_ts = next(iter(data.track_pings(0, 2, 4)))[0]
+    assert first_ts == datetime(2025, 3, 2, tzinfo=timezone.utc)
+
+
+def test_parse_now_accepts_epoch_seconds_and_iso_timestamps():
+    assert parse_now("1735689600") == DEFAULT_NOW
+    assert parse_now("2025-01-01T00:00:00") == DEFAULT_NOW
+    assert parse_now("2025-01-01T05:30:00+05:30") == DEFAULT_NOW
+    assert parse_now("2025-01-01T05:30:00+05:30").utcoffset() == timedelta(0)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from geo_index import METERS_PER_DEGREE_LAT
+from tracks import bucket_updates, douglas_peucker, simplify_bucket, track_buckets
+
+T0 = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def test_short_lines_and_zero_tolerance_keep_everything():
+    lat = np.array([0.0, 0.001])
+    assert douglas_peucker(lat, lat, 10.0).tolist() == [True, True]
+    lat = np.array([0.0, 0.0001, 0.0002, 0.0003])
+    assert douglas_peucker(lat, lat * 2, 0.0).all()
+
+
+def test_collinear_points_collapse_to_the_endpoints():
+    lat = np.linspace(10.0, 10.01, 50)
+    lng = np.linspace(20.0, 20.02, 50)
+    assert np.flatnonzero(douglas_peucker(lat, lng, 1.0)).tolist() == [0, 49]
+
+
+def test_corner_beyond_tolerance_is_kept():
+    # An L: north 1 km then east 1 km
+    lat = np.concatenate([np.linspace(0.0, 0.009, 10), np.full(10, 0.009)])
+    lng = np.concatenate([np.zeros(10), np.linspace(0.0, 0.009, 10)])
+    assert np.flatnonzero(douglas_peucker(lat, lng, 5.0)).tolist() == [0, 9, 19]
+
+
+def test_every_dropped_point_is_within_tolerance():
+    rng = np.random.default_rng(7)
+    lat = 28.6 + np.cumsum(rng.normal(0, 0.0002, 500))
+    lng = 77.2 + np.cumsum(rng.normal(0, 0.0002, 500))
+    tolerance_m = 25.0
+    keep = douglas_peucker(lat, lng, tolerance_m)
+    kept = np.flatnonzero(keep)
+    assert keep[0] and keep[-1] and 2 < len(kept) < 500
+
+    cos_lat = np.cos(np.radians(lat[0]))
+    y = (lat - lat[0]) * METERS_PER_DEGREE_LAT
+    x = (lng - lng[0]) * METERS_PER_DEGREE_LAT * cos_lat
+    for start, end in zip(kept[:-1], kept[1:]):
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        for i in range(start + 1, end):
+            t = np.clip(((x[i] - x[start]) * dx + (y[i] - y[start]) * dy) / (dx * dx + dy * dy), 0.0, 1.0)
+            assert np.hypot(x[i] - x[start] - t * dx, y[i] - y[start] - t * dy) <= tolerance_m + 1e-6
+
+
+def test_simplify_bucket_sorts_and_restricts_to_the_range():
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    # Mongo hands back naive UTC datetimes
+    ts = [datetime(2024, 5, 1, 0, minute) for minute in (3, 0, 2, 1, 4)]
+    bucket = {"ts": ts, "lat": [0.003, 0.0, 0.002, 0.001, 0.004], "lng": [0.0] * 5}
+    result = simplify_bucket(bucket, 0.0, start=start + timedelta(minutes=1), end=start + timedelta(minutes=3))
+    assert result["lat"] == [0.001, 0.002, 0.003]
+
+
+def test_bucket_updates_report_positions_and_split_busy_days():
+    pings = [("a", 28.6, 77.2, T0 + timedelta(minutes=m)) for m in (3, 1, 2, 0, 4)] + [("b", 28.6, 77.2, T0)]
+    updates = bucket_updates(pings, max_points=2)
+    assert [positions for _, positions in updates] == [[3, 1], [2, 0], [4], [5]]
+    operation = updates[0][0]._doc
+    assert operation["$inc"] == {"count": 2}
+    assert updates[0][0]._filter["count"] == {"$lt": 2}
+
+
+def test_track_buckets_split_at_max_points():
+    buckets = track_buckets("a", [(T0 + timedelta(minutes=m), 28.6, 77.2) for m in range(5)], max_points=2)
+    assert [bucket["count"] for bucket in buckets] == [2, 2, 1]
+    assert buckets[1]["start"] == T0 + timedelta(minutes=2)